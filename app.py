@@ -16,22 +16,25 @@ from database import (
     get_precios_luz,
     get_produccion_solar,
     get_clima,
-    get_datos_completos,
     cargar_datos_ejemplo,
     reset_datos_demo,
     get_estadisticas_resumen,
     insert_consum,
     delete_consum,
     get_consum_per_periode,
-    get_consum_per_categoria
+    get_consum_per_categoria,
+    get_perfil_consum,
+    guardar_estado_simulacion,
+    get_estado_simulacion
 )
 from ml_engine import (
     SolarPredictor,
     OpenWeatherAPIClient,
     estimar_radiacion_solar,
-    generar_pronostico_7dias
+    generar_pronostico_7dias,
+    prevision_desde_clima
 )
-from rl_engine import AgenteRL
+from rl_engine import AgenteRL, entrenar_vectorizado
 from logic import (
     SimuladorBateria,
     OptimizadorTarifas,
@@ -268,15 +271,19 @@ with st.sidebar:
             st.rerun()
 
     if st.button("🤖 Entrenar Model ML", use_container_width=True):
-        with st.spinner("Entrenant model Random Forest..."):
-            df_complet = get_datos_completos(
-                datetime(2026, 1, 15),
-                datetime(2026, 2, 13)
-            )
-            if len(df_complet) > 0:
-                predictor_train = SolarPredictor()
-                metriques = predictor_train.entrenar_modelo(df_complet)
-                st.success(f"✅ Entrenat — R²: {metriques['r2']:.3f}")
+        with st.spinner("Actualitzant model Random Forest..."):
+            # Només es llegeixen les files posteriors a l'últim entrenament;
+            # es reentrena amb tot l'històric si no hi ha model o hi ha deriva
+            predictor_train = SolarPredictor()
+            predictor_train.cargar_modelo()
+            resultat = predictor_train.actualizar_modelo()
+            if resultat['mode'] == 'complet':
+                st.success(f"✅ Entrenat — R²: {resultat['r2']:.3f} ({resultat['motiu']})")
+            elif resultat['mode'] == 'incremental':
+                st.success(f"✅ Actualitzat amb {resultat['files_noves']} files noves "
+                           f"({resultat['arbres_nous']} arbres nous)")
+            elif resultat['mode'] == 'sense_canvis':
+                st.info(f"ℹ️ Model al dia ({resultat['files_noves']} files noves)")
             else:
                 st.error("❌ Carrega dades primer.")
 
@@ -321,6 +328,10 @@ with tab1:
     st.header("🔋 Com s'ha gestionat la bateria")
     st.caption("Estat de càrrega i descàrrega de la bateria en funció de la producció i consum.")
 
+    # Estat reanudable de la instal·lació (vegeu SimuladorBateria.exportar_estado)
+    INSTALACIO = "principal"
+    estat_desat = get_estado_simulacion(INSTALACIO)
+
     with st.form("form_simulacio"):
         st.subheader("Paràmetres de Simulació")
         col1, col2, col3 = st.columns(3)
@@ -330,18 +341,34 @@ with tab1:
             sim_carrega = st.number_input("Càrrega Inicial (kWh)", value=(carga_inicial / 100) * capacidad_bateria, min_value=0.0)
         with col3:
             sim_consum = st.number_input("Consum Base (kWh/h)", value=consumo_base, min_value=0.1)
+            usar_perfil = st.checkbox("Usar el perfil de consum registrat",
+                                      help="Suma al consum base el consum mitjà dels electrodomèstics registrats per dia de la setmana i hora; les franges sense registres només tenen el consum base.")
+            continuar_sim = st.checkbox(
+                "Continuar des de l'últim estat desat",
+                disabled=estat_desat is None,
+                help="Reprèn la bateria on va acabar l'última simulació (càrrega, benefici i energies "
+                     "acumulats) i només simula les hores posteriors"
+                     + (f" a {estat_desat['ultima_fecha_hora']}." if estat_desat else ".")
+            )
             
         st.markdown("### 🤖 Intel·ligència Artificial")
         tipus_simulacio = st.radio(
             "Mètode de gestió de la bateria:",
-            ["Regles Fixes (Clàssic)", "Agent d'Aprenentatge Automàtic (Q-Learning)"],
+            ["Regles Fixes (Clàssic)", "Agent d'Aprenentatge Automàtic (Q-Learning)", "Control Predictiu (MPC 24h)"],
             help="El mode Q-Learning aprèn dels errors de pronòstic i adapta les seves decisions per maximitzar beneficis a llarg termini."
         )
         
         usar_rl = "Q-Learning" in tipus_simulacio
+        usar_mpc = "MPC" in tipus_simulacio
         entrenar_rl = False
+        epoques_rl = 100
         if usar_rl:
             entrenar_rl = st.checkbox("Entrenar agent durant la simulació", value=True)
+            epoques_rl = st.number_input(
+                "Èpoques d'entrenament", min_value=1, max_value=2000, value=100, step=10,
+                help="Cada època són 256 episodis d'un dia en paral·lel. Per sobre de ~100 èpoques "
+                     "el benefici de l'agent deixa de millorar i només s'allarga l'entrenament."
+            )
             
         executar_sim = st.form_submit_button("▶️ Executar Simulació", use_container_width=True)
 
@@ -358,11 +385,35 @@ with tab1:
                 )
 
                 if len(df_prod) > 0 and len(df_prec) > 0:
+                    perfil = get_perfil_consum() if usar_perfil else None
                     simulador = SimuladorBateria(
                         capacidad_bateria=sim_capacitat, 
                         carga_inicial=sim_carrega,
-                        usar_rl=usar_rl
+                        usar_rl=usar_rl,
+                        usar_mpc=usar_mpc
                     )
+                    continuar = continuar_sim and estat_desat is not None
+                    if continuar:
+                        simulador.importar_estado(estat_desat)
+
+                    # El MPC planifica amb la previsió del model ML; sense previsió
+                    # planificaria amb la producció real (oracle)
+                    df_prevision = None
+                    if usar_mpc:
+                        predictor_mpc = SolarPredictor()
+                        df_clima = get_clima(
+                            datetime.combine(fecha_inicio, datetime.min.time()),
+                            datetime.combine(fecha_fin, datetime.max.time())
+                        )
+                        if predictor_mpc.cargar_modelo() and len(df_clima) > 0:
+                            df_prevision = prevision_desde_clima(predictor_mpc, df_clima)
+                            cobertura = df_prod['fecha_hora'].isin(df_prevision['fecha_hora']).mean()
+                            st.caption(f"📡 El MPC planifica amb la previsió del model ML ({cobertura:.0%} de les hores); "
+                                       "la resta, amb la producció real.")
+                        else:
+                            st.warning("⚠️ Sense model ML entrenat o dades de clima: el MPC planifica amb la "
+                                       "producció real (oracle). El resultat és una cota superior, no un "
+                                       "resultat realista.")
                     
                     if usar_rl:
                         st.info("🧠 Utilitzant Agent de Machine Learning (Q-Learning) per a l'optimització...")
@@ -370,21 +421,31 @@ with tab1:
                         # para que aprenda mejor antes de mostrar el resultado final
                         if entrenar_rl:
                             my_bar = st.progress(0, text="Entrenant Agent de Machine Learning...")
-                            epochs = 5
-                            for i in range(epochs):
-                                # Train round
-                                _ = simulador.simular(df_prod, df_prec, sim_consum, entrenar_rl=True)
-                                my_bar.progress((i + 1) / epochs, text=f"Entrenant Agent de Machine Learning... (Època {i+1}/{epochs})")
-                                # Reset battery load for next epoch
-                                simulador.carga_inicial = sim_carrega
+
+                            def progres_rl(epoca, epocas):
+                                my_bar.progress(epoca / epocas, text=f"Entrenant Agent de Machine Learning... (Època {epoca}/{epocas})")
+
+                            # Episodis d'un dia en paral·lel amb capacitats i càrregues variades
+                            corba = entrenar_vectorizado(
+                                simulador.agente, df_prod, df_prec, epocas=int(epoques_rl),
+                                capacidades=[sim_capacitat * f for f in (0.5, 1.0, 1.5)],
+                                consumo_base=sim_consum, perfil_consumo=perfil, progreso=progres_rl
+                            )
                             my_bar.empty()
+                            st.line_chart(corba.set_index('epoca')['recompensa_media'], height=160)
                             st.toast('Agent entrenat correctament!', icon='🧠')
                     
                     # Resultado final
-                    resultat = simulador.simular(df_prod, df_prec, sim_consum, entrenar_rl=False)
+                    resultat = simulador.simular(df_prod, df_prec, sim_consum, entrenar_rl=False,
+                                                 continuar=continuar, df_prevision=df_prevision,
+                                                 perfil_consumo=perfil)
+                    guardar_estado_simulacion(INSTALACIO, simulador.exportar_estado())
                     st.session_state['simulacio_resultat'] = resultat
 
-                    st.success("✅ Simulació completada")
+                    if continuar and len(resultat['detalles']) == 0:
+                        st.info("ℹ️ No hi ha hores posteriors a l'estat desat en aquest període.")
+                    etiqueta = " (MPC oracle: previsió perfecta)" if usar_mpc and df_prevision is None else ""
+                    st.success("✅ Simulació completada" + etiqueta + (" (totals acumulats)" if continuar else ""))
                     
                     df_detalls = resultat['detalles']
                     
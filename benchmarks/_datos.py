@@ -0,0 +1,109 @@
+"""
+_datos.py - Dades sintètiques per als benchmarks
+OptiSolarAI - Sèries horàries amb el mateix patró que cargar_datos_ejemplo()
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Permet importar els mòduls del projecte executant `python benchmarks/<script>.py`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PRECIOS_BASE = np.array([0.10, 0.09, 0.08, 0.08, 0.09, 0.12, 0.15, 0.18,
+                         0.16, 0.14, 0.13, 0.12, 0.11, 0.12, 0.13, 0.14,
+                         0.15, 0.18, 0.22, 0.20, 0.18, 0.15, 0.12, 0.11])
+
+
+def generar_series(n_dias: int = 365, seed: int = 42, dtype: str = 'float32',
+                   inicio: datetime = datetime(2026, 1, 1)):
+    """
+    Genera sèries horàries de producció i preus.
+
+    Per defecte les columnes són float32, igual que les columnes FLOAT
+    que retorna DuckDB.
+
+    Returns:
+        tuple: (df_produccion, df_precios)
+    """
+    rng = np.random.default_rng(seed)
+    n_hores = n_dias * 24
+    i = np.arange(n_hores)
+    fechas = pd.date_range(inicio, periods=n_hores, freq='h')
+
+    precios = np.maximum(0.04, PRECIOS_BASE[i % 24]
+                         + rng.uniform(-0.02, 0.02, n_hores)
+                         + 0.01 * np.sin(i * np.pi / (24 * 7)))
+    produccion = np.maximum(0, 5.5 * np.sin((i % 24 - 6) * np.pi / 12)
+                            * (1 - 0.3 * np.sin(i * np.pi / (24 * 30)))
+                            + rng.uniform(-0.4, 0.4, n_hores))
+    radiacion = np.maximum(0, 850 * np.sin((i % 24 - 6) * np.pi / 12)
+                           + rng.uniform(-80, 80, n_hores))
+
+    df_produccion = pd.DataFrame({
+        'fecha_hora': fechas,
+        'produccion_kwh': produccion.astype(dtype),
+        'radiacion': radiacion.astype(dtype)
+    })
+    df_precios = pd.DataFrame({
+        'fecha_hora': fechas,
+        'precio_kwh': precios.astype(dtype)
+    })
+    return df_produccion, df_precios
+
+
+def generar_meteo(n: int = 50_000, seed: int = 0) -> pd.DataFrame:
+    """
+    Files d'entrenament per a SolarPredictor: les variables de FEATURES
+    i una producció que depèn de la radiació i la nuvolositat.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'temperatura': rng.normal(18, 6, n),
+        'nubosidad': rng.integers(0, 100, n),
+        'humedad': rng.integers(20, 95, n),
+        'radiacion': rng.uniform(0, 1000, n)
+    })
+    df['produccion_kwh'] = df['radiacion'] / 200 * (1 - df['nubosidad'] / 150) + rng.normal(0, 0.3, n)
+    return df
+
+
+def generar_datos_completos(n_dias: int = 365, seed: int = 0,
+                            inicio: datetime = datetime(2026, 1, 1)) -> pd.DataFrame:
+    """
+    Files horàries amb les columnes de get_datos_completos(): clima amb
+    cicle diari i estacional i una producció que en depèn.
+    """
+    rng = np.random.default_rng(seed)
+    n_hores = n_dias * 24
+    i = np.arange(n_hores)
+    hora = i % 24
+    estacio = np.sin((i / 24 - 80) * 2 * np.pi / 365)
+    nubosidad = np.clip(rng.normal(35, 25, n_hores), 0, 100).round()
+    radiacion = np.maximum(0, (850 + 150 * estacio) * np.sin((hora - 6) * np.pi / 12)
+                           * (1 - nubosidad / 100 * 0.7))
+    df = pd.DataFrame({
+        'fecha_hora': pd.date_range(inicio, periods=n_hores, freq='h'),
+        'precio_kwh': PRECIOS_BASE[hora] + rng.uniform(-0.02, 0.02, n_hores),
+        'radiacion': radiacion,
+        'temperatura': 16 + 8 * estacio + 4 * np.sin((hora - 9) * np.pi / 12) + rng.normal(0, 1.5, n_hores),
+        'nubosidad': nubosidad,
+        'humedad': np.clip(rng.normal(55, 15, n_hores), 20, 90).round()
+    })
+    df['produccion_kwh'] = np.maximum(0, radiacion / 160 * (1 - 0.004 * (df['temperatura'] - 25).clip(0))
+                                      + rng.normal(0, 0.15, n_hores))
+    return df
+
+
+def cronometrar(funcio, repeticions: int = 3) -> float:
+    """Retorna el millor temps (s) de diverses execucions."""
+    import time
+    millor = float('inf')
+    for _ in range(repeticions):
+        t0 = time.perf_counter()
+        funcio()
+        millor = min(millor, time.perf_counter() - t0)
+    return millor
@@ -0,0 +1,70 @@
+"""
+bench_ajust_hiperparametres.py - Validació creuada d'origen mòbil i cerca d'hiperparàmetres
+OptiSolarAI - Partició aleatòria vs. temporal, cerca en un pool de processos
+i error del model ajustat sobre el mes següent
+
+Execució:
+    python benchmarks/bench_ajust_hiperparametres.py
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import train_test_split
+
+from _datos import generar_datos_completos
+from config import MODEL_PARAMS
+from ml_engine import FEATURES, SolarPredictor, ajustar_hiperparametres
+
+
+def _mae_mes_seguent(predictor, df):
+    X = df[FEATURES].to_numpy(dtype=float)
+    return float(np.abs(predictor.predecir_matriz(X) - df['produccion_kwh'].to_numpy()).mean())
+
+
+def main():
+    df = generar_datos_completos(n_dias=365)
+    corte = pd.Timestamp('2026-07-01')
+    entreno = df[df['fecha_hora'] < corte]
+    seguent = df[(df['fecha_hora'] >= corte) & (df['fecha_hora'] < corte + pd.Timedelta(days=30))]
+
+    print("=== Validació de config.MODEL_PARAMS (6 mesos) ===")
+    X, y = entreno[FEATURES], entreno['produccion_kwh']
+    X_tr, X_te, y_tr, y_te = train_test_split(X, y, test_size=0.2, random_state=42)
+    model = RandomForestRegressor(**MODEL_PARAMS, n_jobs=-1).fit(X_tr, y_tr)
+    aleatori = mean_absolute_error(y_te, model.predict(X_te))
+    predictor = SolarPredictor(Path(tempfile.mkdtemp()) / "solar_predictor", mida_cache=0)
+    temporal = predictor.entrenar_modelo(entreno)['mae']
+    print(f"  MAE partició aleatòria: {aleatori:.4f}  |  últim 20% temporal: {temporal:.4f}  |  "
+          f"mes següent: {_mae_mes_seguent(predictor, seguent):.4f}")
+
+    print(f"\n=== Cerca aleatòria: 12 candidats x 4 plecs ({os.cpu_count()} nuclis) ===")
+    for treballadors in sorted({1, os.cpu_count() or 1}):
+        ajustat = SolarPredictor(Path(tempfile.mkdtemp()) / "solar_predictor", mida_cache=0)
+        resultats = ajustar_hiperparametres(ajustat, entreno, n_candidats=12, n_plecs=4,
+                                            max_workers=treballadors)
+        temps = ajustat.ajust['temps']
+        print(f"  {treballadors} procés(os): cerca {temps['cerca']:6.2f} s  |  CPU de les tasques "
+              f"{temps['cpu_tasques']:6.2f} s  |  acceleració x{temps['acceleracio']:.2f}  |  "
+              f"publicació {temps['publicacio'] * 1000:.1f} ms  |  model final (totes les files) {temps['entrenament_final']:.2f} s")
+
+    print("\n  Millors candidats (MAE mitjà dels plecs):")
+    columnes = ['n_estimators', 'max_depth', 'min_samples_split', 'min_samples_leaf', 'max_features',
+                'mae', 'mae_desv', 'segons_ajust']
+    print(resultats[columnes].head(5).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+    print("\n=== Model final, mes següent ===")
+    print(f"  config.MODEL_PARAMS: {_mae_mes_seguent(predictor, seguent):.4f}  |  "
+          f"ajustat {ajustat.ajust['millors_parametres']}: {_mae_mes_seguent(ajustat, seguent):.4f}")
+    manifest = ajustat.model_path / 'manifest.json'
+    print(f"  artefacte: {manifest.parent.name}/ amb 'ajust' ({len(ajustat.ajust['candidats'])} candidats, "
+          f"informe de temps) al manifest")
+
+
+if __name__ == '__main__':
+    main()
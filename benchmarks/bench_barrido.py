@@ -0,0 +1,52 @@
+"""
+bench_barrido.py - Rendiment del barrit de dimensionament de bateries
+OptiSolarAI - barrido_baterias() vs. un SimuladorBateria per configuració
+
+Execució:
+    python benchmarks/bench_barrido.py
+"""
+
+import numpy as np
+
+from _datos import generar_series, cronometrar
+from logic import SimuladorBateria, barrido_baterias
+
+
+def main():
+    df_prod, df_prec = generar_series(n_dias=365)
+    capacidades = np.arange(2.0, 22.0, 1.0)        # 20 capacitats
+    cargas = np.array([0.0, 2.5, 5.0, 7.5, 10.0])   # 5 càrregues inicials
+    consumos = np.array([1.0, 1.5, 2.0, 2.5])       # 4 consums base
+    n_escenaris = len(capacidades) * len(cargas) * len(consumos)
+
+    print(f"=== Paritat amb SimuladorBateria ({n_escenaris} escenaris, 1 any) ===")
+    taula = barrido_baterias(df_prod, df_prec, capacidades, cargas, consumos)
+    mostra = taula.sample(10, random_state=0)
+    max_dif = 0.0
+    for _, fila in mostra.iterrows():
+        res = SimuladorBateria(capacidad_bateria=fila['capacidad_bateria'],
+                               carga_inicial=fila['carga_inicial']).simular(
+            df_prod, df_prec, consumo_base=fila['consumo_base'])
+        assert res['beneficio_total'] == fila['beneficio_total']
+        assert res['ciclos_bateria'] == fila['ciclos_bateria']
+        max_dif = max(max_dif,
+                      abs(res['energia_vendida_total'] - fila['energia_vendida_total']),
+                      abs(res['energia_comprada_total'] - fila['energia_comprada_total']))
+    print(f"  beneficio_total i ciclos idèntics en 10 escenaris (dif. energia màx {max_dif:.2e} kWh)")
+
+    print("\n=== Temps ===")
+    t_bucle = cronometrar(lambda: [
+        SimuladorBateria(capacidad_bateria=c, carga_inicial=5.0).simular(df_prod, df_prec, 2.0)
+        for c in capacidades
+    ], repeticions=1)
+    print(f"  bucle SimuladorBateria: {t_bucle / len(capacidades) * 1000:8.1f} ms/escenari")
+    for n_cap in (20, 100, 500):
+        caps = np.linspace(2.0, 50.0, n_cap)
+        t = cronometrar(lambda: barrido_baterias(df_prod, df_prec, caps, cargas, consumos))
+        n = n_cap * len(cargas) * len(consumos)
+        print(f"  barrido_baterias {n:>6} escenaris: {t:7.3f} s  "
+              f"({t / n * 1000:.3f} ms/escenari)")
+
+
+if __name__ == '__main__':
+    main()
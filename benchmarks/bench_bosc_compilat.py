@@ -0,0 +1,77 @@
+"""
+bench_bosc_compilat.py - Random Forest compilat en arrays plans
+OptiSolarAI - Latència de predecir() i de lots petits: sklearn vs. BoscCompilat
+
+Execució:
+    python benchmarks/bench_bosc_compilat.py
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from _datos import generar_meteo, cronometrar
+from ml_engine import FEATURES, BoscCompilat, SolarPredictor
+
+
+def _latencia(funcio, minim_s: float = 0.2) -> float:
+    """Temps mitjà per crida (s), repetint fins a omplir minim_s."""
+    funcio()
+    n, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < minim_s:
+        funcio()
+        n += 1
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    # Sense memòria cau: es mesura sempre el recorregut del bosc
+    predictor = SolarPredictor(Path(tempfile.mkdtemp()) / "solar_predictor", mida_cache=0)
+    predictor.entrenar_modelo(generar_meteo(50_000))
+    compilat = predictor.compilat
+    print(f"=== Bosc: {compilat.n_arbres} arbres, {len(compilat.valor):,} nodes, "
+          f"profunditat {compilat.profunditat} ===")
+
+    print("\n=== Concordança amb sklearn (5.000 files noves) ===")
+    prova = generar_meteo(5_000, seed=1)[FEATURES]
+    referencia = predictor.model.predict(prova)
+    print(f"  màx. |diferència|: {np.abs(compilat.predir(prova.to_numpy()) - referencia).max():.1e}")
+    amb_nan = prova.to_numpy().copy()
+    amb_nan[::7, 1] = np.nan
+    referencia_nan = predictor.model.predict(pd.DataFrame(amb_nan, columns=FEATURES))
+    print(f"  amb NaN (1 de cada 7 files): {np.abs(compilat.predir(amb_nan) - referencia_nan).max():.1e}")
+
+    print("\n=== predecir() d'una fila ===")
+    fila = prova.iloc[0].tolist()
+
+    def _predecir_sklearn():
+        return max(0, predictor.model.predict(pd.DataFrame([fila], columns=FEATURES))[0])
+
+    t_ref = _latencia(_predecir_sklearn)
+    t_nou = _latencia(lambda: predictor.predecir(*fila))
+    print(f"  DataFrame + sklearn: {t_ref * 1e6:9.1f} µs")
+    print(f"  BoscCompilat:        {t_nou * 1e6:9.1f} µs  (x{t_ref / t_nou:.0f})")
+
+    print("\n=== Lots ===")
+    print(f"  {'files':>6} {'sklearn':>12} {'compilat':>12}")
+    for n in (1, 8, 32, 168, 256, 1000, 5000):
+        X = prova.to_numpy()[:n]
+        df = prova.iloc[:n]
+        t_sk = _latencia(lambda: predictor.model.predict(df))
+        t_c = _latencia(lambda: compilat.predir(X))
+        print(f"  {n:>6} {t_sk * 1000:9.2f} ms {t_c * 1000:9.2f} ms  (x{t_sk / t_c:.1f})")
+
+    print("\n=== Compilació ===")
+    t = cronometrar(lambda: BoscCompilat.des_de_model(predictor.model))
+    carregat = SolarPredictor(predictor.model_path, mida_cache=0)
+    t_carrega = cronometrar(carregat.cargar_modelo)
+    print(f"  des del model: {t * 1000:.1f} ms  |  cargar_modelo() amb compilació: {t_carrega * 1000:.1f} ms")
+    print(f"  després de recarregar, idèntic: "
+          f"{np.array_equal(carregat.compilat.predir(prova.to_numpy()), compilat.predir(prova.to_numpy()))}")
+
+
+if __name__ == '__main__':
+    main()
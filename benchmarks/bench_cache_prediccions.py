@@ -0,0 +1,95 @@
+"""
+bench_cache_prediccions.py - Memòria cau LRU de prediccions solars
+OptiSolarAI - Relectures del dashboard, previsions repetides i lots amb solapament
+
+Execució:
+    python benchmarks/bench_cache_prediccions.py
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from _datos import generar_meteo
+from ml_engine import FEATURES, SolarPredictor, generar_pronostico_7dias
+
+
+def _temps(funcio, repeticions: int = 1) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeticions):
+        funcio()
+    return (time.perf_counter() - t0) / repeticions
+
+
+def _arrodonides(n: int, seed: int) -> np.ndarray:
+    """Files amb la precisió d'una previsió: 0.1 °C i W/m² enters."""
+    return generar_meteo(n, seed)[FEATURES].round({'temperatura': 1, 'radiacion': 0}).to_numpy()
+
+
+def main():
+    carpeta = Path(tempfile.mkdtemp())
+    sense = SolarPredictor(carpeta / "solar_predictor", mida_cache=0)
+    sense.entrenar_modelo(generar_meteo(50_000))
+    amb = SolarPredictor(carpeta / "solar_predictor", mida_cache=4096)
+    amb.cargar_modelo()
+
+    print("=== Previsió de 7 dies repetida 20 vegades (relectures del dashboard) ===")
+    t_sense = _temps(lambda: generar_pronostico_7dias(sense), 20)
+    t_amb = _temps(lambda: generar_pronostico_7dias(amb), 20)
+    est = amb.cache.estadistiques()
+    print(f"  sense cache: {t_sense * 1000:7.2f} ms/previsió")
+    print(f"  amb cache:   {t_amb * 1000:7.2f} ms/previsió  (x{t_sense / t_amb:.1f})  "
+          f"encerts {est['encerts']}, fallades {est['fallades']}, taxa {est['taxa_encerts']:.0%}")
+
+    print("\n=== predecir() amb tuples gairebé iguals (soroll < resolució) ===")
+    rng = np.random.default_rng(0)
+    base = _arrodonides(200, seed=1)
+    files = base[rng.integers(0, len(base), 5_000)]
+    files[:, 0] += rng.uniform(-0.04, 0.04, len(files))
+    files[:, 3] += rng.uniform(-0.4, 0.4, len(files))
+    amb.cache.invalidar()
+    encerts0, fallades0 = amb.cache.encerts, amb.cache.fallades
+    t_sense = _temps(lambda: [sense.predecir(*f) for f in files.tolist()])
+    t_amb = _temps(lambda: [amb.predecir(*f) for f in files.tolist()])
+    encerts, fallades = amb.cache.encerts - encerts0, amb.cache.fallades - fallades0
+    print(f"  {len(files):,} crides: sense cache {t_sense * 1e6 / len(files):6.1f} µs/crida  |  "
+          f"amb cache {t_amb * 1e6 / len(files):6.1f} µs/crida  ({encerts} encerts, {fallades} fallades)")
+
+    print("\n=== Lots amb solapament: només les fallades arriben al bosc ===")
+    amb.cache.invalidar()
+    historic = _arrodonides(2_000, seed=2)
+    amb.predecir_matriz(historic[:1_000])
+    for solapament in (0.0, 0.5, 0.9):
+        n_nous = int(1_000 * (1 - solapament))
+        lot = np.concatenate([historic[:1_000 - n_nous], historic[1_000:1_000 + n_nous]])
+        fallades0 = amb.cache.fallades
+        t_sense = _temps(lambda: sense.predecir_matriz(lot))
+        t_amb = _temps(lambda: amb.predecir_matriz(lot))
+        amb.cache.invalidar()
+        amb.predecir_matriz(historic[:1_000])
+        print(f"  solapament {solapament:4.0%}: {amb.cache.fallades - fallades0 - 1_000:>5} fallades (files al bosc)  |  "
+              f"sense cache {t_sense * 1000:7.2f} ms  amb cache {t_amb * 1000:7.2f} ms")
+
+    print("\n=== Efecte de la quantització (5.000 files contínues) ===")
+    prova = generar_meteo(5_000, seed=3)[FEATURES].to_numpy()
+    exacte = sense.predecir_matriz(prova)
+    for nom, resolucions in (("per defecte (0.1 °C, 1 %, 1 %, 1 W/m²)", None),
+                             ("gruixuda (0.5 °C, 5 %, 5 %, 10 W/m²)",
+                              {'temperatura': 0.5, 'nubosidad': 5, 'humedad': 5, 'radiacion': 10})):
+        predictor = SolarPredictor(carpeta / "solar_predictor", mida_cache=4096, resolucions_cache=resolucions)
+        predictor.cargar_modelo()
+        error = np.abs(predictor.predecir_matriz(prova) - exacte)
+        print(f"  {nom:<40} error mitjà {error.mean():.4f} kWh, màxim {error.max():.3f} kWh")
+
+    print("\n=== Invalidació ===")
+    amb.predecir_matriz(historic[:100])
+    entrades = len(amb.cache)
+    amb.cargar_modelo()
+    print(f"  entrades abans de cargar_modelo(): {entrades}  |  després: {len(amb.cache)}  |  "
+          f"invalidacions: {amb.cache.invalidacions}")
+
+
+if __name__ == '__main__':
+    main()
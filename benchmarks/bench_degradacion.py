@@ -0,0 +1,40 @@
+"""
+bench_degradacion.py - Comptatge rainflow i model de degradació
+OptiSolarAI - Cost del comptatge incremental i efecte del cost de desgast
+
+Execució:
+    python benchmarks/bench_degradacion.py
+"""
+
+import numpy as np
+
+from _datos import generar_series, cronometrar
+from logic import ContadorRainflow, ModeloDegradacion, SimuladorBateria, barrido_baterias
+
+
+def main():
+    print("=== Comptatge rainflow incremental ===")
+    traca = np.clip(np.random.default_rng(0).normal(0, 0.8, 87600).cumsum() % 20, 0, 10)
+    for trossos in (1, 3650, 87600):
+        def comptar():
+            contador = ContadorRainflow()
+            for tros in np.array_split(traca, trossos):
+                contador.agregar(tros)
+        t = cronometrar(comptar, repeticions=1)
+        print(f"  10 anys en {trossos:>6} trossos: {t:6.3f} s  ({len(traca) / t:>12,.0f} mostres/s)")
+
+    print("\n=== Degradació d'un any de simulació ===")
+    df_prod, df_prec = generar_series(n_dias=365)
+    cost_kwh = ModeloDegradacion(10.0).coste_desgaste_kwh(profundidad=0.8)
+    for desgast in (0.0, cost_kwh):
+        res = SimuladorBateria(10.0, 5.0, coste_desgaste_kwh=desgast).simular(df_prod, df_prec, 2.0)
+        print(f"  cost desgast {desgast:.3f} €/kWh: beneficio {res['beneficio_total']:7.2f} €  "
+              f"cicles rainflow {res['ciclos_rainflow']:6.1f}  "
+              f"pèrdua capacitat {res['degradacion_capacidad_pct']:.2f} %  "
+              f"cost desgast {res['coste_desgaste']:6.2f} €")
+        lot = barrido_baterias(df_prod, df_prec, [10.0], [5.0], [2.0], coste_desgaste_kwh=desgast)
+        print(f"    barrido_baterias idèntic: {lot['beneficio_total'].iloc[0] == res['beneficio_total']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+bench_despacho_optimo.py - Despatx òptim per programació dinàmica
+OptiSolarAI - Temps de resolució d'un any i bretxa d'optimalitat
+
+Execució:
+    python benchmarks/bench_despacho_optimo.py
+"""
+
+from _datos import generar_series, cronometrar
+from logic import SimuladorBateria
+from opt_engine import DespachoOptimo, beneficio_deficit_cubierto, brecha_optimalidad
+
+
+def main():
+    df_prod, df_prec = generar_series(n_dias=365)
+    sim = SimuladorBateria(capacidad_bateria=10.0, carga_inicial=5.0)
+    heuristica = sim.simular(df_prod, df_prec, consumo_base=2.0)
+
+    print("=== Resolució d'un any ===")
+    for resolucion in (0.5, 0.1, 0.05):
+        despacho = DespachoOptimo.desde_simulador(sim, resolucion_kwh=resolucion)
+        t = cronometrar(lambda: despacho.resolver(df_prod, df_prec, consumo_base=2.0), repeticions=1)
+        optimo = despacho.resolver(df_prod, df_prec, consumo_base=2.0)
+        print(f"  resolució {resolucion:4.2f} kWh ({len(despacho.niveles):>3} nivells): {t:6.2f} s  "
+              f"beneficio òptim {optimo['beneficio_total']:8.2f} €")
+
+    print("\n=== Bretxa d'optimalitat (resolució 0.1 kWh) ===")
+    print("  (el dèficit que la descàrrega no cobreix es compra, també a la heurística)")
+    optimo = DespachoOptimo.desde_simulador(sim).resolver(df_prod, df_prec, consumo_base=2.0)
+    beneficio_heuristica = beneficio_deficit_cubierto(heuristica['detalles'])
+    decisiones = optimo['detalles']['decision'].value_counts()
+    print(f"  Òptim:      {optimo['beneficio_total']:8.2f} €  ({optimo['ciclos_bateria']} cicles, "
+          f"{decisiones['descargar']} descàrregues, {decisiones['comprar']} compres)")
+    print(f"  Heurística: {beneficio_heuristica:8.2f} €  ({heuristica['ciclos_bateria']} cicles)  "
+          f"bretxa {brecha_optimalidad(beneficio_heuristica, optimo['beneficio_total']):.1f} %")
+    print(f"  (heurística amb la comptabilitat del simulador: {heuristica['beneficio_total']:.2f} €)")
+
+if __name__ == '__main__':
+    main()
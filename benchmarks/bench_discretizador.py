@@ -0,0 +1,145 @@
+"""
+bench_discretizador.py - Trams d'estat configurables i Q-table densa/dispersa
+OptiSolarAI - Paritat amb la discretització original, trams de preu per quantils,
+cost de les taules dispersa i densa i qualitat de la política resultant
+
+Execució:
+    python benchmarks/bench_discretizador.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from _datos import generar_series, cronometrar
+from logic import SimuladorBateria
+from rl_engine import (AgenteRL, Discretizador, LIMITE_ESTADOS_DENSOS, TablaDispersa,
+                       codificar_estado, entrenar_vectorizado)
+
+
+def _estado_original(hora, carga, precio, energia, capacidad):
+    """Discretització fixa anterior, com a referència."""
+    carga_b = 0 if carga < capacidad * 0.2 else (2 if carga > capacidad * 0.8 else 1)
+    precio_b = 0 if precio < 0.08 else (2 if precio > 0.15 else 1)
+    return codificar_estado((hora // 6, carga_b, precio_b, 1 if energia > 0 else 0))
+
+
+def _ocupacio(discretizador, precios):
+    tramos = discretizador.tramos('precio', precios)
+    return np.bincount(tramos, minlength=discretizador.dimensiones[2]) / len(precios)
+
+
+def _avaluar(agente, df_prod, df_prec):
+    sim = SimuladorBateria(10.0, 5.0, usar_rl=True)
+    sim.agente = agente
+    return sim.simular(df_prod, df_prec, 2.0)['beneficio_total']
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    print("=== Paritat amb la discretització original ===")
+    n = 200_000
+    capacidad = 10.0
+    # Inclou valors exactament als bords (0.08, 0.15, 2 kWh, 8 kWh, 0 kWh)
+    horas = rng.integers(0, 24, n)
+    cargas = rng.choice([0.0, 2.0, 8.0, 10.0, *rng.uniform(0, 10, 6)], n)
+    precios = rng.choice([0.08, 0.15, *rng.uniform(0.04, 0.25, 6)], n)
+    energias = rng.choice([0.0, *rng.normal(0, 2, 6)], n)
+    agente = AgenteRL(capacidad, file_path="/nonexistent/agente")
+    referencia = np.array([_estado_original(*f, capacidad) for f in
+                           zip(horas.tolist(), cargas.tolist(), precios.tolist(), energias.tolist())])
+    escalar = np.array([agente._get_estado(*f) for f in
+                        zip(horas.tolist(), cargas.tolist(), precios.tolist(), energias.tolist())])
+    lots = agente.estados_batch(horas, cargas, precios, energias)
+    print(f"  _get_estado == original: {np.array_equal(escalar, referencia)}  |  "
+          f"estados_batch == original: {np.array_equal(lots, referencia)}")
+
+    print("\n=== Trams de preu per quantils (precios_luz d'un any) ===")
+    df_prod, df_prec = generar_series(n_dias=365)
+    historic = df_prec['precio_kwh'].to_numpy(dtype=float)
+    print(f"  {'discretitzador':<18} {'bords':<38} ocupació per tram")
+    for nom, disc in (("fix (0.08, 0.15)", Discretizador()),
+                      ("quantils, 3", Discretizador.desde_precios(historic, 3)),
+                      ("quantils, 5", Discretizador.desde_precios(historic, 5))):
+        bords = ', '.join(f"{b:.4f}" for b in disc.bordes['precio'])
+        ocupacio = ' '.join(f"{p:4.0%}" for p in _ocupacio(disc, historic))
+        print(f"  {nom:<18} {bords:<38} {ocupacio}")
+
+    print(f"\n=== Q-table densa vs. dispersa (límit automàtic: {LIMITE_ESTADOS_DENSOS:,} estats) ===")
+    configuracions = {
+        "per defecte": {},
+        "24h x 10 x 10": {'hora': range(1, 24), 'carga': np.linspace(0.1, 0.9, 9),
+                          'precio': np.quantile(historic, np.arange(1, 10) / 10)},
+        "24h x 20 x 50 x 5": {'hora': range(1, 24), 'carga': np.linspace(0.05, 0.95, 19),
+                              'precio': np.quantile(historic, np.arange(1, 50) / 50),
+                              'energia': (-2.0, -0.5, 0.0, 0.5)},
+        "24h x 20 x 100 x 20": {'hora': range(1, 24), 'carga': np.linspace(0.05, 0.95, 19),
+                                'precio': np.quantile(historic, np.arange(1, 100) / 100),
+                                'energia': np.linspace(-4, 4, 19)},
+    }
+    lots = 256
+    print(f"  {'trams':<20} {'estats':>9}  {'taula':<10} {'memòria Q':>10} {'Bellman x256':>13}")
+    for nom, bordes in configuracions.items():
+        disc = Discretizador(bordes)
+        automatica = AgenteRL(file_path="/nonexistent/agente", discretizador=disc).tabla_densa
+        # Transicions concentrades en pocs estats, com en un entrenament real
+        visitats = rng.choice(disc.n_estados, min(disc.n_estados, 5_000), replace=False)
+        estados = rng.choice(visitats, (200, lots))
+        acciones = rng.integers(0, 5, (200, lots))
+        recompensas = rng.normal(0, 0.3, (200, lots))
+        for densa in (True, False):
+            agente = AgenteRL(file_path="/nonexistent/agente", discretizador=disc)
+            if densa and not agente.tabla_densa:
+                agente.q_table = np.zeros(agente.q_table.shape)
+                agente.visitas = np.zeros(agente.visitas.shape, dtype=np.int64)
+            elif not densa and agente.tabla_densa:
+                agente.q_table = TablaDispersa(*agente.q_table.shape)
+                agente.visitas = TablaDispersa(*agente.visitas.shape, dtype=np.int64)
+
+            def _passos():
+                for e, a, r in zip(estados, acciones, recompensas):
+                    agente.aprender_batch(e, a, r, np.roll(e, 1))
+
+            t = cronometrar(_passos, repeticions=1) / len(estados)
+            taula = agente.q_table
+            memoria = taula.nbytes if densa else taula.ids.nbytes + taula.valores.nbytes
+            marca = '*' if densa == automatica else ' '
+            print(f"  {nom if densa else '':<20} {f'{disc.n_estados:,}' if densa else '':>9} {marca}"
+                  f"{'densa' if densa else 'dispersa':<10} {memoria / 1e6:7.2f} MB {t * 1e6:10.1f} µs")
+    print("  (* = emmagatzematge triat automàticament)")
+
+    # Mateixa taula forçant l'emmagatzematge dispers: resultats idèntics
+    densa = AgenteRL(file_path="/nonexistent/agente")
+    dispersa = AgenteRL(file_path="/nonexistent/agente")
+    dispersa.q_table = TablaDispersa(*densa.q_table.shape)
+    dispersa.visitas = TablaDispersa(*densa.visitas.shape, dtype=np.int64)
+    estados = rng.integers(0, densa.discretizador.n_estados, (200, lots))
+    for e, a, r in zip(estados, rng.integers(0, 5, (200, lots)), rng.normal(0, 0.3, (200, lots))):
+        densa.aprender_batch(e, a, r, np.roll(e, 1))
+        dispersa.aprender_batch(e, a, r, np.roll(e, 1))
+    todos = np.arange(densa.discretizador.n_estados)
+    print(f"  dispersa == densa (72 estats, 200 lots): {np.array_equal(dispersa.q_table[todos], densa.q_table)}")
+
+    print("\n=== Qualitat: entrenament 9 mesos, avaluació 3 mesos ===")
+    corte = pd.Timestamp('2026-10-01')
+    entreno = df_prod['fecha_hora'] < corte
+    prod_ent, prec_ent = df_prod[entreno], df_prec[entreno]
+    prod_ev, prec_ev = df_prod[~entreno].reset_index(drop=True), df_prec[~entreno].reset_index(drop=True)
+    historic_ent = prec_ent['precio_kwh'].to_numpy(dtype=float)
+    discretitzadors = {
+        "fix (72 estats)": Discretizador(),
+        "quantils 3": Discretizador.desde_precios(historic_ent, 3),
+        "quantils 5": Discretizador.desde_precios(historic_ent, 5),
+        "quantils 5, 24h": Discretizador.desde_precios(historic_ent, 5, bordes={'hora': range(1, 24)}),
+    }
+    print(f"  {'discretitzador':<18} {'estats':>7} {'visitats':>9} {'entrenament':>12} {'benefici avaluació':>19}")
+    for nom, disc in discretitzadors.items():
+        agente = AgenteRL(file_path="/nonexistent/agente", discretizador=disc)
+        t = cronometrar(lambda: entrenar_vectorizado(agente, prod_ent, prec_ent, epocas=300,
+                                                     semilla=0, guardar=False), repeticions=1)
+        beneficio = _avaluar(agente, prod_ev, prec_ev)
+        print(f"  {nom:<18} {disc.n_estados:>7} {agente.estados_visitados():>9} {t:10.2f} s {beneficio:15.2f} €")
+
+
+if __name__ == '__main__':
+    main()
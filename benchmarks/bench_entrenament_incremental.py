@@ -0,0 +1,94 @@
+"""
+bench_entrenament_incremental.py - Actualització incremental del SolarPredictor
+OptiSolarAI - Cost d'actualitzar() segons les files noves vs. reentrenar amb tot
+l'històric, error sobre la setmana següent i detecció de deriva
+
+Execució:
+    python benchmarks/bench_entrenament_incremental.py
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from _datos import generar_datos_completos
+from ml_engine import FEATURES, SolarPredictor
+
+
+def _font(df, limit):
+    """Simula get_datos_posteriores() amb les files anteriors a `limit`."""
+    visibles = df[df['fecha_hora'] < limit]
+    return lambda marca: visibles if marca is None else visibles[visibles['fecha_hora'] > marca]
+
+
+def _mae(predictor, df):
+    X = df[FEATURES].to_numpy(dtype=float)
+    return float(np.abs(predictor.predecir_matriz(X) - df['produccion_kwh'].to_numpy()).mean())
+
+
+def _entrenat(df, limit):
+    predictor = SolarPredictor(Path(tempfile.mkdtemp()) / "solar_predictor", mida_cache=0)
+    predictor.actualizar_modelo(_font(df, limit))
+    return predictor
+
+
+def main():
+    df = generar_datos_completos(n_dias=365)
+    inici = pd.Timestamp('2026-07-01')
+
+    print("=== Cost per mida de dades noves (històric: 6 mesos) ===")
+    print(f"  {'files noves':>11} {'incremental':>12} {'arbres':>7} {'complet':>9} "
+          f"{'MAE setmana seg. (incr. / complet)':>36}")
+    for dies in (1, 7, 30):
+        limit = inici + pd.Timedelta(days=dies)
+        avaluacio = df[(df['fecha_hora'] >= limit) & (df['fecha_hora'] < limit + pd.Timedelta(days=7))]
+
+        incremental = _entrenat(df, inici)
+        t0 = time.perf_counter()
+        resultat = incremental.actualizar_modelo(_font(df, limit))
+        t_incr = time.perf_counter() - t0
+
+        complet = SolarPredictor(Path(tempfile.mkdtemp()) / "solar_predictor", mida_cache=0)
+        t0 = time.perf_counter()
+        complet.actualizar_modelo(_font(df, limit))
+        t_complet = time.perf_counter() - t0
+
+        print(f"  {resultat['files_noves']:>11} {t_incr * 1000:9.1f} ms {resultat['arbres_nous']:>7} "
+              f"{t_complet * 1000:6.0f} ms {_mae(incremental, avaluacio):21.3f} / {_mae(complet, avaluacio):.3f}"
+              f"  ({resultat['mode']})")
+
+    print("\n=== Actualització diària durant 30 dies ===")
+    predictor = _entrenat(df, inici)
+    modes, temps = [], []
+    for dia in pd.date_range(inici + pd.Timedelta(days=1), periods=30, freq='D'):
+        t0 = time.perf_counter()
+        modes.append(predictor.actualizar_modelo(_font(df, dia))['mode'])
+        temps.append(time.perf_counter() - t0)
+    recompte = pd.Series(modes).value_counts().to_dict()
+    print(f"  modes: {recompte}  |  total {sum(temps):.2f} s  (mitjana {np.mean(temps) * 1000:.0f} ms/dia)")
+    X = df[FEATURES].to_numpy(dtype=float)[:500]
+    directe = np.maximum(predictor.model.predict(pd.DataFrame(X, columns=FEATURES)), 0)
+    print(f"  bosc compilat == scikit-learn després d'actualitzar: "
+          f"{np.abs(predictor.predecir_matriz(X[:200]) - directe[:200]).max():.0e}")
+
+    print("\n=== Deriva: panells degradats (-40% de producció) des de l'1 de juliol ===")
+    degradat = df.copy()
+    degradat.loc[degradat['fecha_hora'] >= inici, 'produccion_kwh'] *= 0.6
+    predictor = _entrenat(degradat, inici)
+    resultat = predictor.actualizar_modelo(_font(degradat, inici + pd.Timedelta(days=1)))
+    print(f"  ràtio MAE {resultat['ratio_mae']:.2f} -> mode '{resultat['mode']}' ({resultat['motiu']})")
+
+    print("\n=== Deriva: clima fora del rang d'entrenament ===")
+    calor = df.copy()
+    calor.loc[calor['fecha_hora'] >= inici, 'temperatura'] += 15
+    predictor = _entrenat(calor, inici)
+    resultat = predictor.actualizar_modelo(_font(calor, inici + pd.Timedelta(days=1)))
+    print(f"  fora de rang {resultat['fora_rang']['temperatura']:.0%} -> mode '{resultat['mode']}' "
+          f"({resultat['motiu']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+bench_entrenamiento_paralelo.py - Entrenament RL repartit entre processos
+OptiSolarAI - entrenar_paralelo() (mesos disjunts per worker) vs. entrenar_vectorizado()
+
+Execució:
+    python benchmarks/bench_entrenamiento_paralelo.py [anys]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _datos import generar_series
+from logic import SimuladorBateria
+from rl_engine import AgenteRL, entrenar_paralelo, entrenar_vectorizado
+
+
+def _beneficio(agente, df_prod, df_prec):
+    """Beneficio de la política greedy en el darrer any de la sèrie."""
+    sim = SimuladorBateria(10.0, 5.0, usar_rl=True)
+    sim.agente = agente
+    return sim.simular(df_prod.tail(8760), df_prec.tail(8760))['beneficio_total']
+
+
+def main():
+    anys = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    df_prod, df_prec = generar_series(n_dias=365 * anys)
+    carpeta = Path(tempfile.mkdtemp())
+    nuclis = os.cpu_count() or 1
+    rondas, epocas = 10, 40
+
+    print(f"=== {anys} anys d'històric, {nuclis} nuclis ===")
+    print("  Referència: un nucli entrenant un mes")
+    agente = AgenteRL(file_path=carpeta / "mes.pkl")
+    t0 = time.perf_counter()
+    entrenar_vectorizado(agente, df_prod.head(24 * 30), df_prec.head(24 * 30),
+                         epocas=rondas * epocas, semilla=0)
+    print(f"    {time.perf_counter() - t0:6.2f} s")
+
+    print("  Seqüencial: tot l'històric, mateixes èpoques totals en un procés")
+    agente = AgenteRL(file_path=carpeta / "seq.pkl")
+    t0 = time.perf_counter()
+    entrenar_vectorizado(agente, df_prod, df_prec, epocas=rondas * epocas * nuclis, semilla=0)
+    t_seq = time.perf_counter() - t0
+    print(f"    {t_seq:6.2f} s  beneficio greedy {_beneficio(agente, df_prod, df_prec):8.2f} €")
+
+    for workers in sorted({1, nuclis}):
+        agente = AgenteRL(file_path=carpeta / f"par{workers}.pkl")
+        t0 = time.perf_counter()
+        curva = entrenar_paralelo(agente, df_prod, df_prec, rondas=rondas,
+                                  epocas_por_ronda=epocas * nuclis // workers,
+                                  max_workers=workers, semilla=0)
+        t = time.perf_counter() - t0
+        print(f"  Paral·lel {workers} worker(s), {rondas} fusions: {t:6.2f} s "
+              f"(x{t_seq / t:.2f})  beneficio greedy {_beneficio(agente, df_prod, df_prec):8.2f} €")
+    print(f"    recompensa mitjana per ronda: "
+          f"{', '.join(f'{r:.2f}' for r in curva['recompensa_media'])}")
+
+
+if __name__ == '__main__':
+    main()
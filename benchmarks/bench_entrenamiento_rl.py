@@ -0,0 +1,77 @@
+"""
+bench_entrenamiento_rl.py - Entrenament Q-learning vectoritzat
+OptiSolarAI - entrenar_vectorizado() vs. èpoques seqüencials amb simular(entrenar_rl=True),
+i benefici de la política segons el nombre d'èpoques (valor per defecte de l'app)
+
+Execució:
+    python benchmarks/bench_entrenamiento_rl.py
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from _datos import generar_series
+from logic import SimuladorBateria
+from rl_engine import AgenteRL, entrenar_vectorizado
+
+
+def _beneficio_greedy(agente, df_prod, df_prec):
+    sim = SimuladorBateria(10.0, 5.0, usar_rl=True)
+    sim.agente = agente
+    agente.capacidad_bateria = 10.0
+    return sim.simular(df_prod, df_prec)['beneficio_total']
+
+
+def main():
+    df_prod, df_prec = generar_series(n_dias=365)
+    carpeta = Path(tempfile.mkdtemp())
+
+    print("=== Seqüencial: 5 èpoques d'un any (l'antic bucle d'app.py) ===")
+    sim = SimuladorBateria(10.0, 5.0, usar_rl=True)
+    sim.agente.file_path = carpeta / "seq"
+    np.random.seed(0)
+    t0 = time.perf_counter()
+    for _ in range(5):
+        sim.simular(df_prod, df_prec, entrenar_rl=True)
+    t_seq = time.perf_counter() - t0
+    hores = 5 * len(df_prod)
+    print(f"  {t_seq:6.2f} s  ({hores / t_seq:>12,.0f} hores-episodi/s)")
+    beneficio_seq = sim.simular(df_prod, df_prec)['beneficio_total']
+
+    print("\n=== Vectoritzat: 256 entorns x 1 dia per època ===")
+    for epocas in (1000, 5000):
+        agente = AgenteRL(file_path=carpeta / "vec.pkl")
+        t0 = time.perf_counter()
+        curva = entrenar_vectorizado(agente, df_prod, df_prec, epocas=epocas,
+                                     capacidades=[5.0, 10.0, 13.5], semilla=0)
+        t = time.perf_counter() - t0
+        hores = epocas * 256 * 24
+        print(f"  {epocas:>5} èpoques: {t:6.2f} s  ({hores / t:>12,.0f} hores-episodi/s)")
+
+    inici = curva['recompensa_media'].head(10).mean()
+    final = curva['recompensa_media'].tail(100).mean()
+    print(f"  recompensa mitjana diària: primeres 10 èpoques {inici:.2f} €, últimes 100 {final:.2f} €")
+
+    beneficio_vec = _beneficio_greedy(agente, df_prod, df_prec)
+    print(f"\n  Beneficio anual (política greedy): seqüencial {beneficio_seq:.2f} €, "
+          f"vectoritzat {beneficio_vec:.2f} €")
+
+    print("\n=== Beneficio anual segons les èpoques (3 llavors) ===")
+    for epocas in (10, 25, 50, 100, 300, 1000):
+        beneficios = []
+        t0 = time.perf_counter()
+        for semilla in range(3):
+            agente = AgenteRL(file_path=carpeta / f"ep{epocas}_{semilla}.pkl")
+            entrenar_vectorizado(agente, df_prod, df_prec, epocas=epocas,
+                                 capacidades=[5.0, 10.0, 13.5], semilla=semilla, guardar=False)
+            beneficios.append(_beneficio_greedy(agente, df_prod, df_prec))
+        t = (time.perf_counter() - t0) / 3
+        print(f"  {epocas:>5} èpoques: {t:6.2f} s  |  benefici {np.mean(beneficios):8.2f} € "
+              f"(mín {min(beneficios):.2f}, màx {max(beneficios):.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+bench_flota.py - Simulació d'una flota d'instal·lacions
+OptiSolarAI - simular_flota() amb milers de llars durant un any
+
+Execució:
+    python benchmarks/bench_flota.py [n_llars]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from _datos import generar_series
+from logic import SimuladorBateria, simular_flota
+
+
+def generar_flota(n_llars: int, seed: int = 0):
+    """Producció i consum per llar (float32) escalant una sèrie base."""
+    df_prod, df_prec = generar_series(n_dias=365)
+    rng = np.random.default_rng(seed)
+    base = df_prod['produccion_kwh'].to_numpy(dtype=np.float32)
+    escala = rng.uniform(0.5, 1.5, (n_llars, 1)).astype(np.float32)
+    produccion = base * escala
+    hores = np.arange(len(base)) % 24
+    perfil = (1.0 + 0.8 * np.exp(-((hores - 20) ** 2) / 8)).astype(np.float32)
+    consum = perfil * rng.uniform(1.0, 2.5, (n_llars, 1)).astype(np.float32)
+    capacitats = rng.choice([5.0, 10.0, 13.5, 20.0], n_llars)
+    return df_prod, df_prec, produccion, consum, capacitats
+
+
+def main():
+    n_llars = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    print("=== Paritat amb SimuladorBateria (5 llars) ===")
+    df_prod, df_prec, produccion, consum, capacitats = generar_flota(5)
+    flota = simular_flota(produccion, consum, df_prec['precio_kwh'].to_numpy(),
+                          capacitats, capacitats / 2)
+    for i in range(5):
+        df_i = df_prod.assign(produccion_kwh=produccion[i])
+        ref = SimuladorBateria(capacitats[i], capacitats[i] / 2).simular(
+            df_i, df_prec, consum[i].astype(float))
+        assert abs(ref['beneficio_total'] - flota['por_instalacion']['beneficio_total'][i]) < 1e-9
+    print("  beneficio_total coincident per a cada llar")
+
+    print(f"\n=== {n_llars:,} llars x 1 any ===")
+    df_prod, df_prec, produccion, consum, capacitats = generar_flota(n_llars)
+    print(f"  Entrades: {(produccion.nbytes + consum.nbytes) / 1e6:,.0f} MB (float32)")
+    for lot in (500, 2000):
+        t0 = time.perf_counter()
+        flota = simular_flota(produccion, consum, df_prec['precio_kwh'].to_numpy(),
+                              capacitats, capacitats / 2, tamano_lote=lot)
+        t = time.perf_counter() - t0
+        # La memòria de treball només depèn del lot: es mesura amb un sol lot
+        tracemalloc.start()
+        simular_flota(produccion[:lot], consum[:lot], df_prec['precio_kwh'].to_numpy(),
+                      capacitats[:lot], capacitats[:lot] / 2, tamano_lote=lot)
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  lot {lot:>5}: {t:6.1f} s  ({n_llars * len(df_prec) / t:>12,.0f} llar-hores/s)  "
+              f"memòria de treball {pic / 1e6:6.0f} MB")
+    print(f"  Beneficio flota: {flota['beneficio_total']:,.0f} €  "
+          f"cicles mitjans {flota['ciclos_medios']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
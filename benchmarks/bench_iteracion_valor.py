@@ -0,0 +1,82 @@
+"""
+bench_iteracion_valor.py - Iteració de valor sobre el MDP discretitzat vs. Q-learning
+OptiSolarAI - Temps de convergència i benefici de la política greedy resultant
+
+Entrenament amb 9 mesos d'històric i avaluació amb SimuladorBateria
+(política greedy, física contínua) sobre els 3 mesos següents.
+
+Execució:
+    python benchmarks/bench_iteracion_valor.py
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from _datos import generar_series
+from logic import SimuladorBateria
+from rl_engine import (AgenteRL, Discretizador, _series_entrenamiento, construir_mdp,
+                       entrenar_vectorizado, iteracion_valor)
+
+
+def _beneficio(agente, df_prod, df_prec):
+    sim = SimuladorBateria(10.0, 5.0, usar_rl=True)
+    sim.agente = agente
+    return sim.simular(df_prod.reset_index(drop=True), df_prec.reset_index(drop=True), 2.0)['beneficio_total']
+
+
+def main():
+    df_prod, df_prec = generar_series(n_dias=365)
+    entreno = df_prod['fecha_hora'] < pd.Timestamp('2026-10-01')
+    prod_ent, prec_ent = df_prod[entreno], df_prec[entreno]
+    prod_ev, prec_ev = df_prod[~entreno], df_prec[~entreno]
+    precios_ent = prec_ent['precio_kwh'].to_numpy(dtype=float)
+
+    heuristica = SimuladorBateria(10.0, 5.0, usar_rl=False).simular(
+        prod_ev.reset_index(drop=True), prec_ev.reset_index(drop=True), 2.0)['beneficio_total']
+    print(f"Referència heurística (sense RL): {heuristica:.2f} €")
+
+    discretitzadors = {
+        "fix (72)": Discretizador(),
+        "quantils 5 (120)": Discretizador.desde_precios(precios_ent, 5),
+        "24h, carga 10, q5": Discretizador.desde_precios(
+            precios_ent, 5, bordes={'hora': range(1, 24), 'carga': np.linspace(0.1, 0.9, 9)}),
+    }
+
+    print("\n=== Construcció del model (9 mesos, 8 càrregues per nivell) ===")
+    series = _series_entrenamiento(prod_ent, prec_ent)
+    for nom, disc in discretitzadors.items():
+        agente = AgenteRL(file_path="/nonexistent/agente", discretizador=disc)
+        t0 = time.perf_counter()
+        modelo = construir_mdp(agente, series)
+        t = time.perf_counter() - t0
+        print(f"  {nom:<18} {disc.n_estados:>5} estats  {len(modelo['origen']):>8,} transicions  {t * 1000:7.1f} ms")
+
+    print("\n=== Convergència i benefici (avaluació 3 mesos) ===")
+    print(f"  {'discretitzador':<18} {'mètode':<28} {'temps':>8} {'passades':>9} {'estats':>7} {'benefici':>10}")
+    for nom, disc in discretitzadors.items():
+        agente = AgenteRL(file_path="/nonexistent/agente", discretizador=disc)
+        t0 = time.perf_counter()
+        curva = iteracion_valor(agente, prod_ent, prec_ent, guardar=False)
+        t = time.perf_counter() - t0
+        print(f"  {nom:<18} {'iteració de valor':<28} {t:7.2f}s {len(curva):>9} "
+              f"{agente.estados_visitados():>7} {_beneficio(agente, prod_ev, prec_ev):9.2f} €")
+
+        for epocas in (300, 1000):
+            agente = AgenteRL(file_path="/nonexistent/agente", discretizador=disc)
+            t0 = time.perf_counter()
+            entrenar_vectorizado(agente, prod_ent, prec_ent, epocas=epocas, semilla=0, guardar=False)
+            t = time.perf_counter() - t0
+            print(f"  {'':<18} {f'epsilon-greedy {epocas} èpoques':<28} {t:7.2f}s {epocas:>9} "
+                  f"{agente.estados_visitados():>7} {_beneficio(agente, prod_ev, prec_ev):9.2f} €")
+
+    print("\n=== Sensibilitat a les càrregues de mostra (discretització fixa) ===")
+    for muestras in (1, 4, 8, 16):
+        agente = AgenteRL(file_path="/nonexistent/agente")
+        iteracion_valor(agente, prod_ent, prec_ent, muestras_carga=muestras, guardar=False)
+        print(f"  {muestras:>2} per nivell: {_beneficio(agente, prod_ev, prec_ev):8.2f} €")
+
+
+if __name__ == '__main__':
+    main()
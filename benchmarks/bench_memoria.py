@@ -0,0 +1,59 @@
+"""
+bench_memoria.py - Memòria de l'historial de simulació
+OptiSolarAI - Columnes tipades vs. llista de diccionaris (10 anys horaris)
+
+Execució:
+    python benchmarks/bench_memoria.py
+"""
+
+import tracemalloc
+
+import pandas as pd
+
+from _datos import generar_series
+from logic import SimuladorBateria
+
+
+def _pic_memoria(funcio) -> float:
+    """Retorna el pic de memòria (MB) reservat durant l'execució."""
+    tracemalloc.start()
+    funcio()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pic / 1e6
+
+
+def _historial_llista(detalles: pd.DataFrame):
+    """
+    Reprodueix el patró anterior: un dict per hora, DataFrame a partir
+    de la llista i tres filtres per etiqueta de decisió.
+    """
+    columnes = {col: detalles[col].tolist() for col in detalles.columns}
+    historial = [dict(zip(columnes, valors)) for valors in zip(*columnes.values())]
+    df = pd.DataFrame(historial)
+    return (df[df['decision'] == 'vender']['cantidad_kwh'].sum(),
+            df[df['decision'] == 'comprar']['cantidad_kwh'].sum(),
+            df[df['decision'] == 'cargar']['cantidad_kwh'].sum())
+
+
+def main():
+    df_prod, df_prec = generar_series(n_dias=365 * 10)
+    sim = SimuladorBateria(capacidad_bateria=10.0, carga_inicial=5.0)
+    detalles = sim.simular(df_prod, df_prec, consumo_base=2.0)['detalles']
+    n_hores = len(detalles)
+
+    print(f"=== Historial de {n_hores:,} hores ===")
+    mb_columnes = sum(arr.nbytes for arr in sim.historial.values()) / 1e6
+    mb_detalles = detalles.memory_usage(deep=True).sum() / 1e6
+    print(f"  Columnes tipades (sim.historial):  {mb_columnes:8.1f} MB")
+    print(f"  DataFrame de detalles:             {mb_detalles:8.1f} MB")
+
+    print("\n=== Pic de memòria (tracemalloc) ===")
+    pic_sim = _pic_memoria(lambda: sim.simular(df_prod, df_prec, consumo_base=2.0))
+    pic_llista = _pic_memoria(lambda: _historial_llista(detalles))
+    print(f"  simular() complet amb columnes tipades: {pic_sim:8.1f} MB")
+    print(f"  només l'historial com a llista de dicts: {pic_llista:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
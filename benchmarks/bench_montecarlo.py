@@ -0,0 +1,39 @@
+"""
+bench_montecarlo.py - Simulació Monte Carlo del simulador de bateria
+OptiSolarAI - Trajectòries per segon i reproductibilitat entre processos
+
+Execució:
+    python benchmarks/bench_montecarlo.py
+"""
+
+import os
+import time
+
+from _datos import generar_series
+from logic import simular_montecarlo
+
+
+def main():
+    df_prod, df_prec = generar_series(n_dias=365)
+
+    print("=== 1.000 trajectòries d'un any ===")
+    t0 = time.perf_counter()
+    res = simular_montecarlo(df_prod, df_prec, n_trayectorias=1000, semilla=7)
+    t = time.perf_counter() - t0
+    print(f"  Temps: {t:.2f} s  ({1000 / t:,.0f} trajectòries/s)")
+    print(f"  Beneficio mitjà: {res['beneficio_medio']:.2f} €   "
+          f"P(pèrdues): {res['prob_perdidas']:.1%}")
+    print(res['percentiles'].round(2).to_string())
+
+    print("\n=== Reproductibilitat amb diversos processos ===")
+    workers = max(2, min(4, os.cpu_count() or 1))
+    t0 = time.perf_counter()
+    res_par = simular_montecarlo(df_prod, df_prec, n_trayectorias=1000, semilla=7,
+                                 max_workers=workers)
+    t = time.perf_counter() - t0
+    iguals = res_par['trayectorias'].equals(res['trayectorias'])
+    print(f"  {workers} processos: {t:.2f} s  resultats idèntics: {iguals}")
+
+
+if __name__ == '__main__':
+    main()
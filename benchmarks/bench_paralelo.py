@@ -0,0 +1,65 @@
+"""
+bench_paralelo.py - Escalat del simulador en un pool de processos
+OptiSolarAI - ejecutar_escenarios_paralelo() de 1 a N nuclis
+
+Execució:
+    python benchmarks/bench_paralelo.py
+"""
+
+import os
+
+from _datos import generar_series, cronometrar
+from logic import SimuladorBateria, ejecutar_escenarios_paralelo
+
+
+def main():
+    df_prod, df_prec = generar_series(n_dias=365 * 3)
+    escenarios = [
+        {'capacidad_bateria': cap, 'carga_inicial': cap / 2, 'consumo_base': consumo}
+        for cap in (5.0, 10.0, 15.0, 20.0)
+        for consumo in (1.0, 1.5, 2.0, 2.5)
+    ]
+
+    print(f"=== Paritat ({len(escenarios)} escenaris, 3 anys) ===")
+    taula = ejecutar_escenarios_paralelo(df_prod, df_prec, escenarios, max_workers=2)
+    for fila, params in zip(taula.itertuples(), escenarios):
+        params = dict(params)
+        consumo = params.pop('consumo_base')
+        ref = SimuladorBateria(**params).simular(df_prod, df_prec, consumo_base=consumo)
+        assert ref['beneficio_total'] == fila.beneficio_total
+    print("  beneficio_total idèntic a l'execució seqüencial, en el mateix ordre")
+
+    taula_anys = ejecutar_escenarios_paralelo(df_prod, df_prec, escenarios[:2], periodo='Y')
+    print(f"  Trams anuals: {len(taula_anys)} files "
+          f"({taula_anys['periodo_inicio'].dt.year.tolist()})")
+    # La càrrega passa d'un tram al següent: la suma dels trams és l'execució completa
+    sumes = taula_anys.groupby('escenario')[['beneficio_total', 'energia_vendida_total',
+                                              'ciclos_rainflow', 'coste_desgaste']].sum()
+    finals = taula_anys.groupby('escenario')[['carga_final', 'degradacion_capacidad_pct']].last()
+    for i, fila in taula.head(2).iterrows():
+        print(f"  escenari {i}: suma dels trams vs. execució completa  "
+              f"benefici {sumes.loc[i, 'beneficio_total']:.6f} / {fila.beneficio_total:.6f}  "
+              f"venuda {sumes.loc[i, 'energia_vendida_total']:.3f} / {fila.energia_vendida_total:.3f}  "
+              f"cicles rainflow {sumes.loc[i, 'ciclos_rainflow']:.2f} / {fila.ciclos_rainflow:.2f}  "
+              f"càrrega final {finals.loc[i, 'carga_final']:.3f} / {fila.carga_final:.3f}")
+
+    print("\n=== Escalat ===")
+    n_hores = len(df_prod) * len(escenarios)
+    t_seq = cronometrar(lambda: [
+        SimuladorBateria(capacidad_bateria=p['capacidad_bateria'],
+                         carga_inicial=p['carga_inicial']).simular(df_prod, df_prec, p['consumo_base'])
+        for p in escenarios
+    ], repeticions=1)
+    print(f"  seqüencial:  {t_seq:6.2f} s  ({n_hores / t_seq:>10,.0f} h/s)")
+    nuclis = os.cpu_count() or 1
+    for workers in sorted({1, 2, 4, 8, nuclis}):
+        if workers > nuclis:
+            continue
+        t = cronometrar(lambda: ejecutar_escenarios_paralelo(
+            df_prod, df_prec, escenarios, max_workers=workers), repeticions=1)
+        print(f"  {workers:>2} workers:  {t:6.2f} s  ({n_hores / t:>10,.0f} h/s, "
+              f"speedup {t_seq / t:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
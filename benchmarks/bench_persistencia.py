@@ -0,0 +1,96 @@
+"""
+bench_persistencia.py - Format de persistència dels models
+OptiSolarAI - Temps de càrrega i memòria resident: pickle vs. artefacte .npy + manifest
+
+Execució:
+    python benchmarks/bench_persistencia.py [files_entrenament]
+"""
+
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from _datos import generar_meteo
+
+
+def _rss_kb() -> int:
+    with open('/proc/self/status') as f:
+        for linia in f:
+            if linia.startswith('VmRSS:'):
+                return int(linia.split()[1])
+    return 0
+
+
+def _carregar(mode: str, ruta: str):
+    """Càrrega en un procés nou: imprimeix segons i increment de RSS (MB)."""
+    from ml_engine import SolarPredictor
+    from model_store import cargar_artefacto
+
+    rss0 = _rss_kb()
+    t0 = time.perf_counter()
+    if mode == 'pickle':
+        with open(ruta, 'rb') as f:
+            model = pickle.load(f)['model']
+    elif mode == 'artefacte':
+        predictor = SolarPredictor(ruta)
+        predictor.cargar_modelo()
+        model = predictor.model
+    else:
+        arrays, _ = cargar_artefacto(ruta, 'solar_predictor', mmap=True)
+        model = arrays
+    t = time.perf_counter() - t0
+    print(f"{t} {(_rss_kb() - rss0) / 1024}")
+    return model
+
+
+def _mesurar(mode: str, ruta: Path, repeticions: int = 3):
+    mesures = []
+    for _ in range(repeticions):
+        sortida = subprocess.run([sys.executable, __file__, '--carregar', mode, str(ruta)],
+                                 capture_output=True, text=True, check=True).stdout.split()
+        mesures.append((float(sortida[-2]), float(sortida[-1])))
+    return min(m[0] for m in mesures), np.median([m[1] for m in mesures])
+
+
+def main():
+    from ml_engine import SolarPredictor
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    df = generar_meteo(n)
+
+    carpeta = Path(tempfile.mkdtemp())
+    predictor = SolarPredictor(carpeta / "solar_predictor")
+    predictor.entrenar_modelo(df)
+    ruta_pickle = carpeta / "solar_predictor.pkl"
+    with open(ruta_pickle, 'wb') as f:
+        pickle.dump({'model': predictor.model, 'feature_importance': predictor.feature_importance,
+                     'metrics': predictor.metrics}, f)
+
+    mida_artefacte = sum(p.stat().st_size for p in predictor.model_path.iterdir())
+    print(f"=== Random Forest (100 arbres, {n:,} files d'entrenament) ===")
+    print(f"  Mida: pickle {ruta_pickle.stat().st_size / 1e6:6.1f} MB  |  artefacte {mida_artefacte / 1e6:6.1f} MB")
+
+    carregat = SolarPredictor(predictor.model_path)
+    carregat.cargar_modelo()
+    X = df[['temperatura', 'nubosidad', 'humedad', 'radiacion']].head(5000)
+    print(f"  Prediccions idèntiques després de recarregar: "
+          f"{np.array_equal(predictor.model.predict(X), carregat.model.predict(X))}")
+
+    print("\n  Càrrega en un procés nou (millor de 3, increment de RSS):")
+    for mode, ruta, nom in (('pickle', ruta_pickle, 'pickle.load'),
+                            ('artefacte', predictor.model_path, 'artefacte -> RandomForest'),
+                            ('mmap', predictor.model_path, 'artefacte, només arrays mmap')):
+        t, rss = _mesurar(mode, ruta)
+        print(f"    {nom:<30} {t * 1000:8.1f} ms  {rss:7.1f} MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--carregar':
+        _carregar(sys.argv[2], sys.argv[3])
+    else:
+        main()
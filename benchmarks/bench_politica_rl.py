@@ -0,0 +1,71 @@
+"""
+bench_politica_rl.py - Avaluació de la política RL precompilada
+OptiSolarAI - simular(entrenar_rl=False) amb taula d'accions vs. bucle hora a hora
+
+Execució:
+    python benchmarks/bench_politica_rl.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from _datos import generar_series, cronometrar
+from logic import SimuladorBateria
+from rl_engine import AgenteRL
+
+
+def _evaluar_referencia(sim: SimuladorBateria, df_prod: pd.DataFrame, df_prec: pd.DataFrame,
+                        consumo_base: float = 2.0):
+    """
+    Camí anterior: _get_estado, argmax i física per hora amb cadenes de decisió.
+    """
+    df = pd.merge(df_prod, df_prec, on='fecha_hora').sort_values('fecha_hora')
+    horas = df['fecha_hora'].dt.hour.tolist()
+    carga = sim.carga_inicial
+    beneficio = 0.0
+    for hora, produccion, precio in zip(horas, df['produccion_kwh'].tolist(), df['precio_kwh'].tolist()):
+        energia = produccion - consumo_base
+        _, decision, cantidad = sim._tomar_decision_rl(hora, energia, carga, precio,
+                                                       precio * sim.precio_venta_factor, False)
+        carga, coste = sim._ejecutar_accion(decision, cantidad, carga, precio, precio * sim.precio_venta_factor)
+        beneficio += coste
+    return beneficio
+
+
+def main():
+    df_prod, df_prec = generar_series(n_dias=365)
+    agente = AgenteRL(file_path="/nonexistent/agente")
+    agente.q_table = np.random.default_rng(0).normal(size=agente.q_table.shape)
+
+    sim = SimuladorBateria(10.0, 5.0, usar_rl=True)
+    sim.agente = agente
+
+    print("=== Avaluació RL d'un any (8.760 h) ===")
+    referencia = _evaluar_referencia(sim, df_prod, df_prec)
+    resultat = sim.simular(df_prod, df_prec)
+    print(f"  Beneficio: referència {referencia:.10f} €  |  política compilada {resultat['beneficio_total']:.10f} €")
+
+    t_ref = cronometrar(lambda: _evaluar_referencia(sim, df_prod, df_prec))
+    t_sim = cronometrar(lambda: sim.simular(df_prod, df_prec))
+    df = pd.merge(df_prod, df_prec, on='fecha_hora')
+    energia = df['produccion_kwh'].to_numpy(dtype=float) - 2.0
+    precios = df['precio_kwh'].to_numpy(dtype=float)
+    fechas = df['fecha_hora'].to_numpy()
+    t_nucli = cronometrar(lambda: sim._evaluar_politica_rl(fechas, energia, precios, 5.0, 0.0))
+    print(f"  Bucle hora a hora:              {t_ref * 1000:7.1f} ms")
+    print(f"  simular() amb política:         {t_sim * 1000:7.1f} ms  (x{t_ref / t_sim:.1f})")
+    print(f"  Nucli _evaluar_politica_rl:     {t_nucli * 1000:7.1f} ms  (x{t_ref / t_nucli:.1f})")
+
+    print("\n=== Discretitzador vectoritzat ===")
+    n = 1_000_000
+    rng = np.random.default_rng(1)
+    horas, cargas = rng.integers(0, 24, n), rng.uniform(0, 10, n)
+    precios, energias = rng.uniform(0.05, 0.25, n), rng.normal(0, 2, n)
+    t = cronometrar(lambda: agente.estados_batch(horas, cargas, precios, energias))
+    lista = list(zip(horas.tolist(), cargas.tolist(), precios.tolist(), energias.tolist()))[:100_000]
+    t_esc = cronometrar(lambda: [agente._get_estado(*fila) for fila in lista], repeticions=1) * 10
+    print(f"  estados_batch: {t * 1e9 / n:5.1f} ns/estat  |  _get_estado: {t_esc * 1e9 / n:6.1f} ns/estat")
+
+
+if __name__ == '__main__':
+    main()
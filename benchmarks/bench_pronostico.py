@@ -0,0 +1,78 @@
+"""
+bench_pronostico.py - Previsió de 7 dies per lots
+OptiSolarAI - generar_pronostico_7dias(): 168 crides a predecir() vs. una sola matriu
+
+Execució:
+    python benchmarks/bench_pronostico.py
+"""
+
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from _datos import generar_meteo, cronometrar
+from ml_engine import SolarPredictor, generar_pronostico_7dias
+
+
+def _radiacio_referencia(hora, nubosidad):
+    if 6 <= hora <= 18:
+        return max(0, 1000 * np.sin((hora - 6) * np.pi / 12) * (1 - (nubosidad / 100) * 0.7))
+    return 0.0
+
+
+def _pronostic_referencia(predictor):
+    """
+    Camí anterior: un DataFrame d'una fila i una crida al bosc per hora.
+    Retorna la producció diària i la matriu (dies, hores).
+    """
+    np.random.seed(int(datetime.now().strftime('%j')))
+    usar_model = predictor is not None and predictor.model is not None
+    totals, hores = [], []
+    for d in range(1, 8):
+        nubositat = int(np.clip(np.random.normal(35, 25), 0, 100))
+        humitat = int(np.clip(np.random.normal(55, 15), 20, 90))
+        temp_mitja = round(16 + 5 * np.sin(d * np.pi / 7) + np.random.uniform(-2, 2), 1)
+        np.random.uniform(3, 6), np.random.uniform(4, 8)
+        produccio = []
+        for h in range(24):
+            radiacio = _radiacio_referencia(h, nubositat)
+            if usar_model:
+                kwh = predictor.predecir(temp_mitja, nubositat, humitat, radiacio)
+            else:
+                kwh = max(0, 5.5 * np.sin((h - 6) * np.pi / 12) * (1 - nubositat / 100 * 0.7)
+                          + np.random.uniform(-0.2, 0.2))
+            produccio.append(round(kwh, 3))
+        totals.append(round(sum(produccio), 2))
+        hores.append(produccio)
+    return np.array(totals), np.array(hores)
+
+
+def main():
+    predictor = SolarPredictor(Path(tempfile.mkdtemp()) / "solar_predictor")
+    predictor.entrenar_modelo(generar_meteo(20_000))
+
+    print("=== Previsió de 7 dies (168 hores) ===")
+    for nom, p in (("heurística", None), ("Random Forest", predictor)):
+        totals, hores = _pronostic_referencia(p)
+        diari, horari = generar_pronostico_7dias(p, horari=True)
+        iguals_dia = np.array_equal(diari['produccio_estimada_kwh'].to_numpy(), totals)
+        maxim = np.abs(horari['produccion_predicha'].to_numpy().reshape(7, 24) - hores).max()
+
+        t_ref = cronometrar(lambda: _pronostic_referencia(p))
+        t_lot = cronometrar(lambda: generar_pronostico_7dias(p))
+        t_horari = cronometrar(lambda: generar_pronostico_7dias(p, horari=True))
+        print(f"  {nom}:")
+        print(f"    totals diaris idèntics: {iguals_dia}  |  màx. diferència horària: {maxim:.0e} kWh")
+        print(f"    hora a hora:               {t_ref * 1000:8.2f} ms")
+        print(f"    una matriu:                {t_lot * 1000:8.2f} ms  (x{t_ref / t_lot:.1f})")
+        print(f"    una matriu + taula horària:{t_horari * 1000:8.2f} ms")
+
+    _, horari = generar_pronostico_7dias(predictor, horari=True)
+    print(f"\n  Taula horària: {len(horari)} files, {horari['fecha_hora'].iloc[0]:%Y-%m-%d %H:%M} -> "
+          f"{horari['fecha_hora'].iloc[-1]:%Y-%m-%d %H:%M}, columnes {list(horari.columns)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+bench_qtable.py - Q-table densa vs. diccionari
+OptiSolarAI - Cost per pas d'elegir_accion() + aprender() i migració de taules antigues
+
+Execució:
+    python benchmarks/bench_qtable.py
+"""
+
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import _datos  # noqa: F401  (afegeix l'arrel del projecte a sys.path)
+from rl_engine import AgenteRL, N_ESTADOS, decodificar_estado
+
+
+class _AgenteDiccionari(AgenteRL):
+    """
+    Q-table original: dict de tuples amb un np.zeros(5) per estat,
+    conservada com a referència de rendiment i de resultats.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.q_table = {}
+
+    def _get_estado(self, hora, carga_actual, precio_actual, energia_disponible):
+        return decodificar_estado(super()._get_estado(hora, carga_actual, precio_actual, energia_disponible))
+
+    def elegir_accion(self, estado, is_training=True):
+        if estado not in self.q_table:
+            self.q_table[estado] = np.zeros(len(self.acciones))
+        if is_training and np.random.uniform(0, 1) < self.epsilon:
+            return np.random.choice(len(self.acciones))
+        return np.argmax(self.q_table[estado])
+
+    def aprender(self, estado, accion_idx, recompensa, siguiente_estado):
+        if estado not in self.q_table:
+            self.q_table[estado] = np.zeros(len(self.acciones))
+        if siguiente_estado not in self.q_table:
+            self.q_table[siguiente_estado] = np.zeros(len(self.acciones))
+        antiguo_valor = self.q_table[estado][accion_idx]
+        siguiente_max = np.max(self.q_table[siguiente_estado])
+        self.q_table[estado][accion_idx] = ((1 - self.alpha) * antiguo_valor
+                                            + self.alpha * (recompensa + self.gamma * siguiente_max))
+
+
+def _transiciones(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    horas = rng.integers(0, 24, n)
+    cargas = rng.uniform(0, 10, n)
+    precios = rng.uniform(0.05, 0.25, n)
+    energias = rng.normal(0, 2, n)
+    recompensas = rng.normal(0, 0.3, n)
+    return horas.tolist(), cargas.tolist(), precios.tolist(), energias.tolist(), recompensas.tolist()
+
+
+def _entrenar(agente, horas, cargas, precios, energias, recompensas):
+    np.random.seed(0)
+    estado = agente._get_estado(horas[0], cargas[0], precios[0], energias[0])
+    for i in range(1, len(horas)):
+        accion = agente.elegir_accion(estado)
+        siguiente = agente._get_estado(horas[i], cargas[i], precios[i], energias[i])
+        agente.aprender(estado, accion, recompensas[i], siguiente)
+        estado = siguiente
+
+
+def main():
+    n = 200_000
+    datos = _transiciones(n)
+    ruta = Path(tempfile.mkdtemp()) / "q.pkl"
+
+    dens = AgenteRL(file_path=ruta)
+    dicc = _AgenteDiccionari(file_path=ruta)
+
+    print(f"=== {n:,} passos elegir_accion + aprender ===")
+    for nom, agente in (("diccionari", dicc), ("densa", dens)):
+        t0 = time.perf_counter()
+        _entrenar(agente, *datos)
+        t = time.perf_counter() - t0
+        print(f"  {nom:<11} {t * 1e6 / n:6.2f} µs/pas")
+
+    print("\n=== Paritat i migració ===")
+    with open(ruta, 'wb') as f:
+        pickle.dump(dicc.q_table, f)
+    migrat = AgenteRL(file_path=ruta)
+    migrat.cargar_modelo()
+    print(f"  estats visitats: {len(dicc.q_table)}/{N_ESTADOS}")
+    print(f"  taula migrada == taula densa: {np.allclose(migrat.q_table, dens.q_table)}")
+
+    print("\n=== Operacions per lots ===")
+    horas, cargas, precios, energias, recompensas = (np.asarray(v) for v in datos)
+    t0 = time.perf_counter()
+    estados = dens.estados_batch(horas, cargas, precios, energias)
+    acciones = dens.elegir_acciones(estados[:-1], rng=np.random.default_rng(0))
+    dens.aprender_batch(estados[:-1], acciones, recompensas[1:], estados[1:])
+    t = time.perf_counter() - t0
+    print(f"  estats + acció + Bellman: {t * 1e9 / n:6.1f} ns/transició")
+
+
+if __name__ == '__main__':
+    main()
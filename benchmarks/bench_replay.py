@@ -0,0 +1,62 @@
+"""
+bench_replay.py - Experience replay de l'agent RL
+OptiSolarAI - Cost d'inserció i mostreig del buffer circular i eficiència de mostra
+
+Execució:
+    python benchmarks/bench_replay.py
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from _datos import generar_series
+from logic import SimuladorBateria
+from rl_engine import AgenteRL, BufferExperiencia
+
+
+def _entrenar(df_prod, df_prec, passades, frecuencia_replay, ruta):
+    sim = SimuladorBateria(10.0, 5.0, usar_rl=True)
+    sim.agente = AgenteRL(file_path=ruta)
+    sim.agente.frecuencia_replay = frecuencia_replay
+    sim.agente._rng = np.random.default_rng(0)
+    np.random.seed(0)
+    t0 = time.perf_counter()
+    for _ in range(passades):
+        sim.simular(df_prod, df_prec, entrenar_rl=True)
+    t = time.perf_counter() - t0
+    return t, sim.simular(df_prod, df_prec)['beneficio_total']
+
+
+def main():
+    n = 1_000_000
+    buffer = BufferExperiencia(100_000)
+    rng = np.random.default_rng(0)
+    t0 = time.perf_counter()
+    for i in range(n):
+        buffer.agregar(i % 72, i % 5, 0.1, (i + 1) % 72)
+    t_ins = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(10_000):
+        buffer.muestrear(32, rng)
+    t_mos = time.perf_counter() - t0
+    print("=== Buffer circular (100.000 transicions) ===")
+    print(f"  inserció: {t_ins * 1e6 / n:5.2f} µs  |  minibatch de 32: {t_mos * 1e6 / 10_000:5.2f} µs")
+
+    df_prod, df_prec = generar_series(n_dias=365)
+    carpeta = Path(tempfile.mkdtemp())
+    print("\n=== Eficiència de mostra (beneficio greedy en l'any d'entrenament) ===")
+    for passades in (1, 3):
+        for frecuencia, nom in ((0, "sense replay"), (4, "replay 32/4 passos"), (1, "replay 32/pas")):
+            t, beneficio = _entrenar(df_prod, df_prec, passades, frecuencia, carpeta / f"{frecuencia}.pkl")
+            print(f"  {passades} passada(es), {nom:<19} {t:6.2f} s  {beneficio:8.2f} €")
+
+    agente = AgenteRL(file_path=carpeta / "4.pkl")
+    agente.cargar_modelo()
+    print(f"\n  Buffer restaurat des de {agente.ruta_replay.name}: {len(agente.replay)} transicions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+bench_simulador.py - Rendiment del simulador de bateria
+OptiSolarAI - Hores simulades per segon (nucli d'arrays vs. iterrows)
+
+Execució:
+    python benchmarks/bench_simulador.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from _datos import generar_series, cronometrar
+from logic import SimuladorBateria
+
+
+def _simular_referencia(sim: SimuladorBateria, df_produccion: pd.DataFrame,
+                        df_precios: pd.DataFrame, consumo_base: float = 2.0):
+    """
+    Bucle original basat en iterrows() (només heurística), conservat
+    com a referència de rendiment i de resultats.
+    """
+    df = pd.merge(df_produccion, df_precios, on='fecha_hora', how='inner')
+    df = df.sort_values('fecha_hora').reset_index(drop=True)
+
+    carga_actual = sim.carga_inicial
+    beneficio = 0.0
+    decisiones = []
+    for idx, row in df.iterrows():
+        precio_compra = row['precio_kwh']
+        precio_venta = precio_compra * sim.precio_venta_factor
+        energia_disponible = row['produccion_kwh'] - consumo_base
+        df_futuro = df.iloc[idx:idx+24] if idx+24 < len(df) else df.iloc[idx:]
+        precio_medio_futuro = df_futuro['precio_kwh'].head(6).mean()
+
+        if energia_disponible > 0:
+            espacio_disponible = sim.capacidad_bateria - carga_actual
+            if espacio_disponible > 0.1 and precio_compra < precio_medio_futuro * 1.2:
+                decision, cantidad = 'cargar', min(energia_disponible, espacio_disponible) * sim.eficiencia_carga
+            else:
+                decision, cantidad = 'vender', energia_disponible
+        else:
+            deficit = abs(energia_disponible)
+            if carga_actual > 1.0 and (precio_compra > precio_medio_futuro * 0.9
+                                       or carga_actual > sim.capacidad_bateria * 0.7):
+                decision, cantidad = 'descargar', min(deficit, carga_actual) * sim.eficiencia_descarga
+            else:
+                decision, cantidad = 'comprar', deficit
+
+        carga_actual, coste = sim._ejecutar_accion(decision, cantidad, carga_actual,
+                                                   precio_compra, precio_venta)
+        beneficio += coste
+        decisiones.append(decision)
+
+    return beneficio, decisiones
+
+
+def main():
+    print("=== Paritat amb el bucle iterrows (1 any) ===")
+    df_prod, df_prec = generar_series(n_dias=365)
+    sim = SimuladorBateria(capacidad_bateria=10.0, carga_inicial=5.0)
+    resultat = sim.simular(df_prod, df_prec, consumo_base=2.0)
+    beneficio_ref, decisiones_ref = _simular_referencia(sim, df_prod, df_prec, 2.0)
+    decisiones_iguals = resultat['detalles']['decision'].astype(str).tolist() == decisiones_ref
+    print(f"  Decisions idèntiques: {decisiones_iguals}")
+    print(f"  Beneficio total: {resultat['beneficio_total']:.10f} vs {beneficio_ref:.10f} "
+          f"(idèntic: {resultat['beneficio_total'] == beneficio_ref})")
+
+    print("\n=== Throughput (hores simulades / s) ===")
+    n_hores = len(df_prod)
+    t_ref = cronometrar(lambda: _simular_referencia(sim, df_prod, df_prec, 2.0), repeticions=1)
+    print(f"  iterrows (1 any):      {n_hores / t_ref:>12,.0f} h/s  ({t_ref:.3f} s)")
+    for anys in (1, 5, 10):
+        df_prod, df_prec = generar_series(n_dias=365 * anys)
+        n_hores = len(df_prod)
+        t = cronometrar(lambda: sim.simular(df_prod, df_prec, consumo_base=2.0))
+        print(f"  nucli arrays ({anys:>2} anys): {n_hores / t:>12,.0f} h/s  ({t:.3f} s)")
+
+    print("\n=== Horitzó de preus (1 any) ===")
+    df_prod, df_prec = generar_series(n_dias=365)
+    n_hores = len(df_prod)
+    for horizonte in (6, 24, 48):
+        sim_h = SimuladorBateria(capacidad_bateria=10.0, carga_inicial=5.0,
+                                 horizonte_precios=horizonte)
+        t = cronometrar(lambda: sim_h.simular(df_prod, df_prec, consumo_base=2.0))
+        print(f"  horitzó {horizonte:>2} h:         {n_hores / t:>12,.0f} h/s  ({t:.3f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -23,6 +23,14 @@ MODEL_PARAMS = {
     'min_samples_leaf': 2,
     'random_state': 42
 }
+# Espacio de búsqueda de ml_engine.ajustar_hiperparametres (valores por parámetro)
+ESPAI_HIPERPARAMETRES = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [8, 12, 15, None],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': [1.0, 0.5]
+}
 
 
 # ============================================================================
@@ -35,7 +43,10 @@ BATERIA_CONFIG = {
     'eficiencia_carga': 0.95,       # 95%
     'eficiencia_descarga': 0.95,    # 95%
     'precio_venta_factor': 0.8,     # 80% del precio de compra
-    'vida_util_ciclos': 5000        # ciclos de vida útil
+    'vida_util_ciclos': 5000,       # ciclos de vida útil al 100% de profundidad
+    'exponente_profundidad': 1.5,   # curva de Wöhler: ciclos = vida * DoD^-exponente
+    'capacidad_fin_vida': 0.8,      # fracción de capacidad al final de la vida útil
+    'coste_reposicion': 4500.0      # € para sustituir la batería
 }
 
 
@@ -69,6 +69,18 @@ def _initialize_tables(conn):
         )
     """)
 
+    # Taula d'estats reanudables de simulació (un per instal·lació)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS estados_simulacion (
+            instalacion VARCHAR PRIMARY KEY,
+            fecha_actualizacion TIMESTAMP,
+            ultima_fecha_hora TIMESTAMP,
+            carga_bateria DOUBLE,
+            beneficio_acumulado DOUBLE,
+            estado TEXT
+        )
+    """)
+
     # Taula de registre de consum del llar (NOVA UD1B)
     conn.execute("""
         CREATE TABLE IF NOT EXISTS registre_consum (
@@ -140,6 +152,7 @@ def insert_consum(data: str, hora: int, categoria: str,
         INSERT INTO registre_consum (id, data, hora, categoria, electrodomestic, kwh, hora_punta)
         VALUES (?, ?, ?, ?, ?, ?, ?)
     """, [nou_id, data, hora, categoria, electrodomestic, kwh, hora_punta])
+    _invalidar_perfils_consum()
 
 
 def delete_consum(consum_id: int):
@@ -148,6 +161,7 @@ def delete_consum(consum_id: int):
     """
     conn = get_database_connection()
     conn.execute("DELETE FROM registre_consum WHERE id = ?", [consum_id])
+    _invalidar_perfils_consum()
 
 
 def reset_datos_demo() -> dict:
@@ -224,6 +238,21 @@ def get_clima(fecha_inicio: datetime, fecha_fin: datetime) -> pd.DataFrame:
         return pd.DataFrame(columns=['fecha_hora', 'temperatura', 'nubosidad', 'humedad'])
 
 
+_SELECT_DATOS_COMPLETOS = """
+    SELECT
+        p.fecha_hora,
+        p.precio_kwh,
+        ps.produccion_kwh,
+        ps.radiacion,
+        c.temperatura,
+        c.nubosidad,
+        c.humedad
+    FROM precios_luz p
+    LEFT JOIN produccion_solar ps ON p.fecha_hora = ps.fecha_hora
+    LEFT JOIN clima c ON p.fecha_hora = c.fecha_hora
+"""
+
+
 def get_datos_completos(fecha_inicio: datetime, fecha_fin: datetime) -> pd.DataFrame:
     """
     Obté totes les dades combinades mitjançant JOIN.
@@ -231,18 +260,8 @@ def get_datos_completos(fecha_inicio: datetime, fecha_fin: datetime) -> pd.DataF
     """
     try:
         conn = get_database_connection()
-        query = """
-            SELECT
-                p.fecha_hora,
-                p.precio_kwh,
-                ps.produccion_kwh,
-                ps.radiacion,
-                c.temperatura,
-                c.nubosidad,
-                c.humedad
-            FROM precios_luz p
-            LEFT JOIN produccion_solar ps ON p.fecha_hora = ps.fecha_hora
-            LEFT JOIN clima c ON p.fecha_hora = c.fecha_hora
+        query = f"""
+            {_SELECT_DATOS_COMPLETOS}
             WHERE p.fecha_hora BETWEEN ? AND ?
             ORDER BY p.fecha_hora
         """
@@ -251,6 +270,26 @@ def get_datos_completos(fecha_inicio: datetime, fecha_fin: datetime) -> pd.DataF
         return pd.DataFrame()
 
 
+def get_datos_posteriores(marca: datetime = None) -> pd.DataFrame:
+    """
+    Obté les dades combinades (com get_datos_completos) estrictament
+    posteriors a `marca`, o tot l'històric si és None.
+    Útil per a l'entrenament incremental del model de ML.
+    """
+    try:
+        conn = get_database_connection()
+        if marca is None:
+            return conn.execute(f"{_SELECT_DATOS_COMPLETOS} ORDER BY p.fecha_hora").df()
+        query = f"""
+            {_SELECT_DATOS_COMPLETOS}
+            WHERE p.fecha_hora > ?
+            ORDER BY p.fecha_hora
+        """
+        return conn.execute(query, [marca]).df()
+    except Exception:
+        return pd.DataFrame()
+
+
 def get_consum_per_periode(data_inici: str = None, data_fi: str = None) -> pd.DataFrame:
     """
     Obté tots els registres de consum, opcionalment filtrats per dates.
@@ -302,6 +341,56 @@ def get_consum_per_categoria() -> pd.DataFrame:
         return pd.DataFrame(columns=['categoria', 'total_kwh', 'num_registres'])
 
 
+@st.cache_data
+def get_perfil_consum() -> pd.DataFrame:
+    """
+    Agrega el registre de consum en un perfil setmanal (dia de la setmana x hora).
+
+    El consum d'una hora és la suma dels electrodomèstics registrats; el
+    perfil és la mitjana sobre els dies registrats de cada dia de la
+    setmana. Les franges sense cap registre queden a NULL (NaN). És consum
+    addicional al consum base (vegeu logic.alinear_consumo).
+    Resultat en caché fins que insert_consum() o delete_consum() modifiquen la taula.
+
+    Returns:
+        DataFrame amb 168 files i columnes ['dia_setmana', 'hora', 'consum_kwh']
+        (dia_setmana: 0 = dilluns ... 6 = diumenge)
+    """
+    try:
+        conn = get_database_connection()
+        return conn.execute("""
+            WITH graella AS (
+                SELECT d.dia_setmana, h.hora
+                FROM range(7) d(dia_setmana), range(24) h(hora)
+            ),
+            dies AS (
+                SELECT isodow(data) - 1 AS dia_setmana, COUNT(DISTINCT data) AS n_dies
+                FROM registre_consum
+                GROUP BY 1
+            ),
+            totals AS (
+                SELECT isodow(data) - 1 AS dia_setmana, hora, SUM(kwh) AS kwh
+                FROM registre_consum
+                GROUP BY 1, 2
+            )
+            SELECT
+                g.dia_setmana::INTEGER AS dia_setmana,
+                g.hora::INTEGER AS hora,
+                t.kwh / d.n_dies AS consum_kwh
+            FROM graella g
+            LEFT JOIN totals t ON t.dia_setmana = g.dia_setmana AND t.hora = g.hora
+            LEFT JOIN dies d ON d.dia_setmana = g.dia_setmana
+            ORDER BY g.dia_setmana, g.hora
+        """).df()
+    except Exception:
+        return pd.DataFrame(columns=['dia_setmana', 'hora', 'consum_kwh'])
+
+
+def _invalidar_perfils_consum():
+    """Buida la caché dels perfils de consum després de modificar registre_consum."""
+    get_perfil_consum.clear()
+
+
 def get_estadisticas_resumen() -> dict:
     """
     Retorna estadístiques generals de la base de dades.
@@ -421,6 +510,42 @@ def guardar_simulacion(capacidad: float, carga_inicial: float, resultados: dict)
     """, [nou_id, datetime.now(), capacidad, carga_inicial, json.dumps(resultados_net)])
 
 
+def guardar_estado_simulacion(instalacion: str, estado: dict):
+    """
+    Desa (o substitueix) l'estat reanudable d'una instal·lació.
+
+    Args:
+        instalacion: Identificador de la instal·lació
+        estado: Instantània retornada per SimuladorBateria.exportar_estado()
+    """
+    import json
+    conn = get_database_connection()
+    conn.execute("""
+        INSERT OR REPLACE INTO estados_simulacion
+            (instalacion, fecha_actualizacion, ultima_fecha_hora, carga_bateria, beneficio_acumulado, estado)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [instalacion, datetime.now(), estado.get('ultima_fecha_hora'),
+          estado['carga_bateria'], estado['beneficio_acumulado'], json.dumps(estado)])
+
+
+def get_estado_simulacion(instalacion: str):
+    """
+    Obté l'últim estat desat d'una instal·lació.
+
+    Returns:
+        dict per a SimuladorBateria.importar_estado(), o None si no n'hi ha
+    """
+    import json
+    try:
+        conn = get_database_connection()
+        fila = conn.execute(
+            "SELECT estado FROM estados_simulacion WHERE instalacion = ?", [instalacion]
+        ).fetchone()
+        return json.loads(fila[0]) if fila else None
+    except Exception:
+        return None
+
+
 def get_simulaciones_recientes(limite: int = 10) -> pd.DataFrame:
     """
     Obté les simulacions més recents.
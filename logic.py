@@ -1,12 +1,24 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import BATERIA_CONFIG
 
 try:
-    from rl_engine import AgenteRL
+    from rl_engine import AgenteRL, codificar_estado, traducir_acciones
 except ImportError:
     AgenteRL = None
+    codificar_estado = None
+    traducir_acciones = None
+
+# Decisiones posibles; el historial guarda su índice como int8
+DECISIONES = ('cargar', 'descargar', 'vender', 'comprar', 'mantener')
+CODIGOS_DECISION = {decision: codigo for codigo, decision in enumerate(DECISIONES)}
 
 
 class SimuladorBateria:
@@ -21,7 +33,11 @@ class SimuladorBateria:
                  eficiencia_carga: float = 0.95,
                  eficiencia_descarga: float = 0.95,
                  precio_venta_factor: float = 0.8,
-                 usar_rl: bool = False):
+                 usar_rl: bool = False,
+                 horizonte_precios: int = 6,
+                 usar_mpc: bool = False,
+                 horizonte_mpc: int = 24,
+                 coste_desgaste_kwh: float = 0.0):
         """
         Inicializa el simulador de batería.
         
@@ -32,6 +48,13 @@ class SimuladorBateria:
             eficiencia_descarga: Eficiencia al descargar (0-1)
             precio_venta_factor: Factor del precio de venta respecto al de compra
             usar_rl: Si es True, usa Reinforcement Learning para tomar decisiones
+            horizonte_precios: Horas de precios futuros que considera la heurística
+            usar_mpc: Si es True (y usar_rl es False), reoptimiza cada hora las
+                próximas horizonte_mpc horas y aplica solo la primera acción
+            horizonte_mpc: Horas de la ventana de control predictivo
+            coste_desgaste_kwh: Coste de desgaste por kWh descargado que la
+                estrategia descuenta del ahorro al decidir descargar, como
+                DespachoOptimo (ver ModeloDegradacion.coste_desgaste_kwh)
         """
         self.capacidad_bateria = capacidad_bateria
         self.carga_inicial = min(carga_inicial, capacidad_bateria)
@@ -39,10 +62,25 @@ class SimuladorBateria:
         self.eficiencia_descarga = eficiencia_descarga
         self.precio_venta_factor = precio_venta_factor
         self.usar_rl = usar_rl
+        self.horizonte_precios = max(1, int(horizonte_precios))
+        self.usar_mpc = usar_mpc
+        self.horizonte_mpc = max(1, int(horizonte_mpc))
+        self.bloque_mpc = 2048  # ventanas resueltas por lote
+        self.coste_desgaste_kwh = coste_desgaste_kwh
+        self.degradacion = ModeloDegradacion(capacidad_bateria)
         
         self.historial = []
         self.beneficio_acumulado = 0.0
         
+        # Estado reanudable (ver exportar_estado / importar_estado)
+        self.carga_actual = self.carga_inicial
+        self.ultima_fecha_hora = None
+        self.horas_simuladas = 0
+        self.estado_rl = None
+        self.energia_vendida_acumulada = 0.0
+        self.energia_comprada_acumulada = 0.0
+        self.energia_cargada_acumulada = 0.0
+        
         if self.usar_rl and AgenteRL is not None:
             self.agente = AgenteRL(capacidad_bateria=self.capacidad_bateria)
             # Try to load existing model
@@ -50,123 +88,381 @@ class SimuladorBateria:
                 print("No pre-trained RL model found. Starting fresh.")
         else:
             self.agente = None
+        
+        if self.usar_mpc and not self.usar_rl:
+            from opt_engine import DespachoOptimo
+            self.despacho = DespachoOptimo.desde_simulador(self)
+        else:
+            self.despacho = None
     
     def simular(self, 
                 df_produccion: pd.DataFrame,
                 df_precios: pd.DataFrame,
                 consumo_base: float = 2.0,
-                entrenar_rl: bool = False) -> Dict:
+                entrenar_rl: bool = False,
+                continuar: bool = False,
+                df_prevision: pd.DataFrame = None,
+                perfil_consumo: pd.DataFrame = None) -> Dict:
         """
         Ejecuta la simulación de gestión de batería.
         
         Args:
             df_produccion: DataFrame con ['fecha_hora', 'produccion_kwh']
             df_precios: DataFrame con ['fecha_hora', 'precio_kwh']
-            consumo_base: Consumo base por hora en kWh
+            consumo_base: Consumo por hora en kWh: un valor constante o un array
+                alineado con la serie unida de producción y precios
             entrenar_rl: Si es True, entrena el agente RL durante la simulación
+            continuar: Si es True, parte del estado actual del simulador y solo
+                simula las horas posteriores a la última hora ya simulada
+            df_prevision: DataFrame con ['fecha_hora', 'produccion_predicha']
+                (salida de SolarPredictor.predecir_batch) que usa el modo MPC
+                para planificar; las horas sin previsión usan la producción real
+            perfil_consumo: Perfil semanal con ['dia_setmana', 'hora', 'consum_kwh']
+                (database.get_perfil_consum) que se suma a consumo_base: los
+                electrodomésticos registrados son carga adicional
+        
+        Returns:
+            dict: Resultados de la simulación. Al continuar, todos los totales
+                (beneficio, energías, ciclos y degradación) son acumulados de
+                toda la ejecución y 'detalles' contiene solo las horas nuevas.
+        """
+        df = combinar_series(df_produccion, df_precios)
+        consumo = alinear_consumo(df['fecha_hora'].to_numpy(), consumo_base, perfil_consumo)
+        if continuar and self.ultima_fecha_hora is not None:
+            nuevas = (df['fecha_hora'] > self.ultima_fecha_hora).to_numpy()
+            df = df[nuevas].reset_index(drop=True)
+            consumo = consumo[nuevas]
+        
+        produccion_prevista = None
+        if df_prevision is not None:
+            produccion_prevista = df[['fecha_hora']].merge(
+                df_prevision[['fecha_hora', 'produccion_predicha']], on='fecha_hora', how='left'
+            )['produccion_predicha'].fillna(df['produccion_kwh']).to_numpy(dtype=float)
+        
+        return self._simular_arrays(
+            fechas=df['fecha_hora'].to_numpy(),
+            produccion=df['produccion_kwh'].to_numpy(),
+            precios=df['precio_kwh'].to_numpy(),
+            consumo=consumo,
+            entrenar_rl=entrenar_rl,
+            continuar=continuar,
+            produccion_prevista=produccion_prevista
+        )
+    
+    def exportar_estado(self) -> Dict:
+        """
+        Exporta una instantánea compacta del estado de la simulación.
+        
+        Returns:
+            dict: Carga, beneficio y energías acumulados, horas simuladas,
+                último estado RL y última hora simulada (serializable a JSON)
+        """
+        return {
+            'carga_bateria': float(self.carga_actual),
+            'beneficio_acumulado': float(self.beneficio_acumulado),
+            'energia_vendida': float(self.energia_vendida_acumulada),
+            'energia_comprada': float(self.energia_comprada_acumulada),
+            'energia_cargada': float(self.energia_cargada_acumulada),
+            'horas_simuladas': int(self.horas_simuladas),
+            'estado_rl': int(self.estado_rl) if self.estado_rl is not None else None,
+            'ultima_fecha_hora': (pd.Timestamp(self.ultima_fecha_hora).isoformat()
+                                  if self.ultima_fecha_hora is not None else None),
+            'degradacion': self.degradacion.exportar_estado()
+        }
+    
+    def importar_estado(self, estado: Dict):
+        """
+        Restaura una instantánea creada con exportar_estado().
+        
+        La siguiente llamada a simular(..., continuar=True) avanza desde este
+        estado sin volver a simular las horas anteriores.
+        """
+        self.carga_actual = min(float(estado['carga_bateria']), self.capacidad_bateria)
+        self.beneficio_acumulado = float(estado['beneficio_acumulado'])
+        self.horas_simuladas = int(estado.get('horas_simuladas', 0))
+        self.energia_vendida_acumulada = float(estado.get('energia_vendida', 0.0))
+        self.energia_comprada_acumulada = float(estado.get('energia_comprada', 0.0))
+        self.energia_cargada_acumulada = float(estado.get('energia_cargada', 0.0))
+        estado_rl = estado.get('estado_rl')
+        if isinstance(estado_rl, list):
+            # Instantáneas anteriores guardaban la tupla del estado
+            estado_rl = codificar_estado(estado_rl) if codificar_estado is not None else None
+        self.estado_rl = estado_rl
+        ultima = estado.get('ultima_fecha_hora')
+        self.ultima_fecha_hora = pd.Timestamp(ultima) if ultima is not None else None
+        if estado.get('degradacion') is not None:
+            self.degradacion.importar_estado(estado['degradacion'])
+    
+    def _simular_arrays(self,
+                        fechas: np.ndarray,
+                        produccion: np.ndarray,
+                        precios: np.ndarray,
+                        consumo: np.ndarray,
+                        entrenar_rl: bool = False,
+                        continuar: bool = False,
+                        produccion_prevista: np.ndarray = None) -> Dict:
+        """
+        Núcleo de la simulación sobre arrays NumPy alineados por hora.
+        
+        Recorre las horas con escalares nativos, escribe en columnas
+        tipadas preasignadas (energías en float32, importes en float64 y
+        decisiones como códigos int8) y acumula los totales en la misma
+        pasada. El DataFrame de detalles se construye una sola vez.
+        
+        Args:
+            fechas: Array de timestamps ordenados
+            produccion: Producción por hora en kWh
+            precios: Precio de compra por hora en €/kWh
+            consumo: Consumo por hora en kWh
+            entrenar_rl: Si es True, entrena el agente RL durante la simulación
+            continuar: Si es True, parte de la carga, el beneficio y las
+                energías acumuladas actuales
+            produccion_prevista: Producción prevista que planifica el modo MPC
         
         Returns:
             dict: Resultados de la simulación
         """
-        # Merge de datos
-        df = pd.merge(df_produccion, df_precios, on='fecha_hora', how='inner')
-        df = df.sort_values('fecha_hora').reset_index(drop=True)
+        n = len(fechas)
+        usar_agente = self.usar_rl and self.agente is not None
+        horas = pd.DatetimeIndex(fechas).hour.tolist() if usar_agente and n > 0 else None
+        usar_mpc = not usar_agente and self.despacho is not None
+        prevision = produccion if produccion_prevista is None else produccion_prevista
+        ventana = None if usar_agente or usar_mpc else calcular_ventana_precios(precios, self.horizonte_precios)
+        valores_mpc = None
+        
+        # Columnas de salida preasignadas
+        carga_col = np.empty(n, dtype=np.float32)
+        decision_col = np.empty(n, dtype=np.int8)
+        cantidad_col = np.empty(n, dtype=np.float32)
+        beneficio_col = np.empty(n, dtype=np.float64)
+        acumulado_col = np.empty(n, dtype=np.float64)
+        energia_vendida = energia_comprada = energia_cargada = 0.0
+        
+        produccion_l = produccion.tolist()
+        precios_l = precios.tolist()
+        consumo_l = consumo.tolist()
         
         # Inicializar variables
-        carga_actual = self.carga_inicial
-        beneficio = 0.0
-        self.historial = []
+        if continuar:
+            carga_actual = self.carga_actual
+            beneficio = self.beneficio_acumulado
+            horas_totales = self.horas_simuladas + n
+        else:
+            carga_actual = self.carga_inicial
+            beneficio = 0.0
+            horas_totales = n
+            self.ultima_fecha_hora = None
+            self.estado_rl = None
+            self.degradacion.reiniciar()
+        carga_inicio = carga_actual
+        estado = None
         
-        for idx, row in df.iterrows():
-            fecha_hora = row['fecha_hora']
-            produccion = row['produccion_kwh']
-            precio_compra = row['precio_kwh']
-            precio_venta = precio_compra * self.precio_venta_factor
-            consumo = consumo_base
+        if usar_agente and not entrenar_rl:
+            # Evaluación: política greedy precompilada sobre arrays
+            (carga_col, decision_col, cantidad_col, beneficio_col, acumulado_col,
+             energia_vendida, energia_comprada, energia_cargada, carga_actual, estado) = self._evaluar_politica_rl(
+                fechas, np.asarray(produccion, dtype=float) - np.asarray(consumo, dtype=float),
+                np.asarray(precios, dtype=float), carga_actual, beneficio
+            )
+            if n > 0:
+                beneficio = float(acumulado_col[-1])
+        else:
+            for idx in range(n):
+                precio_compra = precios_l[idx]
+                precio_venta = precio_compra * self.precio_venta_factor
             
-            # Balance energético inicial
-            energia_disponible = produccion - consumo
+                # Balance energético inicial
+                energia_disponible = produccion_l[idx] - consumo_l[idx]
             
-            # Decisión de gestión de batería
-            if self.usar_rl and self.agente is not None:
-                estado, decision, cantidad = self._tomar_decision_rl(
-                    fecha_hora=fecha_hora,
-                    energia_disponible=energia_disponible,
-                    carga_actual=carga_actual,
-                    precio_compra=precio_compra,
-                    precio_venta=precio_venta,
-                    entrenar=entrenar_rl
-                )
-            else:
-                decision, cantidad = self._tomar_decision(
-                    energia_disponible=energia_disponible,
+                # Decisión de gestión de batería
+                if usar_agente:
+                    estado, decision, cantidad = self._tomar_decision_rl(
+                        hora=horas[idx],
+                        energia_disponible=energia_disponible,
+                        carga_actual=carga_actual,
+                        precio_compra=precio_compra,
+                        precio_venta=precio_venta,
+                        entrenar=entrenar_rl
+                    )
+                elif usar_mpc:
+                    if idx % self.bloque_mpc == 0:
+                        valores_mpc = self.despacho.valores_ventanas(
+                            prevision, precios, consumo,
+                            idx, min(idx + self.bloque_mpc, n), self.horizonte_mpc
+                        )
+                    decision, cantidad = self._tomar_decision_mpc(
+                        energia_disponible=energia_disponible,
+                        carga_actual=carga_actual,
+                        precio_compra=precio_compra,
+                        valores_siguientes=valores_mpc[idx % self.bloque_mpc]
+                    )
+                    estado = None
+                else:
+                    decision, cantidad = self._tomar_decision(
+                        energia_disponible=energia_disponible,
+                        carga_actual=carga_actual,
+                        precio_compra=precio_compra,
+                        precio_venta=precio_venta,
+                        precio_medio_futuro=ventana['media'][idx]
+                    )
+                    estado = None
+            
+                # Ejecutar acción
+                carga_nueva, coste_operacion = self._ejecutar_accion(
+                    decision=decision,
+                    cantidad=cantidad,
                     carga_actual=carga_actual,
                     precio_compra=precio_compra,
-                    precio_venta=precio_venta,
-                    df_futuro=df.iloc[idx:idx+24] if idx+24 < len(df) else df.iloc[idx:]
+                    precio_venta=precio_venta
                 )
-                estado = None
             
-            # Ejecutar acción
-            carga_nueva, coste_operacion = self._ejecutar_accion(
-                decision=decision,
-                cantidad=cantidad,
-                carga_actual=carga_actual,
-                precio_compra=precio_compra,
-                precio_venta=precio_venta
-            )
+                # Recompensa RL y actualización
+                if usar_agente and entrenar_rl and estado is not None:
+                    # RL feedback loop
+                    recompensa = coste_operacion
+                    siguiente_estado = self.agente._get_estado(
+                        (horas[idx] + 1) % 24,
+                        carga_nueva,
+                        precio_compra, # Simplified: Using current price for next state proxy
+                        energia_disponible # Simplified proxy
+                    )
+                    accion_idx = self.agente.acciones.index(decision) if decision in self.agente.acciones else 4
+                    self.agente.experimentar(estado, accion_idx, recompensa, siguiente_estado)
             
-            # Recompensa RL y actualización
-            if self.usar_rl and self.agente is not None and entrenar_rl and estado is not None:
-                # RL feedback loop
-                recompensa = coste_operacion
-                siguiente_estado = self.agente._get_estado(
-                    (fecha_hora + timedelta(hours=1)).hour,
-                    carga_nueva,
-                    precio_compra, # Simplified: Using current price for next state proxy
-                    energia_disponible # Simplified proxy
-                )
-                accion_idx = self.agente.acciones.index(decision) if decision in self.agente.acciones else 4
-                self.agente.aprender(estado, accion_idx, recompensa, siguiente_estado)
+                # Registrar estado
+                beneficio += coste_operacion
             
-            # Registrar estado
-            beneficio += coste_operacion
+                if decision == 'vender':
+                    energia_vendida += cantidad
+                elif decision == 'comprar':
+                    energia_comprada += cantidad
+                elif decision == 'cargar':
+                    energia_cargada += cantidad
             
-            self.historial.append({
-                'fecha_hora': fecha_hora,
-                'produccion_kwh': produccion,
-                'consumo_kwh': consumo,
-                'precio_kwh': precio_compra,
-                'carga_bateria': carga_nueva,
-                'decision': decision,
-                'cantidad_kwh': cantidad,
-                'beneficio_hora': coste_operacion,
-                'beneficio_acumulado': beneficio
-            })
+                carga_col[idx] = carga_nueva
+                decision_col[idx] = CODIGOS_DECISION[decision]
+                cantidad_col[idx] = cantidad
+                beneficio_col[idx] = coste_operacion
+                acumulado_col[idx] = beneficio
             
-            carga_actual = carga_nueva
+                carga_actual = carga_nueva
             
-        if self.usar_rl and self.agente is not None and entrenar_rl:
+        if usar_agente and entrenar_rl:
             self.agente.guardar_modelo()
         
-        # Calcular resumen
+        # Totales de energía acumulados como el beneficio
+        if continuar:
+            energia_vendida += self.energia_vendida_acumulada
+            energia_comprada += self.energia_comprada_acumulada
+            energia_cargada += self.energia_cargada_acumulada
+        self.energia_vendida_acumulada = energia_vendida
+        self.energia_comprada_acumulada = energia_comprada
+        self.energia_cargada_acumulada = energia_cargada
+        
+        # Conteo rainflow incremental sobre la traza de carga
+        self.degradacion.actualizar(np.concatenate([[carga_inicio], carga_col]))
+        
+        # Actualizar estado reanudable
+        self.carga_actual = carga_actual
+        self.beneficio_acumulado = beneficio
+        self.horas_simuladas = horas_totales
+        if n > 0:
+            self.ultima_fecha_hora = pd.Timestamp(fechas[-1])
+        if estado is not None:
+            self.estado_rl = estado
+        
+        self.historial = {
+            'fecha_hora': fechas,
+            'produccion_kwh': np.asarray(produccion, dtype=np.float32),
+            'consumo_kwh': np.asarray(consumo, dtype=np.float32),
+            'precio_kwh': np.asarray(precios, dtype=np.float32),
+            'carga_bateria': carga_col,
+            'decision': decision_col,
+            'cantidad_kwh': cantidad_col,
+            'beneficio_hora': beneficio_col,
+            'beneficio_acumulado': acumulado_col
+        }
+        
+        # Las etiquetas de decisión solo se materializan en la salida
         df_resultado = pd.DataFrame(self.historial)
+        df_resultado['decision'] = pd.Categorical.from_codes(decision_col, categories=list(DECISIONES))
         
         return {
             'beneficio_total': beneficio,
-            'beneficio_medio_diario': beneficio / (len(df) / 24) if len(df) > 0 else 0,
-            'energia_vendida_total': df_resultado[df_resultado['decision'] == 'vender']['cantidad_kwh'].sum() if len(df_resultado) > 0 else 0,
-            'energia_comprada_total': df_resultado[df_resultado['decision'] == 'comprar']['cantidad_kwh'].sum() if len(df_resultado) > 0 else 0,
+            'beneficio_medio_diario': beneficio / (horas_totales / 24) if horas_totales > 0 else 0,
+            'energia_vendida_total': energia_vendida,
+            'energia_comprada_total': energia_comprada,
             'carga_final': carga_actual,
-            'ciclos_bateria': self._calcular_ciclos(df_resultado),
+            'ciclos_bateria': self._calcular_ciclos(energia_cargada),
+            'ciclos_rainflow': round(self.degradacion.ciclos_equivalentes(), 2),
+            'degradacion_capacidad_pct': self.degradacion.perdida_capacidad() * 100,
+            'coste_desgaste': self.degradacion.coste_desgaste(),
             'detalles': df_resultado
         }
         
-    def _tomar_decision_rl(self, fecha_hora, energia_disponible, carga_actual, precio_compra, precio_venta, entrenar):
+    def _evaluar_politica_rl(self, fechas, energia, precios, carga_inicial, beneficio_inicial):
+        """
+        Aplica la política greedy del agente a toda la serie sin entrenar.
+        
+        La discretización de hora, precio y balance y la consulta de la
+        política se hacen de una vez para todos los niveles de carga. El bucle
+        solo propaga la carga (que depende de la acción anterior); decisiones,
+        cantidades e importes se calculan después con traducir_acciones.
+        
+        Returns:
+            tuple: Columnas (carga, decisión, cantidad, beneficio, acumulado),
+                totales de energía vendida/comprada/cargada, carga final y
+                último estado
+        """
+        n = len(energia)
+        if n == 0:
+            vacio = np.empty(0)
+            return (vacio.astype(np.float32), vacio.astype(np.int8), vacio.astype(np.float32),
+                    vacio, vacio, 0.0, 0.0, 0.0, carga_inicial, None)
+        
+        horas = pd.DatetimeIndex(fechas).hour.to_numpy()
+        acciones_nivel = self.agente.politica_por_nivel(horas, precios, energia).tolist()
+        umbrales = self.agente.limites_carga()
+        capacidad = self.capacidad_bateria
+        eficiencia_carga = self.eficiencia_carga
+        eficiencia_descarga = self.eficiencia_descarga
+        
+        acciones = [0] * n
+        cargas = [0.0] * n
+        carga = carga_inicial
+        for idx, e in enumerate(energia.tolist()):
+            cargas[idx] = carga
+            accion = acciones_nivel[idx][bisect_left(umbrales, carga)]
+            acciones[idx] = accion
+            if accion == 0 and e > 0:
+                cantidad = min(e, capacidad - carga) * eficiencia_carga
+                if cantidad > 0.1:
+                    carga = min(carga + cantidad, capacidad)
+            elif accion == 1 and e < 0:
+                cantidad = min(-e, carga) * eficiencia_descarga
+                if cantidad > 0.1:
+                    carga = max(carga - cantidad / eficiencia_descarga, 0)
+        
+        cargas = np.array(cargas, dtype=float)
+        decision, cantidad, coste, carga_nueva = traducir_acciones(
+            np.array(acciones, dtype=np.int8), energia, cargas, capacidad, precios,
+            eficiencia_carga, eficiencia_descarga, self.precio_venta_factor
+        )
+        
+        # Sumas acumuladas en orden: mismos redondeos que el bucle hora a hora
+        acumulado = np.cumsum(np.concatenate([[beneficio_inicial], coste]))[1:]
+        totales = [float(np.cumsum(np.where(decision == CODIGOS_DECISION[d], cantidad, 0.0))[-1])
+                   for d in ('vender', 'comprar', 'cargar')]
+        estado = int(self.agente.estados_batch(horas[-1:], cargas[-1:], precios[-1:], energia[-1:])[0])
+        
+        return (carga_nueva.astype(np.float32), decision.astype(np.int8), cantidad.astype(np.float32),
+                coste, acumulado, *totales, float(carga_nueva[-1]), estado)
+    
+    def _tomar_decision_rl(self, hora, energia_disponible, carga_actual, precio_compra, precio_venta, entrenar):
         """
         Usa el agente de Reinforcement Learning para tomar una decisión.
         """
-        estado = self.agente._get_estado(fecha_hora.hour, carga_actual, precio_compra, energia_disponible)
+        estado = self.agente._get_estado(hora, carga_actual, precio_compra, energia_disponible)
         accion_idx = self.agente.elegir_accion(estado, is_training=entrenar)
         decision = self.agente.acciones[accion_idx]
         
@@ -202,17 +498,33 @@ class SimuladorBateria:
                 
         return estado, decision, cantidad
     
+    def _tomar_decision_mpc(self,
+                            energia_disponible: float,
+                            carga_actual: float,
+                            precio_compra: float,
+                            valores_siguientes: np.ndarray) -> Tuple[str, float]:
+        """
+        Toma la primera acción del plan óptimo de la ventana actual (MPC).
+        
+        La ventana se ha resuelto con la producción prevista; la acción se
+        elige con el balance real de la hora. El plan paga el déficit que una
+        descarga no cubre, así que no elige descargas residuales aunque
+        _ejecutar_accion no cobre ese resto.
+        """
+        decision, cantidad, _, _ = self.despacho.elegir_accion(
+            energia_disponible, carga_actual, precio_compra, valores_siguientes
+        )
+        return decision, cantidad
+    
     def _tomar_decision(self,
                        energia_disponible: float,
                        carga_actual: float,
                        precio_compra: float,
                        precio_venta: float,
-                       df_futuro: pd.DataFrame) -> Tuple[str, float]:
+                       precio_medio_futuro: float) -> Tuple[str, float]:
         """
         Toma la decisión óptima con reglas fijas (Heurística).
         """
-        precio_medio_futuro = df_futuro['precio_kwh'].head(6).mean() if len(df_futuro) > 0 else precio_compra
-        
         if energia_disponible > 0:
             espacio_disponible = self.capacidad_bateria - carga_actual
             if espacio_disponible > 0.1 and precio_compra < precio_medio_futuro * 1.2:
@@ -222,7 +534,12 @@ class SimuladorBateria:
                 return ('vender', energia_disponible)
         else:
             deficit = abs(energia_disponible)
-            if carga_actual > 1.0 and (precio_compra > precio_medio_futuro * 0.9 or carga_actual > self.capacidad_bateria * 0.7):
+            # El desgaste se paga al descargar: descuenta del ahorro de no comprar.
+            # Sin coste de desgaste la regla es la heurística original
+            ahorro = precio_compra - self.coste_desgaste_kwh
+            compensa = self.coste_desgaste_kwh <= 0 or ahorro > 0
+            if carga_actual > 1.0 and (ahorro > precio_medio_futuro * 0.9
+                                       or (carga_actual > self.capacidad_bateria * 0.7 and compensa)):
                 cantidad_descargar = min(deficit, carga_actual) * self.eficiencia_descarga
                 return ('descargar', cantidad_descargar)
             else:
@@ -255,16 +572,877 @@ class SimuladorBateria:
             
         return (nueva_carga, coste)
     
-    def _calcular_ciclos(self, df: pd.DataFrame) -> float:
+    def _calcular_ciclos(self, energia_total_cargada: float) -> float:
         """
         Calcula el número aproximado de ciclos de carga/descarga de la batería.
         """
-        if len(df) == 0: return 0.0
-        energia_total_cargada = df[df['decision'] == 'cargar']['cantidad_kwh'].sum()
         ciclos = energia_total_cargada / self.capacidad_bateria if self.capacidad_bateria > 0 else 0
         return round(ciclos, 2)
 
 
+def combinar_series(df_produccion: pd.DataFrame, df_precios: pd.DataFrame) -> pd.DataFrame:
+    """
+    Une producción y precios por hora y ordena la serie resultante.
+    """
+    df = pd.merge(df_produccion, df_precios, on='fecha_hora', how='inner')
+    return df.sort_values('fecha_hora').reset_index(drop=True)
+
+
+def alinear_consumo(fechas: np.ndarray, consumo_base=2.0,
+                    perfil_consumo: pd.DataFrame = None) -> np.ndarray:
+    """
+    Construye el consumo por hora alineado con la serie de fechas.
+    
+    El perfil semanal es consumo adicional al base: cada hora suma a
+    consumo_base el valor de su (día de la semana, hora), con indexado
+    vectorizado de una matriz 7x24; las franjas sin datos suman 0. Así,
+    registrar más electrodomésticos nunca reduce el consumo simulado.
+    
+    Args:
+        fechas: Array de timestamps de la simulación
+        consumo_base: Consumo constante o array de la misma longitud que fechas
+        perfil_consumo: DataFrame con ['dia_setmana', 'hora', 'consum_kwh']
+    
+    Returns:
+        np.ndarray: Consumo en kWh por hora
+    """
+    n = len(fechas)
+    base = np.asarray(consumo_base, dtype=float)
+    if base.ndim == 0:
+        base = np.full(n, float(base))
+    elif len(base) != n:
+        raise ValueError(f"El consumo tiene {len(base)} horas y la serie {n}.")
+    
+    if perfil_consumo is None or len(perfil_consumo) == 0 or n == 0:
+        return base
+    
+    matriz = np.full((7, 24), np.nan)
+    matriz[perfil_consumo['dia_setmana'].to_numpy(dtype=int),
+           perfil_consumo['hora'].to_numpy(dtype=int)] = perfil_consumo['consum_kwh'].to_numpy(dtype=float)
+    indice = pd.DatetimeIndex(fechas)
+    consumo = matriz[indice.dayofweek, indice.hour]
+    return base + np.nan_to_num(consumo)
+
+
+def barrido_baterias(df_produccion: pd.DataFrame,
+                     df_precios: pd.DataFrame,
+                     capacidades,
+                     cargas_iniciales=(5.0,),
+                     consumos_base=(2.0,),
+                     eficiencia_carga: float = 0.95,
+                     eficiencia_descarga: float = 0.95,
+                     precio_venta_factor: float = 0.8,
+                     horizonte_precios: int = 6,
+                     coste_desgaste_kwh: float = 0.0) -> pd.DataFrame:
+    """
+    Evalúa la heurística de SimuladorBateria sobre una rejilla de configuraciones.
+    
+    Une las series una sola vez y avanza todos los escenarios a la vez
+    (escenarios x horas): en cada hora el estado de todas las baterías se
+    actualiza con operaciones vectorizadas. Cada escenario toma las mismas
+    decisiones que SimuladorBateria(...).simular() con esos parámetros.
+    
+    Args:
+        df_produccion: DataFrame con ['fecha_hora', 'produccion_kwh']
+        df_precios: DataFrame con ['fecha_hora', 'precio_kwh']
+        capacidades: Capacidades candidatas en kWh
+        cargas_iniciales: Cargas iniciales candidatas en kWh
+        consumos_base: Consumos base candidatos en kWh por hora
+        eficiencia_carga: Eficiencia al cargar (0-1)
+        eficiencia_descarga: Eficiencia al descargar (0-1)
+        precio_venta_factor: Factor del precio de venta respecto al de compra
+        horizonte_precios: Horas de precios futuros que considera la heurística
+        coste_desgaste_kwh: Coste de desgaste por kWh descargado (ver SimuladorBateria)
+    
+    Returns:
+        DataFrame con una fila por combinación de parámetros
+    """
+    df = combinar_series(df_produccion, df_precios)
+    
+    # Rejilla completa de escenarios
+    cap, carga, consumo = (m.ravel() for m in np.meshgrid(
+        np.asarray(capacidades, dtype=float),
+        np.asarray(cargas_iniciales, dtype=float),
+        np.asarray(consumos_base, dtype=float),
+        indexing='ij'
+    ))
+    carga_inicial = np.minimum(carga, cap)
+    
+    resultado = _simular_lote(
+        produccion=df['produccion_kwh'].to_numpy(),
+        precios=df['precio_kwh'].to_numpy(),
+        capacidad=cap,
+        carga_inicial=carga_inicial,
+        consumo=consumo,
+        eficiencia_carga=eficiencia_carga,
+        eficiencia_descarga=eficiencia_descarga,
+        precio_venta_factor=precio_venta_factor,
+        horizonte_precios=horizonte_precios,
+        coste_desgaste_kwh=coste_desgaste_kwh
+    )
+    
+    tabla = pd.DataFrame({
+        'capacidad_bateria': cap,
+        'carga_inicial': carga_inicial,
+        'consumo_base': consumo
+    })
+    for columna, valores in resultado.items():
+        tabla[columna] = valores
+    return tabla
+
+
+def _simular_lote(produccion: np.ndarray,
+                  precios: np.ndarray,
+                  capacidad: np.ndarray,
+                  carga_inicial: np.ndarray,
+                  consumo: np.ndarray,
+                  eficiencia_carga: float = 0.95,
+                  eficiencia_descarga: float = 0.95,
+                  precio_venta_factor: float = 0.8,
+                  horizonte_precios: int = 6,
+                  coste_desgaste_kwh: float = 0.0,
+                  series_horarias: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Avanza la heurística de SimuladorBateria para un lote de escenarios a la vez.
+    
+    Args:
+        produccion: Producción por hora, compartida (horas,) o por escenario (escenarios, horas)
+        precios: Precios por hora, compartidos (horas,) o por escenario (escenarios, horas)
+        capacidad: Capacidad de cada escenario en kWh
+        carga_inicial: Carga inicial de cada escenario en kWh
+        consumo: Consumo de cada escenario en kWh por hora, constante
+            (escenarios,) o por hora (escenarios, horas)
+        coste_desgaste_kwh: Coste de desgaste por kWh descargado (ver SimuladorBateria)
+        series_horarias: Si es True, añade las sumas por hora de todo el lote
+    
+    Returns:
+        dict: Arrays de resultados por escenario
+    """
+    cap = np.asarray(capacidad, dtype=float)
+    carga = np.asarray(carga_inicial, dtype=float).copy()
+    consumo = np.asarray(consumo, dtype=float)
+    consumo_por_hora = consumo.ndim == 2
+    if consumo_por_hora:
+        consumo = np.ascontiguousarray(consumo.T)
+    umbral_lleno = cap * 0.7
+    
+    # Umbrales con el tipo de dato original de los precios, como en simular()
+    media_futura = calcular_ventana_precios(precios, horizonte_precios)['media']
+    umbral_carga = media_futura * 1.2
+    umbral_descarga = media_futura * 0.9
+    
+    # Una fila contigua por hora: (horas,) o (horas, escenarios)
+    produccion_h = np.ascontiguousarray(np.asarray(produccion, dtype=float).T)
+    precios_h = np.ascontiguousarray(np.asarray(precios, dtype=float).T)
+    umbral_carga = np.ascontiguousarray(umbral_carga.T)
+    umbral_descarga = np.ascontiguousarray(umbral_descarga.T)
+    if produccion_h.ndim == 1:
+        produccion_h = produccion_h.tolist()
+    if precios_h.ndim == 1:
+        precios_h = precios_h.tolist()
+        umbral_carga = umbral_carga.tolist()
+        umbral_descarga = umbral_descarga.tolist()
+    
+    beneficio = np.zeros_like(cap)
+    vendida = np.zeros_like(cap)
+    comprada = np.zeros_like(cap)
+    cargada = np.zeros_like(cap)
+    
+    n = len(precios_h)
+    if series_horarias:
+        venta_horaria = np.empty(n)
+        compra_horaria = np.empty(n)
+        carga_horaria = np.empty(n)
+    
+    for h in range(n):
+        precio = precios_h[h]
+        energia_disponible = produccion_h[h] - (consumo[h] if consumo_por_hora else consumo)
+        espacio = cap - carga
+        deficit = np.abs(energia_disponible)
+        
+        excedente = energia_disponible > 0
+        cargar = excedente & (espacio > 0.1) & (precio < umbral_carga[h])
+        vender = excedente & ~cargar
+        ahorro = precio - coste_desgaste_kwh
+        compensa = (coste_desgaste_kwh <= 0) | (ahorro > 0)
+        descargar = ~excedente & (carga > 1.0) & ((ahorro > umbral_descarga[h])
+                                                  | ((carga > umbral_lleno) & compensa))
+        comprar = ~excedente & ~descargar
+        
+        cantidad_cargar = np.minimum(energia_disponible, espacio) * eficiencia_carga
+        cantidad_descargar = np.minimum(deficit, carga) * eficiencia_descarga
+        
+        coste = np.where(descargar, cantidad_descargar * precio, 0.0)
+        coste = np.where(vender, energia_disponible * (precio * precio_venta_factor), coste)
+        coste = np.where(comprar, -deficit * precio, coste)
+        beneficio += coste
+        
+        vendida += np.where(vender, energia_disponible, 0.0)
+        comprada += np.where(comprar, deficit, 0.0)
+        cargada += np.where(cargar, cantidad_cargar, 0.0)
+        
+        carga = np.where(cargar, np.minimum(carga + cantidad_cargar, cap), carga)
+        carga = np.where(descargar, np.maximum(carga - cantidad_descargar / eficiencia_descarga, 0), carga)
+        
+        if series_horarias:
+            venta_horaria[h] = energia_disponible[vender].sum()
+            compra_horaria[h] = deficit[comprar].sum()
+            carga_horaria[h] = carga.sum()
+    
+    dias = n / 24
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ciclos = np.where(cap > 0, cargada / cap, 0.0)
+    
+    resultado = {
+        'beneficio_total': beneficio,
+        'beneficio_medio_diario': beneficio / dias if dias > 0 else np.zeros_like(cap),
+        'energia_vendida_total': vendida,
+        'energia_comprada_total': comprada,
+        'carga_final': carga,
+        'ciclos_bateria': np.round(ciclos, 2)
+    }
+    if series_horarias:
+        resultado.update({
+            'venta_horaria': venta_horaria,
+            'compra_horaria': compra_horaria,
+            'carga_horaria': carga_horaria
+        })
+    return resultado
+
+
+def simular_flota(produccion: np.ndarray,
+                  consumo: np.ndarray,
+                  precios: np.ndarray,
+                  capacidades,
+                  cargas_iniciales,
+                  fechas: np.ndarray = None,
+                  eficiencia_carga: float = 0.95,
+                  eficiencia_descarga: float = 0.95,
+                  precio_venta_factor: float = 0.8,
+                  horizonte_precios: int = 6,
+                  coste_desgaste_kwh: float = 0.0,
+                  tamano_lote: int = 1000) -> Dict:
+    """
+    Simula una flota de instalaciones con una serie de precios común.
+    
+    Todas las instalaciones de un lote avanzan a la vez con la heurística
+    de SimuladorBateria. Las instalaciones se procesan en lotes de
+    `tamano_lote` filas, así que la memoria de trabajo depende del tamaño
+    del lote y no de la flota: las matrices de entrada pueden ser float32
+    o np.memmap (np.load(..., mmap_mode='r')) y solo se lee cada lote.
+    
+    Args:
+        produccion: Producción (instalaciones, horas) en kWh
+        consumo: Consumo (instalaciones, horas) o (instalaciones,) en kWh
+        precios: Precios por hora (horas,) compartidos por toda la flota
+        capacidades: Capacidad de cada instalación en kWh
+        cargas_iniciales: Carga inicial de cada instalación en kWh
+        fechas: Timestamps de las horas (opcional, para la serie agregada)
+        coste_desgaste_kwh: Coste de desgaste por kWh descargado (ver SimuladorBateria)
+        tamano_lote: Instalaciones simuladas a la vez
+    
+    Returns:
+        dict: 'por_instalacion' (DataFrame), 'serie_agregada' (DataFrame por
+            hora con energía vendida, comprada y almacenada de la flota) y
+            totales agregados
+    """
+    n_sitios, n_horas = produccion.shape
+    cap = np.broadcast_to(np.asarray(capacidades, dtype=float), (n_sitios,))
+    carga = np.minimum(np.broadcast_to(np.asarray(cargas_iniciales, dtype=float), (n_sitios,)), cap)
+    
+    lotes = []
+    serie = {clave: np.zeros(n_horas) for clave in ('venta_horaria', 'compra_horaria', 'carga_horaria')}
+    for inicio in range(0, n_sitios, tamano_lote):
+        fin = min(inicio + tamano_lote, n_sitios)
+        resultado = _simular_lote(
+            produccion=produccion[inicio:fin],
+            precios=precios,
+            capacidad=cap[inicio:fin],
+            carga_inicial=carga[inicio:fin],
+            consumo=consumo[inicio:fin],
+            eficiencia_carga=eficiencia_carga,
+            eficiencia_descarga=eficiencia_descarga,
+            precio_venta_factor=precio_venta_factor,
+            horizonte_precios=horizonte_precios,
+            coste_desgaste_kwh=coste_desgaste_kwh,
+            series_horarias=True
+        )
+        for clave in serie:
+            serie[clave] += resultado.pop(clave)
+        lotes.append(pd.DataFrame(resultado))
+    
+    por_instalacion = pd.concat(lotes, ignore_index=True)
+    por_instalacion.insert(0, 'capacidad_bateria', cap)
+    por_instalacion.insert(0, 'instalacion', np.arange(n_sitios))
+    
+    serie_agregada = pd.DataFrame({
+        'energia_vendida_kwh': serie['venta_horaria'],
+        'energia_comprada_kwh': serie['compra_horaria'],
+        'carga_flota_kwh': serie['carga_horaria']
+    })
+    if fechas is not None:
+        serie_agregada.insert(0, 'fecha_hora', fechas)
+    
+    return {
+        'por_instalacion': por_instalacion,
+        'serie_agregada': serie_agregada,
+        'beneficio_total': por_instalacion['beneficio_total'].sum(),
+        'energia_vendida_total': por_instalacion['energia_vendida_total'].sum(),
+        'energia_comprada_total': por_instalacion['energia_comprada_total'].sum(),
+        'ciclos_medios': por_instalacion['ciclos_bateria'].mean()
+    }
+
+
+# Series compartidas con los procesos trabajadores (ver ejecutar_escenarios_paralelo)
+_SERIES_COMPARTIDAS = {}
+
+
+def _publicar_series(series: Dict[str, np.ndarray]):
+    """
+    Copia cada array en un bloque de memoria compartida.
+    
+    Returns:
+        tuple: (bloques SharedMemory, descriptores picklables para los workers)
+    """
+    bloques, descriptores = [], {}
+    for nombre, arr in series.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[:] = arr
+        bloques.append(shm)
+        descriptores[nombre] = (shm.name, arr.shape, arr.dtype.str)
+    return bloques, descriptores
+
+
+def _inicializar_worker(descriptores: Dict):
+    """
+    Adjunta las series compartidas en el proceso trabajador (una vez por proceso).
+    """
+    for nombre, (shm_name, shape, dtype) in descriptores.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        _SERIES_COMPARTIDAS[nombre] = (shm, arr)
+
+
+def _simular_tarea(tarea: Tuple) -> Tuple[int, List[Dict]]:
+    """
+    Simula un escenario sobre toda la serie compartida y desglosa el resultado por tramos.
+    """
+    indice, params, tramos, incluir_detalles = tarea
+    params = dict(params)
+    consumo_base = params.pop('consumo_base', 2.0)
+    
+    series = {nombre: arr for nombre, (_, arr) in _SERIES_COMPARTIDAS.items()}
+    sim = SimuladorBateria(**params)
+    resultado = sim._simular_arrays(
+        fechas=series['fecha_hora'],
+        produccion=series['produccion_kwh'],
+        precios=series['precio_kwh'],
+        consumo=np.full(len(series['fecha_hora']), consumo_base, dtype=float)
+    )
+    if len(tramos) == 1:
+        if not incluir_detalles:
+            resultado.pop('detalles')
+        return indice, [resultado]
+    return indice, _desglosar_tramos(sim, resultado, tramos, incluir_detalles)
+
+
+def _desglosar_tramos(sim: SimuladorBateria, resultado: Dict, tramos: List[Tuple[int, int]],
+                      incluir_detalles: bool) -> List[Dict]:
+    """
+    Reparte una simulación continua en tramos [inicio, fin) de horas.
+    
+    Los flujos (beneficio, energías, ciclos y coste de desgaste) son los del
+    tramo y suman el total de la simulación; carga_final y la degradación
+    de capacidad son el estado al final del tramo.
+    """
+    h = sim.historial
+    decision = h['decision']
+    cantidad = h['cantidad_kwh'].astype(float)
+    carga = h['carga_bateria']
+    acumulado = h['beneficio_acumulado']
+    degradacion = ModeloDegradacion(sim.capacidad_bateria)
+    
+    filas = []
+    carga_previa, beneficio_previo, ciclos_previos, coste_previo = sim.carga_inicial, 0.0, 0.0, 0.0
+    for inicio, fin in tramos:
+        degradacion.actualizar(np.concatenate([[carga_previa], carga[inicio:fin]]))
+        beneficio = float(acumulado[fin - 1]) - beneficio_previo if fin > inicio else 0.0
+        cargada = float(cantidad[inicio:fin][decision[inicio:fin] == CODIGOS_DECISION['cargar']].sum())
+        ciclos_rainflow = degradacion.ciclos_equivalentes()
+        coste = degradacion.coste_desgaste()
+        fila = {
+            'beneficio_total': beneficio,
+            'beneficio_medio_diario': beneficio / ((fin - inicio) / 24) if fin > inicio else 0,
+            'energia_vendida_total': float(cantidad[inicio:fin][decision[inicio:fin] == CODIGOS_DECISION['vender']].sum()),
+            'energia_comprada_total': float(cantidad[inicio:fin][decision[inicio:fin] == CODIGOS_DECISION['comprar']].sum()),
+            'carga_final': float(carga[fin - 1]) if fin > inicio else carga_previa,
+            # Sin redondear, para que la suma de los tramos dé el total
+            'ciclos_bateria': cargada / sim.capacidad_bateria if sim.capacidad_bateria > 0 else 0.0,
+            'ciclos_rainflow': ciclos_rainflow - ciclos_previos,
+            'degradacion_capacidad_pct': degradacion.perdida_capacidad() * 100,
+            'coste_desgaste': coste - coste_previo
+        }
+        if incluir_detalles:
+            fila['detalles'] = resultado['detalles'].iloc[inicio:fin].reset_index(drop=True)
+        filas.append(fila)
+        if fin > inicio:
+            carga_previa, beneficio_previo = float(carga[fin - 1]), float(acumulado[fin - 1])
+        ciclos_previos, coste_previo = ciclos_rainflow, coste
+    return filas
+
+
+def ejecutar_escenarios_paralelo(df_produccion: pd.DataFrame,
+                                 df_precios: pd.DataFrame,
+                                 escenarios: List[Dict],
+                                 periodo: Optional[str] = None,
+                                 max_workers: Optional[int] = None,
+                                 incluir_detalles: bool = False) -> pd.DataFrame:
+    """
+    Ejecuta SimuladorBateria.simular para varios escenarios en un pool de procesos.
+    
+    Las series unidas se publican una sola vez en memoria compartida; cada
+    tarea (un escenario) solo envía sus parámetros y los límites de sus
+    tramos. Con `periodo` (frecuencia de pandas, p.ej. 'Y' o 'M') cada
+    escenario se sigue simulando de forma continua, así que la carga de la
+    batería pasa de un tramo al siguiente y las ventanas de precios cruzan
+    los límites, y el resultado se desglosa por tramo: los flujos
+    (beneficio, energías, ciclos y coste de desgaste) son los del tramo y
+    suman el total de la ejecución completa; carga_final y
+    degradacion_capacidad_pct son el estado al final del tramo.
+    
+    Args:
+        df_produccion: DataFrame con ['fecha_hora', 'produccion_kwh']
+        df_precios: DataFrame con ['fecha_hora', 'precio_kwh']
+        escenarios: Lista de kwargs de SimuladorBateria, más 'consumo_base' opcional
+        periodo: Frecuencia para dividir la serie en tramos independientes
+        max_workers: Número de procesos (por defecto, todos los núcleos)
+        incluir_detalles: Si es True, añade la columna 'detalles' por fila
+    
+    Returns:
+        DataFrame con una fila por (escenario, tramo), en orden determinista
+    """
+    df = combinar_series(df_produccion, df_precios)
+    n = len(df)
+    fechas = df['fecha_hora'].to_numpy()
+    
+    if periodo is not None and n > 0:
+        claves = pd.DatetimeIndex(fechas).to_period(periodo)
+        cortes = np.flatnonzero(claves[1:] != claves[:-1]) + 1
+        limites = np.concatenate([[0], cortes, [n]]).tolist()
+    else:
+        limites = [0, n]
+    tramos = list(zip(limites[:-1], limites[1:]))
+    
+    tareas = [(i, params, tramos, incluir_detalles) for i, params in enumerate(escenarios)]
+    
+    bloques, descriptores = _publicar_series({
+        'fecha_hora': fechas,
+        'produccion_kwh': df['produccion_kwh'].to_numpy(),
+        'precio_kwh': df['precio_kwh'].to_numpy()
+    })
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_inicializar_worker,
+                                 initargs=(descriptores,)) as executor:
+            resultados = dict(executor.map(_simular_tarea, tareas))
+    finally:
+        for shm in bloques:
+            shm.close()
+            shm.unlink()
+    
+    filas = []
+    for indice, params, _, _ in tareas:
+        for (inicio, fin), resultado in zip(tramos, resultados[indice]):
+            fila = {
+                'escenario': indice,
+                'periodo_inicio': fechas[inicio] if fin > inicio else pd.NaT,
+                'periodo_fin': fechas[fin - 1] if fin > inicio else pd.NaT,
+            }
+            fila.update(params)
+            fila.update(resultado)
+            filas.append(fila)
+    
+    return pd.DataFrame(filas)
+
+
+def _modelo_residuos(df_produccion: pd.DataFrame, df_precios: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Descompone las series históricas en perfil horario medio y residuos diarios.
+    
+    Solo se usan los días con las 24 horas. Precio y producción del mismo
+    día se guardan juntos para conservar su correlación.
+    
+    Returns:
+        dict: Perfiles (24,) y residuos (días, 24) de precio y producción
+    """
+    df = combinar_series(df_produccion, df_precios)
+    df['dia'] = df['fecha_hora'].dt.normalize()
+    df['hora'] = df['fecha_hora'].dt.hour
+    precio = df.pivot_table(index='dia', columns='hora', values='precio_kwh', aggfunc='mean')
+    produccion = df.pivot_table(index='dia', columns='hora', values='produccion_kwh', aggfunc='mean')
+    completos = precio.notna().all(axis=1) & produccion.notna().all(axis=1) & (precio.shape[1] == 24)
+    precio = precio[completos].to_numpy(dtype=float)
+    produccion = produccion[completos].to_numpy(dtype=float)
+    if len(precio) == 0:
+        raise ValueError("Se necesita al menos un día completo de precios y producción.")
+    
+    perfil_precio = precio.mean(axis=0)
+    perfil_produccion = produccion.mean(axis=0)
+    return {
+        'perfil_precio': perfil_precio,
+        'perfil_produccion': perfil_produccion,
+        'residuos_precio': precio - perfil_precio,
+        'residuos_produccion': produccion - perfil_produccion
+    }
+
+
+def generar_trayectorias(modelo: Dict[str, np.ndarray], n_trayectorias: int,
+                         n_dias: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Genera trayectorias horarias por bootstrap de días completos de residuos.
+    
+    Returns:
+        tuple: (produccion, precios), cada uno con forma (trayectorias, n_dias * 24)
+    """
+    dias = rng.integers(0, len(modelo['residuos_precio']), size=(n_trayectorias, n_dias))
+    precios = modelo['perfil_precio'] + modelo['residuos_precio'][dias]
+    produccion = modelo['perfil_produccion'] + modelo['residuos_produccion'][dias]
+    np.maximum(produccion, 0, out=produccion)
+    return (produccion.reshape(n_trayectorias, n_dias * 24),
+            precios.reshape(n_trayectorias, n_dias * 24))
+
+
+# Modelo de residuos compartido con los procesos trabajadores de Monte Carlo
+_MODELO_MONTECARLO = {}
+
+
+def _inicializar_worker_montecarlo(modelo: Dict, parametros: Dict):
+    _MODELO_MONTECARLO['modelo'] = modelo
+    _MODELO_MONTECARLO['parametros'] = parametros
+
+
+def _simular_bloque_montecarlo(tarea: Tuple) -> Dict[str, np.ndarray]:
+    """
+    Genera y simula un bloque de trayectorias con su propio flujo aleatorio.
+    """
+    semilla, n_trayectorias = tarea
+    modelo = _MODELO_MONTECARLO['modelo']
+    p = dict(_MODELO_MONTECARLO['parametros'])
+    n_dias = p.pop('n_dias')
+    
+    rng = np.random.default_rng(semilla)
+    produccion, precios = generar_trayectorias(modelo, n_trayectorias, n_dias, rng)
+    return _simular_lote(
+        produccion=produccion,
+        precios=precios,
+        capacidad=np.full(n_trayectorias, p.pop('capacidad_bateria')),
+        carga_inicial=np.full(n_trayectorias, p.pop('carga_inicial')),
+        consumo=np.full(n_trayectorias, p.pop('consumo_base')),
+        **p
+    )
+
+
+def simular_montecarlo(df_produccion: pd.DataFrame,
+                       df_precios: pd.DataFrame,
+                       n_trayectorias: int = 1000,
+                       n_dias: Optional[int] = None,
+                       capacidad_bateria: float = 10.0,
+                       carga_inicial: float = 5.0,
+                       consumo_base: float = 2.0,
+                       eficiencia_carga: float = 0.95,
+                       eficiencia_descarga: float = 0.95,
+                       precio_venta_factor: float = 0.8,
+                       horizonte_precios: int = 6,
+                       semilla: int = 42,
+                       tamano_bloque: int = 250,
+                       max_workers: Optional[int] = None) -> Dict:
+    """
+    Simulación Monte Carlo de la heurística sobre trayectorias de precio y producción.
+    
+    Las trayectorias suman al perfil horario medio los residuos de días
+    históricos elegidos al azar (bootstrap por días). Cada bloque de
+    trayectorias tiene su propio numpy.random.Generator derivado de
+    `semilla` con SeedSequence.spawn, de modo que el resultado es el mismo
+    con cualquier número de procesos.
+    
+    Args:
+        df_produccion: Histórico con ['fecha_hora', 'produccion_kwh']
+        df_precios: Histórico con ['fecha_hora', 'precio_kwh']
+        n_trayectorias: Número de trayectorias simuladas
+        n_dias: Días por trayectoria (por defecto, los días completos del histórico)
+        capacidad_bateria: Capacidad máxima en kWh
+        carga_inicial: Carga inicial en kWh
+        consumo_base: Consumo base por hora en kWh
+        semilla: Semilla raíz de los flujos aleatorios
+        tamano_bloque: Trayectorias por bloque (y por tarea)
+        max_workers: Procesos en paralelo; None o 1 ejecuta en este proceso
+    
+    Returns:
+        dict: 'trayectorias' (DataFrame con una fila por trayectoria) y
+            'percentiles' (DataFrame de percentiles de beneficio y ciclos)
+    """
+    modelo = _modelo_residuos(df_produccion, df_precios)
+    parametros = {
+        'n_dias': n_dias or len(modelo['residuos_precio']),
+        'capacidad_bateria': capacidad_bateria,
+        'carga_inicial': min(carga_inicial, capacidad_bateria),
+        'consumo_base': consumo_base,
+        'eficiencia_carga': eficiencia_carga,
+        'eficiencia_descarga': eficiencia_descarga,
+        'precio_venta_factor': precio_venta_factor,
+        'horizonte_precios': horizonte_precios
+    }
+    
+    tamanos = [tamano_bloque] * (n_trayectorias // tamano_bloque)
+    if n_trayectorias % tamano_bloque:
+        tamanos.append(n_trayectorias % tamano_bloque)
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    tareas = list(zip(semillas, tamanos))
+    
+    if max_workers is None or max_workers <= 1:
+        _inicializar_worker_montecarlo(modelo, parametros)
+        bloques = [_simular_bloque_montecarlo(tarea) for tarea in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_inicializar_worker_montecarlo,
+                                 initargs=(modelo, parametros)) as executor:
+            bloques = list(executor.map(_simular_bloque_montecarlo, tareas))
+    
+    trayectorias = pd.DataFrame({
+        columna: np.concatenate([bloque[columna] for bloque in bloques])
+        for columna in bloques[0]
+    })
+    percentiles = trayectorias[['beneficio_total', 'ciclos_bateria']].quantile(
+        [0.05, 0.25, 0.5, 0.75, 0.95]
+    )
+    percentiles.index = ['p5', 'p25', 'p50', 'p75', 'p95']
+    
+    return {
+        'trayectorias': trayectorias,
+        'percentiles': percentiles,
+        'beneficio_medio': trayectorias['beneficio_total'].mean(),
+        'prob_perdidas': (trayectorias['beneficio_total'] < 0).mean()
+    }
+
+
+def calcular_ventana_precios(precios: np.ndarray, horizonte: int = 6) -> Dict[str, np.ndarray]:
+    """
+    Calcula estadísticas de precio sobre la ventana futura de cada hora.
+    
+    La ventana de la hora i cubre las horas [i, i + horizonte) y se trunca
+    al final de la serie. Se calcula una sola vez por simulación y conserva
+    el tipo de dato de la serie de entrada.
+    
+    Args:
+        precios: Precios por hora en €/kWh; con varias series, las horas
+            van en el último eje
+        horizonte: Número de horas de la ventana
+    
+    Returns:
+        dict: Arrays 'media', 'minimo' y 'maximo' alineados con precios
+    """
+    precios = np.asarray(precios)
+    if not np.issubdtype(precios.dtype, np.floating):
+        precios = precios.astype(float)
+    n = precios.shape[-1]
+    if n == 0:
+        vacio = np.empty(precios.shape, dtype=precios.dtype)
+        return {'media': vacio, 'minimo': vacio, 'maximo': vacio}
+    
+    horizonte = max(1, min(int(horizonte), n))
+    relleno = np.full(precios.shape[:-1] + (horizonte - 1,), np.nan, dtype=precios.dtype)
+    ventanas = sliding_window_view(np.concatenate([precios, relleno], axis=-1), horizonte, axis=-1)
+    
+    return {
+        'media': np.nanmean(ventanas, axis=-1),
+        'minimo': np.nanmin(ventanas, axis=-1),
+        'maximo': np.nanmax(ventanas, axis=-1)
+    }
+
+
+class ContadorRainflow:
+    """
+    Conteo rainflow incremental (método de tres puntos, ASTM E1049).
+    
+    Recibe la traza de carga a trozos y solo guarda la pila de inversiones
+    aún abiertas, de modo que el coste es O(n) en total y no hace falta
+    volver a recorrer el histórico.
+    """
+    
+    def __init__(self):
+        self.reiniciar()
+    
+    def reiniciar(self):
+        self.pila = []          # inversiones pendientes (residuo)
+        self.ultimo = None      # última muestra recibida
+        self.direccion = 0      # signo del último movimiento no nulo
+    
+    def agregar(self, valores) -> List[Tuple[float, float]]:
+        """
+        Procesa nuevas muestras de la traza.
+        
+        Returns:
+            list: Ciclos cerrados como (rango, peso), con peso 1.0 para ciclos
+                completos y 0.5 para semiciclos
+        """
+        valores = np.asarray(valores, dtype=float).ravel()
+        if len(valores) == 0:
+            return []
+        if self.ultimo is None:
+            self.ultimo = valores[0]
+            self.pila.append(valores[0])
+            valores = valores[1:]
+        
+        serie = np.concatenate([[self.ultimo], valores])
+        movimientos = np.diff(serie)
+        no_nulos = np.flatnonzero(movimientos != 0)
+        if len(no_nulos) == 0:
+            return []
+        
+        # Una inversión es el punto previo a un cambio de signo del movimiento
+        signos = np.sign(movimientos[no_nulos])
+        signos_previos = np.concatenate([[self.direccion], signos[:-1]])
+        inversiones = serie[no_nulos][(signos_previos != 0) & (signos != signos_previos)]
+        
+        ciclos = []
+        for punto in inversiones.tolist():
+            self.pila.append(punto)
+            self._extraer_ciclos(ciclos)
+        
+        self.ultimo = serie[no_nulos[-1] + 1]
+        self.direccion = signos[-1]
+        return ciclos
+    
+    def _extraer_ciclos(self, ciclos: List[Tuple[float, float]]):
+        pila = self.pila
+        while len(pila) >= 3:
+            rango_x = abs(pila[-1] - pila[-2])
+            rango_y = abs(pila[-2] - pila[-3])
+            if rango_x < rango_y:
+                break
+            if len(pila) == 3:
+                ciclos.append((rango_y, 0.5))
+                del pila[0]
+            else:
+                ciclos.append((rango_y, 1.0))
+                del pila[-3:-1]
+    
+    def residuo(self) -> List[Tuple[float, float]]:
+        """
+        Semiciclos de las inversiones aún abiertas, sin modificar el estado.
+        """
+        puntos = list(self.pila)
+        if self.ultimo is not None and (not puntos or puntos[-1] != self.ultimo):
+            puntos.append(self.ultimo)
+        return [(abs(b - a), 0.5) for a, b in zip(puntos[:-1], puntos[1:])]
+    
+    def exportar_estado(self) -> Dict:
+        return {'pila': [float(v) for v in self.pila],
+                'ultimo': float(self.ultimo) if self.ultimo is not None else None,
+                'direccion': int(self.direccion)}
+    
+    def importar_estado(self, estado: Dict):
+        self.pila = list(estado['pila'])
+        self.ultimo = estado['ultimo']
+        self.direccion = estado['direccion']
+
+
+class ModeloDegradacion:
+    """
+    Modelo de desgaste por profundidad de descarga (DoD).
+    
+    Cada ciclo rainflow de profundidad d consume 1 / N(d) de la vida útil,
+    con N(d) = vida_util_ciclos * d^-exponente (regla de Miner). La
+    capacidad cae linealmente con el daño hasta capacidad_fin_vida.
+    """
+    
+    def __init__(self,
+                 capacidad_bateria: float = 10.0,
+                 vida_util_ciclos: float = BATERIA_CONFIG['vida_util_ciclos'],
+                 exponente_profundidad: float = BATERIA_CONFIG['exponente_profundidad'],
+                 capacidad_fin_vida: float = BATERIA_CONFIG['capacidad_fin_vida'],
+                 coste_reposicion: float = BATERIA_CONFIG['coste_reposicion']):
+        self.capacidad_bateria = capacidad_bateria
+        self.vida_util_ciclos = vida_util_ciclos
+        self.exponente_profundidad = exponente_profundidad
+        self.capacidad_fin_vida = capacidad_fin_vida
+        self.coste_reposicion = coste_reposicion
+        self.contador = ContadorRainflow()
+        self.reiniciar()
+    
+    def reiniciar(self):
+        self.contador.reiniciar()
+        self.dano_acumulado = 0.0
+        self.ciclos_cerrados = 0.0
+    
+    def actualizar(self, cargas) -> float:
+        """
+        Añade nuevas muestras de carga (kWh) y acumula el daño de los ciclos cerrados.
+        
+        Returns:
+            float: Daño acumulado (fracción de vida útil consumida)
+        """
+        ciclos = self.contador.agregar(cargas)
+        self.dano_acumulado += self._dano(ciclos)
+        self.ciclos_cerrados += self._equivalentes(ciclos)
+        return self.dano_acumulado
+    
+    def _profundidad(self, rango: float) -> float:
+        return min(rango / self.capacidad_bateria, 1.0) if self.capacidad_bateria > 0 else 0.0
+    
+    def _dano(self, ciclos) -> float:
+        return sum(peso * self._profundidad(rango) ** self.exponente_profundidad
+                   for rango, peso in ciclos) / self.vida_util_ciclos
+    
+    def _equivalentes(self, ciclos) -> float:
+        return sum(peso * self._profundidad(rango) for rango, peso in ciclos)
+    
+    def dano(self, incluir_residuo: bool = True) -> float:
+        """Fracción de vida útil consumida (0 = nueva, 1 = fin de vida)."""
+        residuo = self._dano(self.contador.residuo()) if incluir_residuo else 0.0
+        return self.dano_acumulado + residuo
+    
+    def ciclos_equivalentes(self, incluir_residuo: bool = True) -> float:
+        """Ciclos completos equivalentes (suma de profundidades de los ciclos)."""
+        residuo = self._equivalentes(self.contador.residuo()) if incluir_residuo else 0.0
+        return self.ciclos_cerrados + residuo
+    
+    def perdida_capacidad(self) -> float:
+        """Fracción de capacidad perdida por el desgaste acumulado."""
+        return min(self.dano(), 1.0) * (1 - self.capacidad_fin_vida)
+    
+    def capacidad_restante(self) -> float:
+        """Capacidad útil estimada en kWh."""
+        return self.capacidad_bateria * (1 - self.perdida_capacidad())
+    
+    def coste_desgaste(self) -> float:
+        """Coste en € de la vida útil consumida."""
+        return self.dano() * self.coste_reposicion
+    
+    def coste_desgaste_kwh(self, profundidad: float = 0.8) -> float:
+        """
+        Coste de desgaste por kWh descargado en ciclos de la profundidad dada.
+        
+        Un ciclo de profundidad d descarga d * capacidad kWh y consume
+        d^exponente / vida_util_ciclos de la vida útil.
+        """
+        if self.capacidad_bateria <= 0 or profundidad <= 0:
+            return 0.0
+        return (self.coste_reposicion * profundidad ** (self.exponente_profundidad - 1)
+                / (self.vida_util_ciclos * self.capacidad_bateria))
+    
+    def exportar_estado(self) -> Dict:
+        return {'dano_acumulado': self.dano_acumulado,
+                'ciclos_cerrados': self.ciclos_cerrados,
+                'rainflow': self.contador.exportar_estado()}
+    
+    def importar_estado(self, estado: Dict):
+        self.dano_acumulado = float(estado['dano_acumulado'])
+        self.ciclos_cerrados = float(estado['ciclos_cerrados'])
+        self.contador.importar_estado(estado['rainflow'])
+
+
 class OptimizadorTarifas:
     """
     Optimiza las decisiones basándose en tarifas horarias.
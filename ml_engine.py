@@ -5,15 +5,261 @@ OptiSolarAI - Predicció de Producció Solar amb Random Forest
 
 import pandas as pd
 import numpy as np
+import sklearn
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.tree import DecisionTreeRegressor
+from sklearn.tree._tree import Tree, NODE_DTYPE
+import itertools
+import math
 import pickle
+import time
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime, timedelta
 import streamlit as st
 import requests
 
+from config import ESPAI_HIPERPARAMETRES, MODEL_PARAMS
+from model_store import cargar_artefacto, guardar_artefacto, hash_config
+
+FEATURES = ['temperatura', 'nubosidad', 'humedad', 'radiacion']
+# Fins a aquestes files es prediu amb BoscCompilat; per sobre, amb sklearn
+MAX_FILES_COMPILAT = 256
+# Resolució de cada variable a la memòria cau de prediccions (°C, %, %, W/m²)
+RESOLUCIONS_CACHE = {'temperatura': 0.1, 'nubosidad': 1, 'humedad': 1, 'radiacion': 1}
+# Entrenament incremental: reentrenament complet si l'MAE sobre les dades noves
+# supera aquest múltiple de l'MAE de validació, o si aquesta fracció de files
+# noves té alguna variable fora del rang d'entrenament (percentils 1-99); el
+# bosc no extrapola fora del rang que ha vist
+LLINDAR_DERIVA_MAE = 1.5
+LLINDAR_DERIVA_FORA_RANG = 0.25
+# Files noves mínimes per afegir arbres (menys s'acumulen per a la propera actualització)
+MIN_FILES_INCREMENTAL = 24
+
+
+def aplanar_bosc(model: RandomForestRegressor) -> dict:
+    """
+    Concatena els nodes de tots els arbres del bosc en arrays plans.
+
+    Cada camp del node (fill esquerre/dret, variable, llindar, ...) és un
+    array amb els nodes de tots els arbres seguits; `inici_arbre` marca on
+    comença cada arbre i els índexs dels fills són locals a l'arbre.
+
+    Returns:
+        dict: Arrays numèrics sense objectes Python
+    """
+    estats = [estimador.tree_.__getstate__() for estimador in model.estimators_]
+    nodes = np.concatenate([estat['nodes'] for estat in estats])
+    arrays = {camp: nodes[camp] for camp in nodes.dtype.names}
+    arrays['valor'] = np.concatenate([estat['values'][:, 0, 0] for estat in estats])
+    arrays['inici_arbre'] = np.cumsum([0] + [estat['node_count'] for estat in estats])
+    arrays['profunditat_arbre'] = np.array([estat['max_depth'] for estat in estats])
+    return arrays
+
+
+def reconstruir_bosc(arrays: dict, parametres: dict, features: list,
+                     version_sklearn: str = None) -> RandomForestRegressor:
+    """
+    Reconstrueix un RandomForestRegressor a partir dels arrays d'aplanar_bosc().
+
+    Els arbres es refan amb l'estat intern de sklearn.tree._tree.Tree
+    (NODE_DTYPE), que canvia entre versions de scikit-learn; per això només
+    es reconstrueixen amb la mateixa versió amb què es van desar.
+
+    Raises:
+        ValueError: Si version_sklearn no és la instal·lada (cal reentrenar)
+    """
+    if version_sklearn != sklearn.__version__:
+        raise ValueError(f"El model es va desar amb scikit-learn {version_sklearn} i la versió "
+                         f"instal·lada és {sklearn.__version__}: cal reentrenar-lo.")
+    model = RandomForestRegressor(**parametres)
+    inici = np.asarray(arrays['inici_arbre'])
+    n_features = len(features)
+    params_arbre = {nom: getattr(model, nom) for nom in model.estimator_params}
+
+    estimadors = []
+    for i in range(len(inici) - 1):
+        a, b = int(inici[i]), int(inici[i + 1])
+        nodes = np.zeros(b - a, dtype=NODE_DTYPE)
+        for camp in NODE_DTYPE.names:
+            nodes[camp] = arrays[camp][a:b]
+        arbre = Tree(n_features, np.ones(1, dtype=np.intp), 1)
+        arbre.__setstate__({
+            'max_depth': int(arrays['profunditat_arbre'][i]),
+            'node_count': b - a,
+            'nodes': nodes,
+            'values': np.ascontiguousarray(arrays['valor'][a:b], dtype=np.float64).reshape(-1, 1, 1)
+        })
+        estimador = DecisionTreeRegressor(**params_arbre)
+        estimador.n_features_in_ = n_features
+        estimador.n_outputs_ = 1
+        estimador.max_features_ = n_features
+        estimador.tree_ = arbre
+        estimadors.append(estimador)
+
+    model.estimator_ = DecisionTreeRegressor(**params_arbre)
+    model.estimators_ = estimadors
+    model.n_features_in_ = n_features
+    model.n_outputs_ = 1
+    model.feature_names_in_ = np.array(features, dtype=object)
+    return model
+
+
+class BoscCompilat:
+    """
+    Random Forest compilat en arrays plans per predir sense sklearn ni pandas.
+
+    Cada node guarda la variable, el llindar i els dos fills amb índexs
+    globals; les fulles apunten a si mateixes. Així totes les parelles
+    (fila, arbre) baixen un nivell per iteració, sense branques, fins a la
+    profunditat màxima del bosc. Segueix les regles de sklearn: X en
+    float32, `x <= llindar` va a l'esquerra i els NaN segueixen
+    missing_go_to_left.
+    """
+
+    def __init__(self, arrays: dict, n_variables: int):
+        """
+        Args:
+            arrays: Arrays d'aplanar_bosc() (o els d'un artefacte carregat)
+            n_variables: Nombre de columnes de X
+        """
+        inici = np.asarray(arrays['inici_arbre'], dtype=np.intp)
+        esquerre = np.asarray(arrays['left_child'], dtype=np.intp)
+        dret = np.asarray(arrays['right_child'], dtype=np.intp)
+        n_nodes = len(esquerre)
+        fulla = esquerre < 0
+        index = np.arange(n_nodes)
+        # Índexs locals de cada arbre -> globals
+        desplacament = np.repeat(inici[:-1], np.diff(inici))
+
+        # fills[2 * node + anar_a_la_dreta]
+        self.fills = np.column_stack([np.where(fulla, index, esquerre + desplacament),
+                                      np.where(fulla, index, dret + desplacament)]).ravel()
+        self.variable = np.where(fulla, 0, arrays['feature']).astype(np.intp)
+        self.llindar = np.where(fulla, np.inf, arrays['threshold']).astype(np.float64)
+        nan_esquerra = arrays['missing_go_to_left'] if 'missing_go_to_left' in arrays else np.zeros(n_nodes)
+        self.nan_dreta = np.where(fulla, False, np.asarray(nan_esquerra) == 0)
+        self.valor = np.asarray(arrays['valor'], dtype=np.float64).copy()
+        self.arrels = inici[:-1].copy()
+        self.profunditat = int(np.max(arrays['profunditat_arbre']))
+        self.n_arbres = len(self.arrels)
+        self.n_variables = n_variables
+
+    @classmethod
+    def des_de_model(cls, model: RandomForestRegressor) -> 'BoscCompilat':
+        return cls(aplanar_bosc(model), model.n_features_in_)
+
+    def predir(self, X) -> np.ndarray:
+        """
+        Prediccions per a una fila (n_variables,) o una matriu (n, n_variables).
+
+        Returns:
+            np.ndarray: Mitjana dels arbres per fila, com RandomForestRegressor.predict
+        """
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_variables)
+        n = len(X)
+        x = X.astype(np.float64).ravel()
+        # Posició de la fila de cada parella (fila, arbre) dins de x
+        base = np.repeat(np.arange(n) * self.n_variables, self.n_arbres)
+        nodes = np.tile(self.arrels, n)
+        if n == 1:
+            base = 0
+        if np.isnan(x).any():
+            for _ in range(self.profunditat):
+                v = x[base + self.variable[nodes]]
+                dreta = np.where(np.isnan(v), self.nan_dreta[nodes], v > self.llindar[nodes])
+                nodes = self.fills[2 * nodes + dreta]
+        else:
+            for _ in range(self.profunditat):
+                nodes = self.fills[2 * nodes + (x[base + self.variable[nodes]] > self.llindar[nodes])]
+        return self.valor[nodes].reshape(n, self.n_arbres).mean(axis=1)
+
+
+class CachePrediccions:
+    """
+    Memòria cau LRU de prediccions amb les variables quantitzades.
+
+    Cada variable es divideix per la seva resolució i s'arrodoneix; les
+    entrades que cauen a la mateixa cel·la comparteixen clau. El valor es
+    calcula al punt representant de la cel·la (clau * resolució), de manera
+    que no depèn de quina entrada hi ha arribat primer. Per tant, totes les
+    prediccions servides amb la cache (encerts i fallades) són aproximades:
+    difereixen de model.predict tant com el bosc varia dins d'una cel·la
+    (amb RESOLUCIONS_CACHE, 0.007 kWh de mitjana i fins a 0.25 kWh per hora
+    a bench_cache_prediccions). Per això SolarPredictor no l'activa per defecte.
+    """
+
+    def __init__(self, capacitat: int = 4096, resolucions: dict = None):
+        """
+        Args:
+            capacitat: Nombre màxim d'entrades; en superar-lo s'expulsa la menys recent
+            resolucions: Dict variable -> resolució (les que faltin, RESOLUCIONS_CACHE)
+        """
+        resolucions = {**RESOLUCIONS_CACHE, **(resolucions or {})}
+        self.capacitat = int(capacitat)
+        self.resolucions = np.array([float(resolucions[f]) for f in FEATURES])
+        self._resolucions = self.resolucions.tolist()
+        self._entrades = OrderedDict()
+        self.encerts = 0
+        self.fallades = 0
+        self.invalidacions = 0
+
+    def __len__(self):
+        return len(self._entrades)
+
+    def clau(self, fila) -> tuple:
+        """Clau d'una fila, o None si té algun NaN."""
+        if any(math.isnan(v) for v in fila):
+            return None
+        return tuple(round(v / r) for v, r in zip(fila, self._resolucions))
+
+    def claus(self, X: np.ndarray):
+        """
+        Claus d'una matriu (n, variables).
+
+        Returns:
+            tuple: (llista de claus, màscara de files sense NaN)
+        """
+        valides = ~np.isnan(X).any(axis=1)
+        quantitzat = np.round(np.where(valides[:, None], X, 0) / self.resolucions).astype(np.int64)
+        return list(map(tuple, quantitzat.tolist())), valides
+
+    def representant(self, clau: tuple) -> list:
+        return [c * r for c, r in zip(clau, self._resolucions)]
+
+    def obtenir(self, clau: tuple):
+        """Valor desat per a la clau (i la marca com a recent), o None."""
+        valor = self._entrades.get(clau)
+        if valor is None:
+            self.fallades += 1
+            return None
+        self._entrades.move_to_end(clau)
+        self.encerts += 1
+        return valor
+
+    def desar(self, clau: tuple, valor: float):
+        self._entrades[clau] = valor
+        self._entrades.move_to_end(clau)
+        if len(self._entrades) > self.capacitat:
+            self._entrades.popitem(last=False)
+
+    def invalidar(self):
+        """Buida les entrades (p.ex. quan canvia el model); els comptadors es conserven."""
+        self._entrades.clear()
+        self.invalidacions += 1
+
+    def estadistiques(self) -> dict:
+        consultes = self.encerts + self.fallades
+        return {
+            'encerts': self.encerts,
+            'fallades': self.fallades,
+            'taxa_encerts': self.encerts / consultes if consultes else 0.0,
+            'entrades': len(self._entrades),
+            'capacitat': self.capacitat,
+            'invalidacions': self.invalidacions
+        }
+
 
 class SolarPredictor:
     """
@@ -21,49 +267,87 @@ class SolarPredictor:
     utilitzant Random Forest.
     """
 
-    def __init__(self, model_path: str = "models/solar_predictor.pkl"):
-        self.model_path = Path(model_path)
+    def __init__(self, model_path: str = "models/solar_predictor", mida_cache: int = 0,
+                 resolucions_cache: dict = None):
+        """
+        Args:
+            model_path: Directori de l'artefacte del model
+            mida_cache: Entrades de la memòria cau de prediccions. Per defecte
+                (0) està desactivada i les prediccions són exactes; activada,
+                són aproximades dins la resolució de la cache (vegeu
+                CachePrediccions)
+            resolucions_cache: Resolució de cada variable a la memòria cau
+                (per defecte, RESOLUCIONS_CACHE)
+        """
+        # Directori de l'artefacte; un camí .pkl antic es llegeix només com a migració
+        self.model_path = Path(model_path).with_suffix('')
         self.model = None
+        # Còpia plana del bosc per a prediccions d'una fila o de lots petits
+        self.compilat = None
+        self._model_compilat = None
+        self.cache = CachePrediccions(mida_cache, resolucions_cache) if mida_cache else None
         self.feature_importance = None
         self.metrics = {}
+        # Hiperparàmetres del bosc (config.MODEL_PARAMS o els d'ajustar_hiperparametres)
+        self.parametres = dict(MODEL_PARAMS)
+        # Resultat i informe de temps de l'últim ajust d'hiperparàmetres
+        self.ajust = None
+        # Darrera fecha_hora vista per l'entrenament i estadístiques de referència per a la deriva
+        self.marca_entrenament = None
+        self.referencia_deriva = None
 
-    def entrenar_modelo(self, df: pd.DataFrame):
+    def entrenar_modelo(self, df: pd.DataFrame, parametres: dict = None, guardar: bool = True,
+                        validacio: bool = True):
         """
         Entrena el model Random Forest amb dades històriques.
 
+        La validació usa el 20% de files més recents (per fecha_hora, si hi
+        és): una partició aleatòria posaria hores futures a l'entrenament.
+        Les files sense producció no s'usen ni compten per a la marca
+        d'entrenament, així que actualizar_modelo() les llegirà quan arribin.
+
         Args:
             df: DataFrame amb columnes [temperatura, nubosidad, humedad, radiacion, produccion_kwh]
+            parametres: Hiperparàmetres del bosc (per defecte, self.parametres)
+            guardar: Si és True, desa l'artefacte
+            validacio: Si és False, s'entrena amb totes les files i mae/r2
+                queden a None perquè els ompli qui ha validat el model
+                (vegeu ajustar_hiperparametres)
 
         Returns:
             dict: Mètriques de rendiment del model
         """
-        features = ['temperatura', 'nubosidad', 'humedad', 'radiacion']
+        if parametres is not None:
+            self.parametres = {**MODEL_PARAMS, **parametres}
+        df = df[df['produccion_kwh'].notna()]
+        if 'fecha_hora' in df.columns:
+            df = df.sort_values('fecha_hora', kind='stable')
+        features = FEATURES
         X = df[features].fillna(0)
-        y = df['produccion_kwh'].fillna(0)
+        y = df['produccion_kwh']
 
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
+        tall = len(X) - math.ceil(len(X) * 0.2) if validacio else len(X)
+        X_train, X_test = X.iloc[:tall], X.iloc[tall:]
+        y_train, y_test = y.iloc[:tall], y.iloc[tall:]
 
-        self.model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=15,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=42,
-            n_jobs=-1
-        )
+        self.model = RandomForestRegressor(**{'n_jobs': -1, **self.parametres})
 
         self.model.fit(X_train, y_train)
+        self._compilar()
 
-        y_pred = self.model.predict(X_test)
-        mae = mean_absolute_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
+        mae = r2 = None
+        if validacio:
+            y_pred = self.model.predict(X_test)
+            mae = mean_absolute_error(y_test, y_pred)
+            r2 = r2_score(y_test, y_pred)
 
-        self.feature_importance = pd.DataFrame({
-            'feature': features,
-            'importance': self.model.feature_importances_
-        }).sort_values('importance', ascending=False)
+        self._actualitzar_importancies()
+        self.referencia_deriva = {
+            'minim': X_train.quantile(0.01).tolist(),
+            'maxim': X_train.quantile(0.99).tolist()
+        }
+        self.marca_entrenament = (pd.Timestamp(df['fecha_hora'].max()).to_pydatetime()
+                                  if 'fecha_hora' in df.columns and len(df) else None)
 
         self.metrics = {
             'mae': mae,
@@ -72,35 +356,188 @@ class SolarPredictor:
             'fecha_entrenamiento': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
 
-        self._guardar_modelo()
+        if guardar:
+            self._guardar_modelo()
         return self.metrics
 
+    def actualizar_modelo(self, obtenir_dades=None, llindar_mae: float = LLINDAR_DERIVA_MAE,
+                          llindar_fora_rang: float = LLINDAR_DERIVA_FORA_RANG,
+                          min_files: int = MIN_FILES_INCREMENTAL) -> dict:
+        """
+        Actualitza el model només amb les files posteriors a la marca d'entrenament.
+
+        Sobre les files noves es mesura la deriva abans de tocar el model:
+        l'MAE del model actual (respecte de l'MAE de validació) i la
+        fracció de files amb cada variable fora del rang d'entrenament
+        (percentils 1-99). Sense deriva, s'ajusten arbres nous
+        només amb les files noves (warm_start) i es retiren els més antics,
+        en proporció a les files noves; amb deriva, o sense model o marca,
+        es reentrena amb tot l'històric.
+
+        Args:
+            obtenir_dades: Funció marca -> DataFrame amb les dades posteriors
+                a la marca (tot l'històric amb None); per defecte,
+                database.get_datos_posteriores
+            llindar_mae: Ràtio MAE nou / MAE de validació que força el reentrenament
+            llindar_fora_rang: Fracció de files fora de rang que força el reentrenament
+            min_files: Files completes noves mínimes per actualitzar
+
+        Returns:
+            dict: mode ('complet', 'incremental', 'sense_canvis' o 'sense_dades'),
+                files_noves, arbres_nous, mètriques de deriva i marca
+        """
+        if obtenir_dades is None:
+            from database import get_datos_posteriores
+            obtenir_dades = get_datos_posteriores
+
+        if self.model is None or self.marca_entrenament is None or self.referencia_deriva is None:
+            return self._reentrenar(obtenir_dades, 'sense model o marca d\'entrenament')
+
+        df = obtenir_dades(self.marca_entrenament)
+        # Les files sense producció encara no es poden usar; es tornaran a llegir
+        # mentre siguin posteriors a la marca
+        if len(df):
+            df = df[df['produccion_kwh'].notna()]
+        resultat = {'files_noves': len(df), 'arbres_nous': 0, 'marca': self.marca_entrenament}
+        if len(df) < min_files:
+            return {'mode': 'sense_canvis', **resultat}
+
+        X = df[FEATURES].fillna(0)
+        y = df['produccion_kwh']
+        mae_nou = mean_absolute_error(y, self.model.predict(X))
+        valors = X.to_numpy()
+        fora_rang = ((valors < self.referencia_deriva['minim'])
+                     | (valors > self.referencia_deriva['maxim'])).mean(axis=0)
+        resultat.update({
+            'mae_nou': mae_nou,
+            'ratio_mae': mae_nou / self.metrics['mae'] if self.metrics.get('mae') else np.inf,
+            'fora_rang': dict(zip(FEATURES, fora_rang.tolist()))
+        })
+
+        n_arbres = self.model.n_estimators
+        n_total = self.metrics.get('n_samples', 0) + len(df)
+        arbres_nous = max(1, math.ceil(n_arbres * len(df) / n_total))
+        if resultat['ratio_mae'] > llindar_mae:
+            return {**resultat, **self._reentrenar(obtenir_dades, f"MAE x{resultat['ratio_mae']:.2f}")}
+        if fora_rang.max() > llindar_fora_rang:
+            variable = FEATURES[int(fora_rang.argmax())]
+            return {**resultat, **self._reentrenar(
+                obtenir_dades, f"{variable} fora de rang ({fora_rang.max():.0%} de files)")}
+        if arbres_nous >= n_arbres:
+            return {**resultat, **self._reentrenar(obtenir_dades, 'dades noves majoritàries')}
+
+        # Els arbres nous s'afegeixen al final; els més antics són els primers
+        self.model.set_params(warm_start=True, n_estimators=n_arbres + arbres_nous)
+        self.model.fit(X, y)
+        self.model.estimators_ = self.model.estimators_[arbres_nous:]
+        self.model.set_params(warm_start=False, n_estimators=n_arbres)
+        self._compilar()
+        self._actualitzar_importancies()
+
+        self.marca_entrenament = pd.Timestamp(df['fecha_hora'].max()).to_pydatetime()
+        self.metrics.update({
+            'n_samples': n_total,
+            'mae_incremental': mae_nou,
+            'fecha_actualizacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+        self._guardar_modelo()
+        return {**resultat, 'mode': 'incremental', 'arbres_nous': arbres_nous,
+                'marca': self.marca_entrenament}
+
+    def _reentrenar(self, obtenir_dades, motiu: str) -> dict:
+        """Reentrenament complet amb tot l'històric de obtenir_dades(None)."""
+        df = obtenir_dades(None)
+        if len(df) == 0 or df['produccion_kwh'].notna().sum() == 0:
+            return {'mode': 'sense_dades', 'motiu': motiu}
+        metriques = self.entrenar_modelo(df)
+        return {'mode': 'complet', 'motiu': motiu, 'arbres_nous': self.model.n_estimators,
+                'marca': self.marca_entrenament, **metriques}
+
+    def _actualitzar_importancies(self):
+        self.feature_importance = pd.DataFrame({
+            'feature': FEATURES,
+            'importance': self.model.feature_importances_
+        }).sort_values('importance', ascending=False)
+
+    def _compilar(self, arrays: dict = None) -> BoscCompilat:
+        """
+        Compila self.model en un BoscCompilat (dels arrays ja aplanats, si es donen).
+        """
+        arrays = aplanar_bosc(self.model) if arrays is None else arrays
+        self.compilat = BoscCompilat(arrays, self.model.n_features_in_)
+        self._model_compilat = self.model
+        # Les prediccions desades eren del model anterior
+        if self.cache is not None:
+            self.cache.invalidar()
+        return self.compilat
+
+    def _bosc_compilat(self) -> BoscCompilat:
+        """Bosc compilat del model actual; es recompila si s'ha substituït self.model."""
+        if self.compilat is None or self._model_compilat is not self.model:
+            return self._compilar()
+        return self.compilat
+
     def _guardar_modelo(self):
-        """Guarda el model entrenat al disc."""
-        self.model_path.parent.mkdir(exist_ok=True)
-        with open(self.model_path, 'wb') as f:
-            pickle.dump({
-                'model': self.model,
-                'feature_importance': self.feature_importance,
-                'metrics': self.metrics
-            }, f)
+        """
+        Guarda el model entrenat al disc com a artefacte versionat.
+
+        Els arbres es desen com a arrays plans (.npy) i les mètriques, les
+        variables, els hiperparàmetres i la data en el manifest JSON.
+        """
+        parametres = self.model.get_params()
+        guardar_artefacto(self.model_path, 'solar_predictor', aplanar_bosc(self.model), {
+            'fecha_entrenamiento': self.metrics.get('fecha_entrenamiento'),
+            'metricas': self.metrics,
+            'features': list(self.model.feature_names_in_),
+            'importancias': dict(zip(self.feature_importance['feature'], self.feature_importance['importance'])),
+            'parametros': parametres,
+            'hash_config': hash_config({k: v for k, v in parametres.items() if k not in ('n_jobs', 'verbose')}),
+            'version_sklearn': sklearn.__version__,
+            'marca_entrenament': self.marca_entrenament.isoformat() if self.marca_entrenament else None,
+            'referencia_deriva': self.referencia_deriva,
+            'ajust': self.ajust
+        })
 
     def cargar_modelo(self) -> bool:
         """
         Carrega un model prèviament entrenat.
 
+        Llegeix l'artefacte versionat; si només hi ha el .pkl del format
+        anterior, el carrega com a migració (només des de fitxers propis).
+        Un artefacte desat amb una altra versió de scikit-learn no es
+        carrega (retorna False), i actualizar_modelo() reentrena des de zero.
+
         Returns:
             bool: True si s'ha carregat correctament
         """
-        if not self.model_path.exists():
-            return False
+        ruta_pickle = self.model_path.with_suffix('.pkl')
         try:
-            with open(self.model_path, 'rb') as f:
-                data = pickle.load(f)
-                self.model = data['model']
-                self.feature_importance = data['feature_importance']
-                self.metrics = data['metrics']
-            return True
+            if self.model_path.is_dir():
+                arrays, manifest = cargar_artefacto(self.model_path, 'solar_predictor')
+                self.model = reconstruir_bosc(arrays, manifest['parametros'], manifest['features'],
+                                              manifest.get('version_sklearn'))
+                self._compilar(arrays)
+                self.feature_importance = pd.DataFrame({
+                    'feature': list(manifest['importancias']),
+                    'importance': list(manifest['importancias'].values())
+                }).sort_values('importance', ascending=False)
+                self.metrics = manifest['metricas']
+                marca = manifest.get('marca_entrenament')
+                self.marca_entrenament = datetime.fromisoformat(marca) if marca else None
+                self.referencia_deriva = manifest.get('referencia_deriva')
+                self.parametres = manifest['parametros']
+                self.ajust = manifest.get('ajust')
+                return True
+            if ruta_pickle.exists():
+                with open(ruta_pickle, 'rb') as f:
+                    data = pickle.load(f)
+                    self.model = data['model']
+                    self.parametres = self.model.get_params()
+                    self._compilar()
+                    self.feature_importance = data['feature_importance']
+                    self.metrics = data['metrics']
+                return True
+            return False
         except Exception as e:
             print(f"Error al carregar model: {e}")
             return False
@@ -110,6 +547,10 @@ class SolarPredictor:
         """
         Realitza una predicció de producció solar.
 
+        Amb memòria cau (opcional), les variables es quantitzen a les
+        resolucions de la cache i la predicció es fa al punt representant
+        de la cel·la, així que és aproximada dins d'aquesta resolució.
+
         Args:
             temperatura: Temperatura en °C
             nubosidad: Percentatge de nuvolositat (0-100)
@@ -122,10 +563,64 @@ class SolarPredictor:
         if self.model is None:
             raise ValueError("Model no entrenat. Crida a entrenar_modelo() o cargar_modelo() primer.")
 
-        features = pd.DataFrame([[temperatura, nubosidad, humedad, radiacion]],
-                               columns=['temperatura', 'nubosidad', 'humedad', 'radiacion'])
-        prediccion = self.model.predict(features)[0]
-        return max(0, prediccion)
+        compilat = self._bosc_compilat()
+        fila = [temperatura, nubosidad, humedad, radiacion]
+        clau = self.cache.clau(fila) if self.cache is not None else None
+        if clau is None:
+            return max(0, compilat.predir(fila)[0])
+
+        prediccion = self.cache.obtenir(clau)
+        if prediccion is None:
+            prediccion = max(0, compilat.predir(self.cache.representant(clau))[0])
+            self.cache.desar(clau, prediccion)
+        return prediccion
+
+    def predecir_matriz(self, X: np.ndarray) -> np.ndarray:
+        """
+        Prediccions per a una matriu (n, 4) amb les columnes en l'ordre de FEATURES.
+
+        Amb memòria cau (opcional), només les cel·les que hi falten (una
+        vegada cadascuna) arriben al bosc, i els valors són els del punt
+        representant de cada cel·la. Els lots petits (fins a MAX_FILES_COMPILAT files) es
+        recorren amb el bosc compilat; els grans, amb una sola crida a predict
+        de sklearn.
+
+        Returns:
+            np.ndarray: Producció estimada en kWh (mínim 0) per fila
+        """
+        if self.model is None:
+            raise ValueError("Model no entrenat.")
+
+        X = np.asarray(X, dtype=float).reshape(-1, len(FEATURES))
+        # Recompila (i buida la memòria cau) si s'ha substituït self.model
+        self._bosc_compilat()
+        if self.cache is None:
+            return self._predir_model(X)
+
+        claus, valides = self.cache.claus(X)
+        resultat = np.empty(len(X))
+        fallades = {}
+        for i in np.flatnonzero(valides).tolist():
+            valor = self.cache.obtenir(claus[i])
+            if valor is None:
+                fallades.setdefault(claus[i], []).append(i)
+            else:
+                resultat[i] = valor
+
+        if fallades:
+            noves = list(fallades)
+            valors = self._predir_model(np.array([self.cache.representant(c) for c in noves]))
+            for clau, valor in zip(noves, valors.tolist()):
+                self.cache.desar(clau, valor)
+                resultat[fallades[clau]] = valor
+        if not valides.all():
+            resultat[~valides] = self._predir_model(X[~valides])
+        return resultat
+
+    def _predir_model(self, X: np.ndarray) -> np.ndarray:
+        if len(X) <= MAX_FILES_COMPILAT:
+            return np.maximum(self._bosc_compilat().predir(X), 0)
+        return np.maximum(self.model.predict(pd.DataFrame(X, columns=FEATURES)), 0)
 
     def predecir_batch(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -134,27 +629,196 @@ class SolarPredictor:
         if self.model is None:
             raise ValueError("Model no entrenat.")
 
-        features = ['temperatura', 'nubosidad', 'humedad', 'radiacion']
-        X = df[features].fillna(0)
+        X = df[FEATURES].fillna(0)
         df = df.copy()
-        df['produccion_predicha'] = self.model.predict(X)
-        df['produccion_predicha'] = df['produccion_predicha'].clip(lower=0)
+        df['produccion_predicha'] = self.predecir_matriz(X.to_numpy())
         return df
 
 
+# ============================================================================
+# AJUST D'HIPERPARÀMETRES
+# ============================================================================
+
+def plecs_origen_mobil(n: int, n_plecs: int = 5, mida_validacio: int = None,
+                       separacio: int = 0) -> list:
+    """
+    Plecs de validació creuada amb origen mòbil sobre n files ordenades en el temps.
+
+    Cada plec entrena amb totes les files anteriors al seu origen (menys
+    `separacio` files de marge) i valida amb les mida_validacio següents;
+    els orígens avancen fins a cobrir el final. Per defecte
+    mida_validacio = n // (n_plecs + 1), com TimeSeriesSplit.
+
+    Returns:
+        list: Tuples (fi_entrenament, inici_validacio, fi_validacio)
+    """
+    mida = mida_validacio or n // (n_plecs + 1)
+    primer = n - n_plecs * mida
+    if mida < 1 or primer - separacio < 1:
+        raise ValueError(f"{n} files no basten per a {n_plecs} plecs de {mida} files.")
+    return [(origen - separacio, origen, origen + mida)
+            for origen in range(primer, n, mida)]
+
+
+def candidats_hiperparametres(espai: dict, n_candidats: int = None, semilla: int = 0) -> list:
+    """
+    Combinacions d'hiperparàmetres a avaluar.
+
+    Args:
+        espai: Dict paràmetre -> llista de valors
+        n_candidats: Nombre de combinacions sortejades (cerca aleatòria sense
+            repetició); None, o més que la graella, la recorre sencera
+        semilla: Llavor del sorteig
+
+    Returns:
+        list: Dicts de paràmetres, en l'ordre de la graella
+    """
+    noms = list(espai)
+    graella = list(itertools.product(*espai.values()))
+    if n_candidats is not None and n_candidats < len(graella):
+        triats = np.random.default_rng(semilla).choice(len(graella), n_candidats, replace=False)
+        graella = [graella[i] for i in sorted(triats)]
+    return [dict(zip(noms, valors)) for valors in graella]
+
+
+def _avaluar_plec(tarea: tuple) -> tuple:
+    """
+    Entrena un candidat en un plec sobre la matriu compartida i el valida.
+    """
+    from logic import _SERIES_COMPARTIDAS
+    i_candidat, i_plec, parametres, (fi_entrenament, inici, fi) = tarea
+    X = _SERIES_COMPARTIDAS['X'][1]
+    y = _SERIES_COMPARTIDAS['y'][1]
+
+    # Un sol fil per model: el paral·lelisme és entre tasques. Es mesura temps
+    # de CPU, que no s'infla quan hi ha més processos que nuclis
+    model = RandomForestRegressor(**{**MODEL_PARAMS, **parametres, 'n_jobs': 1})
+    t0 = time.process_time()
+    model.fit(X[:fi_entrenament], y[:fi_entrenament])
+    t1 = time.process_time()
+    y_pred = model.predict(X[inici:fi])
+    t2 = time.process_time()
+    return (i_candidat, i_plec, mean_absolute_error(y[inici:fi], y_pred),
+            r2_score(y[inici:fi], y_pred), t1 - t0, t2 - t1)
+
+
+def ajustar_hiperparametres(predictor: SolarPredictor, df: pd.DataFrame, espai: dict = None,
+                            n_candidats: int = 20, n_plecs: int = 5, separacio: int = 0,
+                            max_workers: int = None, semilla: int = 0,
+                            guardar: bool = True) -> pd.DataFrame:
+    """
+    Cerca d'hiperparàmetres amb validació creuada d'origen mòbil en un pool de processos.
+
+    Cada tasca és un (candidat, plec). La matriu de variables i la
+    producció es publiquen un sol cop en memòria compartida; als workers
+    només s'envien els paràmetres i els límits del plec. El millor
+    candidat (MAE mitjà més baix) es reentrena amb totes les files, sense
+    reservar-ne cap per validar, i es desa com a artefacte. Les mètriques
+    del model (mae, r2) són les mitjanes dels plecs de validació creuada del
+    guanyador; els resultats i l'informe de temps van a 'ajust' al manifest.
+
+    Args:
+        predictor: SolarPredictor on s'entrena i es desa el model final
+        df: DataFrame com el d'entrenar_modelo (s'ordena per fecha_hora si hi és)
+        espai: Dict paràmetre -> valors (per defecte, config.ESPAI_HIPERPARAMETRES)
+        n_candidats: Combinacions sortejades; None recorre la graella sencera
+        n_plecs: Plecs de validació (vegeu plecs_origen_mobil)
+        separacio: Files entre el final de l'entrenament i la validació
+        max_workers: Nombre de processos (per defecte, tots els nuclis)
+        semilla: Llavor del sorteig de candidats
+        guardar: Si és True, desa l'artefacte del predictor
+
+    Returns:
+        pd.DataFrame: Una fila per candidat (paràmetres, mae, mae_desv, r2 i
+            segons_ajust, temps de CPU sumat dels plecs), del millor al pitjor
+    """
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    from logic import _inicializar_worker, _publicar_series
+
+    t_inici = time.perf_counter()
+    espai = ESPAI_HIPERPARAMETRES if espai is None else espai
+    # Mateixes files que entrenar_modelo: sense les hores encara sense producció
+    df = df[df['produccion_kwh'].notna()]
+    if 'fecha_hora' in df.columns:
+        df = df.sort_values('fecha_hora', kind='stable')
+    X = df[FEATURES].fillna(0).to_numpy(dtype=float)
+    y = df['produccion_kwh'].to_numpy(dtype=float)
+
+    plecs = plecs_origen_mobil(len(X), n_plecs, separacio=separacio)
+    candidats = candidats_hiperparametres(espai, n_candidats, semilla)
+    tasques = [(i, j, parametres, plec)
+               for i, parametres in enumerate(candidats) for j, plec in enumerate(plecs)]
+    # Les tasques més llargues (més files i arbres) primer, perquè la cua acabi equilibrada
+    tasques.sort(key=lambda t: -t[3][0] * t[2].get('n_estimators', MODEL_PARAMS['n_estimators']))
+    n_treballadors = max(1, min(max_workers or os.cpu_count() or 1, len(tasques)))
+
+    bloques, descriptores = _publicar_series({'X': X, 'y': y})
+    t_publicat = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=n_treballadors,
+                                 initializer=_inicializar_worker,
+                                 initargs=(descriptores,)) as executor:
+            avaluacions = list(executor.map(_avaluar_plec, tasques))
+    finally:
+        for shm in bloques:
+            shm.close()
+            shm.unlink()
+    t_cerca = time.perf_counter()
+
+    per_plec = pd.DataFrame(avaluacions, columns=['candidat', 'plec', 'mae', 'r2',
+                                                  'segons_ajust', 'segons_prediccio'])
+    resum = per_plec.groupby('candidat').agg(mae=('mae', 'mean'), mae_desv=('mae', 'std'),
+                                             r2=('r2', 'mean'), segons_ajust=('segons_ajust', 'sum'))
+    resultats = pd.concat([pd.DataFrame(candidats, dtype=object), resum], axis=1)
+    resultats = resultats.sort_values('mae', kind='stable').reset_index(drop=True)
+    millors = candidats[int(resum['mae'].idxmin())]
+
+    millor = resum.loc[resum['mae'].idxmin()]
+    predictor.entrenar_modelo(df, parametres=millors, guardar=False, validacio=False)
+    predictor.metrics.update({'mae': float(millor['mae']), 'r2': float(millor['r2']),
+                              'validacio': 'origen_mobil'})
+    t_final = time.perf_counter()
+    cpu_tasques = float(per_plec[['segons_ajust', 'segons_prediccio']].to_numpy().sum())
+    predictor.ajust = {
+        'millors_parametres': millors,
+        'mae_cv': float(resum['mae'].min()),
+        'espai': espai,
+        'plecs': plecs,
+        'candidats': resultats.to_dict('records'),
+        'temps': {
+            'total': t_final - t_inici,
+            'publicacio': t_publicat - t_inici,
+            'cerca': t_cerca - t_publicat,
+            'entrenament_final': t_final - t_cerca,
+            'cpu_tasques': cpu_tasques,
+            'acceleracio': cpu_tasques / (t_cerca - t_publicat),
+            'treballadors': n_treballadors,
+            'tasques': len(tasques)
+        },
+        'fecha_ajust': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    if guardar:
+        predictor._guardar_modelo()
+    return resultats
+
+
 # ============================================================================
 # PREVISIÓ 7 DIES (NOVA FUNCIONALITAT UD1B)
 # ============================================================================
 
-def generar_pronostico_7dias(predictor: SolarPredictor = None) -> pd.DataFrame:
+def generar_pronostico_7dias(predictor: SolarPredictor = None, horari: bool = False):
     """
     Genera una previsió de producció solar per als propers 7 dies.
 
     Utilitza el model ML si está disponible; en cas contrari,
     fa servir una estimació heurística basada en radiació solar.
+    Les 168 hores es calculen com una sola matriu (dies, hores): radiació
+    vectoritzada i una única crida al model.
 
     Args:
         predictor: SolarPredictor opcionalment entrenat
+        horari: Si és True, retorna també la corba horària en format llarg
 
     Returns:
         DataFrame amb columnes:
@@ -164,73 +828,108 @@ def generar_pronostico_7dias(predictor: SolarPredictor = None) -> pd.DataFrame:
             - nubositat (int, %)
             - humitat (int, %)
             - produccio_estimada_kwh (float)
-            - produccio_per_hora (list)
             - qualitat (str: 'Excel·lent', 'Bona', 'Moderada', 'Baixa')
-            - preu_venda_recomanat (str)
+            - emoji (str)
+        Amb horari=True, una tupla (diari, horari) on horari té una fila per
+        hora amb [fecha_hora, data, hora, temperatura, nubosidad, humedad,
+        radiacion, produccion_predicha], el format de df_prevision de
+        SimuladorBateria.simular().
     """
     np.random.seed(int(datetime.now().strftime('%j')))  # seed per dia de l'any (consistent per dia)
 
     dies_setmana_ca = ['Dilluns', 'Dimarts', 'Dimecres', 'Dijous',
                        'Divendres', 'Dissabte', 'Diumenge']
 
-    registres = []
     avui = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    dates = [avui + timedelta(days=d) for d in range(1, 8)]  # 7 dies endavant
+    usar_model = predictor is not None and predictor.model is not None
 
-    for d in range(1, 8):  # 7 dies endavant
-        data = avui + timedelta(days=d)
-        dia_idx = data.weekday()
-
-        # Generar condicions meteorològiques sintètiques realistes
+    # Condicions meteorològiques sintètiques, sortejades dia a dia en el mateix ordre
+    nubositats, humitats, temps_mitja, temps_min, temps_max = [], [], [], [], []
+    soroll = np.zeros((7, 24))
+    for d in range(1, 8):
         nubositat = int(np.clip(np.random.normal(35, 25), 0, 100))
         humitat = int(np.clip(np.random.normal(55, 15), 20, 90))
         temp_base = 16 + 5 * np.sin(d * np.pi / 7)
         temp_mitja = round(temp_base + np.random.uniform(-2, 2), 1)
-        temp_min = round(temp_mitja - np.random.uniform(3, 6), 1)
-        temp_max = round(temp_mitja + np.random.uniform(4, 8), 1)
-
-        # Calcular producció horàri (kWh per hora)
-        produccio_per_hora = []
-        for h in range(24):
-            radiacio = estimar_radiacion_solar(h, nubositat)
-            if predictor is not None and predictor.model is not None:
-                kwh = predictor.predecir(temp_mitja, nubositat, humitat, radiacio)
-            else:
-                # Estimació heurística: pic de 5.5 kWh al migdia
-                kwh = max(0, 5.5 * np.sin((h - 6) * np.pi / 12)
-                          * (1 - nubositat / 100 * 0.7)
-                          + np.random.uniform(-0.2, 0.2))
-            produccio_per_hora.append(round(kwh, 3))
-
-        produccio_total = round(sum(produccio_per_hora), 2)
-
-        # Classificar qualitat del dia
-        if produccio_total >= 35:
-            qualitat = 'Excel·lent'
-            emoji = '☀️'
-        elif produccio_total >= 25:
-            qualitat = 'Bona'
-            emoji = '🌤️'
-        elif produccio_total >= 15:
-            qualitat = 'Moderada'
-            emoji = '⛅'
-        else:
-            qualitat = 'Baixa'
-            emoji = '☁️'
-
-        registres.append({
-            'data': data.date(),
-            'dia_setmana': dies_setmana_ca[dia_idx],
-            'temperatura_min': temp_min,
-            'temperatura_max': temp_max,
-            'temperatura_mitja': temp_mitja,
-            'nubositat': nubositat,
-            'humitat': humitat,
-            'produccio_estimada_kwh': produccio_total,
-            'qualitat': qualitat,
-            'emoji': emoji,
-        })
+        nubositats.append(nubositat)
+        humitats.append(humitat)
+        temps_mitja.append(temp_mitja)
+        temps_min.append(round(temp_mitja - np.random.uniform(3, 6), 1))
+        temps_max.append(round(temp_mitja + np.random.uniform(4, 8), 1))
+        if not usar_model:
+            soroll[d - 1] = np.random.uniform(-0.2, 0.2, 24)
 
-    return pd.DataFrame(registres)
+    # Producció horària (kWh per hora) com a matriu (dies, hores)
+    hores = np.arange(24)
+    nubositat = np.array(nubositats)[:, None]
+    radiacio = estimar_radiacion_solar(hores[None, :], nubositat)
+    if usar_model:
+        X = np.column_stack([np.repeat(temps_mitja, 24), np.repeat(nubositats, 24),
+                             np.repeat(humitats, 24), radiacio.ravel()])
+        produccio = predictor.predecir_matriz(X).reshape(7, 24)
+    else:
+        # Estimació heurística: pic de 5.5 kWh al migdia
+        produccio = np.maximum(0, 5.5 * np.sin((hores - 6) * np.pi / 12)
+                               * (1 - nubositat / 100 * 0.7) + soroll)
+    produccio = np.round(produccio, 3)
+    # Suma acumulada: mateix ordre d'addició que hora a hora
+    produccio_total = np.round(np.cumsum(produccio, axis=1)[:, -1], 2)
+
+    # Classificar qualitat del dia
+    llindars = [produccio_total >= 35, produccio_total >= 25, produccio_total >= 15]
+    qualitat = np.select(llindars, ['Excel·lent', 'Bona', 'Moderada'], 'Baixa')
+    emoji = np.select(llindars, ['☀️', '🌤️', '⛅'], '☁️')
+
+    diari = pd.DataFrame({
+        'data': [data.date() for data in dates],
+        'dia_setmana': [dies_setmana_ca[data.weekday()] for data in dates],
+        'temperatura_min': temps_min,
+        'temperatura_max': temps_max,
+        'temperatura_mitja': temps_mitja,
+        'nubositat': nubositats,
+        'humitat': humitats,
+        'produccio_estimada_kwh': produccio_total,
+        'qualitat': qualitat,
+        'emoji': emoji,
+    })
+    if not horari:
+        return diari
+
+    inici = pd.DatetimeIndex(dates).repeat(24)
+    df_horari = pd.DataFrame({
+        'fecha_hora': inici + pd.to_timedelta(np.tile(hores, 7), unit='h'),
+        'data': inici.date,
+        'hora': np.tile(hores, 7),
+        'temperatura': np.repeat(temps_mitja, 24),
+        'nubosidad': np.repeat(nubositats, 24),
+        'humedad': np.repeat(humitats, 24),
+        'radiacion': radiacio.ravel(),
+        'produccion_predicha': produccio.ravel()
+    })
+    return diari, df_horari
+
+
+def prevision_desde_clima(predictor: SolarPredictor, df_clima: pd.DataFrame) -> pd.DataFrame:
+    """
+    Previsió horària de producció a partir de les dades de clima d'un període.
+
+    La radiació no es pren de la mesura sinó que s'estima amb l'hora i la
+    nuvolositat (estimar_radiacion_solar), com en una previsió real, de
+    manera que el MPC no planifica amb la producció que després es produeix.
+
+    Args:
+        predictor: SolarPredictor entrenat
+        df_clima: DataFrame amb ['fecha_hora', 'temperatura', 'nubosidad', 'humedad']
+
+    Returns:
+        pd.DataFrame: [fecha_hora, produccion_predicha], el format de
+            df_prevision de SimuladorBateria.simular()
+    """
+    df = df_clima[['fecha_hora', 'temperatura', 'nubosidad', 'humedad']].copy()
+    df['radiacion'] = estimar_radiacion_solar(pd.DatetimeIndex(df['fecha_hora']).hour.to_numpy(),
+                                              df['nubosidad'].fillna(0).to_numpy(dtype=float))
+    return predictor.predecir_batch(df)[['fecha_hora', 'produccion_predicha']]
 
 
 # ============================================================================
@@ -327,21 +1026,22 @@ def cargar_predictor_solar():
     return predictor
 
 
-def estimar_radiacion_solar(hora: int, nubosidad: int) -> float:
+def estimar_radiacion_solar(hora, nubosidad):
     """
     Estima la radiació solar basant-se en l'hora del dia i la nuvolositat.
 
+    Accepta escalars o arrays (amb broadcasting entre hores i nuvolositats).
+
     Args:
         hora: Hora del dia (0-23)
         nubosidad: Percentatge de nuvolositat (0-100)
 
     Returns:
-        float: Radiació estimada en W/m²
+        float: Radiació estimada en W/m² (np.ndarray si les entrades són arrays)
     """
-    if 6 <= hora <= 18:
-        radiacion_maxima = 1000
-        radiacion_base = radiacion_maxima * np.sin((hora - 6) * np.pi / 12)
-        factor_nubosidad = 1 - (nubosidad / 100) * 0.7
-        return max(0, radiacion_base * factor_nubosidad)
-    else:
-        return 0.0
+    hora = np.asarray(hora)
+    radiacion_maxima = 1000
+    radiacion_base = radiacion_maxima * np.sin((hora - 6) * np.pi / 12)
+    factor_nubosidad = 1 - (np.asarray(nubosidad) / 100) * 0.7
+    radiacion = np.where((hora >= 6) & (hora <= 18), np.maximum(0, radiacion_base * factor_nubosidad), 0.0)
+    return float(radiacion) if radiacion.ndim == 0 else radiacion
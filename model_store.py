@@ -0,0 +1,128 @@
+"""
+model_store.py - Persistencia de Modelos
+OptiSolarAI - Artefactos versionados: arrays .npy mapeables + manifiesto JSON
+"""
+
+import hashlib
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Versión del formato en disco; se incrementa con cambios incompatibles
+VERSION_FORMATO = 1
+MANIFIESTO = "manifest.json"
+
+
+def _a_json(valor):
+    """Convierte escalares y arrays de NumPy a tipos serializables."""
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, (datetime, Path)):
+        return str(valor)
+    raise TypeError(f"Tipo no serializable en el manifiesto: {type(valor).__name__}")
+
+
+def hash_config(config: Dict) -> str:
+    """
+    Huella estable de una configuración (claves ordenadas, SHA-256 truncado).
+    """
+    texto = json.dumps(config, sort_keys=True, default=_a_json)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:16]
+
+
+def guardar_artefacto(ruta, tipo: str, arrays: Dict[str, np.ndarray], metadatos: Dict) -> Path:
+    """
+    Guarda un artefacto como directorio con un .npy por array y un manifiesto.
+
+    Se escribe en un directorio temporal y se sustituye el anterior al
+    final, así que un fallo a medias no deja un artefacto mezclado.
+
+    Args:
+        ruta: Directorio del artefacto
+        tipo: Tipo de artefacto ('solar_predictor', 'agente_rl', ...)
+        arrays: Arrays numéricos a guardar (sin objetos Python)
+        metadatos: Datos serializables a JSON que se añaden al manifiesto
+
+    Returns:
+        Path: Directorio escrito
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    if temporal.exists():
+        shutil.rmtree(temporal)
+    temporal.mkdir()
+
+    descriptores = {}
+    for nombre, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        if arr.dtype.hasobject:
+            raise TypeError(f"El array '{nombre}' contiene objetos Python.")
+        np.save(temporal / f"{nombre}.npy", arr, allow_pickle=False)
+        descriptores[nombre] = {'dtype': arr.dtype.str, 'shape': list(arr.shape)}
+
+    manifiesto = {
+        'version_formato': VERSION_FORMATO,
+        'tipo': tipo,
+        'fecha_guardado': datetime.now().isoformat(timespec='seconds'),
+        'arrays': descriptores,
+        **metadatos
+    }
+    with open(temporal / MANIFIESTO, 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False, default=_a_json)
+
+    if ruta.is_dir():
+        shutil.rmtree(ruta)
+    elif ruta.exists():
+        ruta.unlink()
+    temporal.rename(ruta)
+    return ruta
+
+
+def leer_manifiesto(ruta) -> Dict:
+    """
+    Lee y valida el manifiesto de un artefacto.
+    """
+    with open(Path(ruta) / MANIFIESTO, encoding='utf-8') as f:
+        manifiesto = json.load(f)
+    if manifiesto.get('version_formato', 0) > VERSION_FORMATO:
+        raise ValueError(f"Formato {manifiesto.get('version_formato')} más nuevo que el soportado ({VERSION_FORMATO}).")
+    return manifiesto
+
+
+def cargar_artefacto(ruta, tipo: str = None, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """
+    Carga un artefacto guardado con guardar_artefacto().
+
+    Nunca se deserializan objetos Python (allow_pickle=False). Con
+    mmap=True los arrays se mapean en memoria en solo lectura y las
+    páginas se leen del disco a medida que se usan.
+
+    Args:
+        ruta: Directorio del artefacto
+        tipo: Tipo esperado (si se indica, se valida)
+        mmap: Si es True, mapea los arrays en lugar de leerlos
+
+    Returns:
+        tuple: (arrays, manifiesto)
+    """
+    ruta = Path(ruta)
+    manifiesto = leer_manifiesto(ruta)
+    if tipo is not None and manifiesto.get('tipo') != tipo:
+        raise ValueError(f"El artefacto es de tipo '{manifiesto.get('tipo')}', se esperaba '{tipo}'.")
+
+    arrays = {}
+    for nombre, descriptor in manifiesto['arrays'].items():
+        # Los arrays vacíos no se pueden mapear
+        mapear = mmap and int(np.prod(descriptor['shape'])) > 0
+        arr = np.load(ruta / f"{nombre}.npy", mmap_mode='r' if mapear else None, allow_pickle=False)
+        if arr.dtype.str != descriptor['dtype'] or list(arr.shape) != descriptor['shape']:
+            raise ValueError(f"El array '{nombre}' no coincide con el manifiesto.")
+        arrays[nombre] = arr
+    return arrays, manifiesto
@@ -0,0 +1,335 @@
+"""
+opt_engine.py - Motor de Optimización
+OptiSolarAI - Despacho óptimo de la batería con previsión perfecta
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+from logic import DECISIONES, CODIGOS_DECISION, combinar_series
+
+
+class DespachoOptimo:
+    """
+    Calcula el despacho óptimo de la batería conociendo de antemano
+    producción, consumo y precios (previsión perfecta).
+
+    Usa el mismo modelo de acciones que SimuladorBateria: con excedente
+    solar se elige entre 'cargar' y 'vender'; con déficit, entre
+    'descargar' y 'comprar', con las mismas cantidades, eficiencias y
+    precio de venta que _ejecutar_accion. A diferencia de _ejecutar_accion,
+    al descargar se compra la parte del déficit que la batería no cubre;
+    si no, una descarga mínima dejaría sin pagar el resto de la hora y el
+    óptimo serían descargas residuales. El estado de carga se discretiza
+    y una pasada hacia atrás de programación dinámica, vectorizada sobre
+    todos los niveles de carga, calcula el valor de cada estado. Después
+    una pasada hacia delante recorre la física exacta eligiendo en cada
+    hora la acción de mayor valor, de modo que el beneficio devuelto es
+    el de un calendario factible.
+    """
+
+    def __init__(self,
+                 capacidad_bateria: float = 10.0,
+                 carga_inicial: float = 5.0,
+                 eficiencia_carga: float = 0.95,
+                 eficiencia_descarga: float = 0.95,
+                 precio_venta_factor: float = 0.8,
+                 resolucion_kwh: float = 0.1,
+                 coste_desgaste_kwh: float = 0.0):
+        """
+        Args:
+            capacidad_bateria: Capacidad máxima en kWh
+            carga_inicial: Carga inicial en kWh
+            eficiencia_carga: Eficiencia al cargar (0-1)
+            eficiencia_descarga: Eficiencia al descargar (0-1)
+            precio_venta_factor: Factor del precio de venta respecto al de compra
+            resolucion_kwh: Paso de la discretización del estado de carga
+            coste_desgaste_kwh: Coste de desgaste por kWh descargado que se
+                descuenta al planificar (no se resta del beneficio devuelto)
+        """
+        self.capacidad_bateria = capacidad_bateria
+        self.carga_inicial = min(carga_inicial, capacidad_bateria)
+        self.eficiencia_carga = eficiencia_carga
+        self.eficiencia_descarga = eficiencia_descarga
+        self.precio_venta_factor = precio_venta_factor
+        self.resolucion_kwh = resolucion_kwh
+        self.coste_desgaste_kwh = coste_desgaste_kwh
+
+        n_niveles = max(2, int(round(capacidad_bateria / resolucion_kwh)) + 1)
+        self.niveles = np.linspace(0.0, capacidad_bateria, n_niveles)
+
+    @classmethod
+    def desde_simulador(cls, simulador, resolucion_kwh: float = 0.1) -> 'DespachoOptimo':
+        """
+        Crea un despacho óptimo con los parámetros físicos de un SimuladorBateria.
+        """
+        return cls(capacidad_bateria=simulador.capacidad_bateria,
+                   carga_inicial=simulador.carga_inicial,
+                   eficiencia_carga=simulador.eficiencia_carga,
+                   eficiencia_descarga=simulador.eficiencia_descarga,
+                   precio_venta_factor=simulador.precio_venta_factor,
+                   resolucion_kwh=resolucion_kwh,
+                   coste_desgaste_kwh=getattr(simulador, 'coste_desgaste_kwh', 0.0))
+
+    def resolver(self,
+                 df_produccion: pd.DataFrame,
+                 df_precios: pd.DataFrame,
+                 consumo_base: float = 2.0) -> Dict:
+        """
+        Calcula el calendario óptimo para las series dadas.
+
+        Args:
+            df_produccion: DataFrame con ['fecha_hora', 'produccion_kwh']
+            df_precios: DataFrame con ['fecha_hora', 'precio_kwh']
+            consumo_base: Consumo base por hora en kWh
+
+        Returns:
+            dict: Mismas claves que SimuladorBateria.simular()
+        """
+        df = combinar_series(df_produccion, df_precios)
+        return self._resolver_arrays(
+            fechas=df['fecha_hora'].to_numpy(),
+            produccion=df['produccion_kwh'].to_numpy(),
+            precios=df['precio_kwh'].to_numpy(),
+            consumo=np.full(len(df), consumo_base, dtype=float)
+        )
+
+    def _interpolar(self, valores: np.ndarray, cargas: np.ndarray) -> np.ndarray:
+        """
+        Interpola linealmente cada fila de `valores` en las cargas dadas.
+
+        Args:
+            valores: Valor por nivel, forma (filas, niveles)
+            cargas: Cargas a evaluar, forma (filas, k)
+        """
+        paso = self.niveles[1] - self.niveles[0]
+        posicion = np.clip(cargas / paso, 0, len(self.niveles) - 1)
+        i0 = np.minimum(posicion.astype(np.intp), len(self.niveles) - 2)
+        peso = posicion - i0
+        v0 = np.take_along_axis(valores, i0, axis=1)
+        v1 = np.take_along_axis(valores, i0 + 1, axis=1)
+        return v0 + (v1 - v0) * peso
+
+    def _paso_bellman(self, siguiente: np.ndarray, energia: np.ndarray,
+                      precios: np.ndarray) -> np.ndarray:
+        """
+        Aplica un paso hacia atrás de la ecuación de Bellman a varias filas.
+
+        Args:
+            siguiente: Valor tras la hora, forma (filas, niveles)
+            energia: Producción menos consumo de la hora de cada fila
+            precios: Precio de compra de la hora de cada fila
+
+        Returns:
+            np.ndarray: Valor antes de la hora, forma (filas, niveles)
+        """
+        niveles = self.niveles[np.newaxis, :]
+        cap = self.capacidad_bateria
+        energia = energia[:, np.newaxis]
+        precios = precios[:, np.newaxis]
+        deficit = np.abs(energia)
+
+        # Excedente: cargar (la carga sube, sin ingreso) o vender
+        carga_c = np.minimum(niveles + np.minimum(energia, cap - niveles) * self.eficiencia_carga, cap)
+        q_cargar = self._interpolar(siguiente, carga_c)
+        q_vender = energia * (precios * self.precio_venta_factor) + siguiente
+
+        # Déficit: descargar (la batería cubre lo que puede y el resto se compra) o comprar
+        cantidad = np.minimum(deficit, niveles) * self.eficiencia_descarga
+        carga_d = np.maximum(niveles - cantidad / self.eficiencia_descarga, 0)
+        q_descargar = (cantidad * (precios - self.coste_desgaste_kwh) - (deficit - cantidad) * precios
+                       + self._interpolar(siguiente, carga_d))
+        q_comprar = -deficit * precios + siguiente
+
+        return np.where(energia > 0,
+                        np.maximum(q_cargar, q_vender),
+                        np.maximum(q_descargar, q_comprar))
+
+    def calcular_valores(self, produccion: np.ndarray, precios: np.ndarray,
+                         consumo: np.ndarray) -> np.ndarray:
+        """
+        Pasada hacia atrás de programación dinámica.
+
+        Returns:
+            np.ndarray: Valor (beneficio futuro máximo) de cada nivel de carga
+                antes de cada hora, con forma (horas + 1, niveles)
+        """
+        n = len(precios)
+        energia = np.asarray(produccion, dtype=float) - np.asarray(consumo, dtype=float)
+        precios = np.asarray(precios, dtype=float)
+
+        valores = np.zeros((n + 1, len(self.niveles)))
+        for t in range(n - 1, -1, -1):
+            valores[t] = self._paso_bellman(valores[t + 1][np.newaxis, :],
+                                            energia[t:t + 1], precios[t:t + 1])[0]
+        return valores
+
+    def valores_ventanas(self, produccion: np.ndarray, precios: np.ndarray,
+                         consumo: np.ndarray, inicio: int, fin: int,
+                         horizonte: int) -> np.ndarray:
+        """
+        Resuelve a la vez las ventanas deslizantes de las horas [inicio, fin).
+
+        La ventana de la hora t cubre [t, t + horizonte), truncada al final de
+        la serie. Todas las ventanas avanzan juntas hacia atrás, de modo que
+        cada paso de Bellman se aplica a una matriz (ventanas x niveles).
+
+        Returns:
+            np.ndarray: Valor tras la primera hora de cada ventana, forma
+                (fin - inicio, niveles)
+        """
+        n = len(precios)
+        energia = np.asarray(produccion, dtype=float) - np.asarray(consumo, dtype=float)
+        precios = np.asarray(precios, dtype=float)
+        horas = np.arange(inicio, fin)
+
+        valores = np.zeros((len(horas), len(self.niveles)))
+        for k in range(horizonte - 1, 0, -1):
+            indices = horas + k
+            activas = indices < n
+            if not activas.any():
+                continue
+            valores[activas] = self._paso_bellman(valores[activas],
+                                                  energia[indices[activas]],
+                                                  precios[indices[activas]])
+        return valores
+
+    def elegir_accion(self, energia_disponible: float, carga: float, precio: float,
+                      siguiente: np.ndarray):
+        """
+        Elige la acción de la hora actual con la física exacta del simulador.
+
+        Args:
+            energia_disponible: Producción menos consumo de la hora
+            carga: Carga actual en kWh
+            precio: Precio de compra de la hora
+            siguiente: Valor por nivel de carga tras la hora
+
+        Returns:
+            tuple: (decision, cantidad, carga_nueva, coste); al descargar,
+                el coste incluye la compra del déficit no cubierto
+        """
+        niveles = self.niveles
+        cap = self.capacidad_bateria
+
+        if energia_disponible > 0:
+            cantidad_c = min(energia_disponible, cap - carga) * self.eficiencia_carga
+            carga_c = min(carga + cantidad_c, cap)
+            coste_v = energia_disponible * (precio * self.precio_venta_factor)
+            if np.interp(carga_c, niveles, siguiente) > coste_v + np.interp(carga, niveles, siguiente):
+                return 'cargar', cantidad_c, carga_c, 0.0
+            return 'vender', energia_disponible, carga, coste_v
+
+        deficit = abs(energia_disponible)
+        cantidad_d = min(deficit, carga) * self.eficiencia_descarga
+        carga_d = max(carga - cantidad_d / self.eficiencia_descarga, 0)
+        coste_d = cantidad_d * precio - (deficit - cantidad_d) * precio
+        coste_c = -deficit * precio
+        desgaste = cantidad_d * self.coste_desgaste_kwh
+        if coste_d - desgaste + np.interp(carga_d, niveles, siguiente) > coste_c + np.interp(carga, niveles, siguiente):
+            return 'descargar', cantidad_d, carga_d, coste_d
+        return 'comprar', deficit, carga, coste_c
+
+    def _resolver_arrays(self,
+                         fechas: np.ndarray,
+                         produccion: np.ndarray,
+                         precios: np.ndarray,
+                         consumo: np.ndarray) -> Dict:
+        """
+        Resuelve sobre arrays alineados por hora y reconstruye el calendario.
+        """
+        n = len(fechas)
+        valores = self.calcular_valores(produccion, precios, consumo)
+        cap = self.capacidad_bateria
+
+        carga_col = np.empty(n, dtype=np.float32)
+        decision_col = np.empty(n, dtype=np.int8)
+        cantidad_col = np.empty(n, dtype=np.float32)
+        beneficio_col = np.empty(n, dtype=np.float64)
+        acumulado_col = np.empty(n, dtype=np.float64)
+        energia_vendida = energia_comprada = energia_cargada = 0.0
+
+        produccion_l = np.asarray(produccion, dtype=float).tolist()
+        consumo_l = np.asarray(consumo, dtype=float).tolist()
+        precios_l = np.asarray(precios, dtype=float).tolist()
+
+        carga = self.carga_inicial
+        beneficio = 0.0
+
+        # Pasada hacia delante con la física exacta
+        for t in range(n):
+            decision, cantidad, carga_nueva, coste = self.elegir_accion(
+                produccion_l[t] - consumo_l[t], carga, precios_l[t], valores[t + 1]
+            )
+            if decision == 'vender':
+                energia_vendida += cantidad
+            elif decision == 'comprar':
+                energia_comprada += cantidad
+            elif decision == 'descargar':
+                energia_comprada += consumo_l[t] - produccion_l[t] - cantidad
+            elif decision == 'cargar':
+                energia_cargada += cantidad
+
+            beneficio += coste
+            carga_col[t] = carga_nueva
+            decision_col[t] = CODIGOS_DECISION[decision]
+            cantidad_col[t] = cantidad
+            beneficio_col[t] = coste
+            acumulado_col[t] = beneficio
+            carga = carga_nueva
+
+        df_resultado = pd.DataFrame({
+            'fecha_hora': fechas,
+            'produccion_kwh': np.asarray(produccion, dtype=np.float32),
+            'consumo_kwh': np.asarray(consumo, dtype=np.float32),
+            'precio_kwh': np.asarray(precios, dtype=np.float32),
+            'carga_bateria': carga_col,
+            'decision': pd.Categorical.from_codes(decision_col, categories=list(DECISIONES)),
+            'cantidad_kwh': cantidad_col,
+            'beneficio_hora': beneficio_col,
+            'beneficio_acumulado': acumulado_col
+        })
+
+        ciclos = energia_cargada / cap if cap > 0 else 0
+        return {
+            'beneficio_total': beneficio,
+            'beneficio_medio_diario': beneficio / (n / 24) if n > 0 else 0,
+            'energia_vendida_total': energia_vendida,
+            'energia_comprada_total': energia_comprada,
+            'carga_final': carga,
+            'ciclos_bateria': round(ciclos, 2),
+            'detalles': df_resultado
+        }
+
+
+def beneficio_deficit_cubierto(detalles: pd.DataFrame) -> float:
+    """
+    Beneficio de un calendario de SimuladorBateria con la contabilidad de
+    DespachoOptimo: en las horas de descarga se compra el déficit que la
+    batería no cubre, que _ejecutar_accion no cobra.
+
+    Args:
+        detalles: 'detalles' devuelto por SimuladorBateria.simular(); el de
+            resolver() ya incluye esa compra
+    """
+    descarga = (detalles['decision'] == 'descargar').to_numpy()
+    sin_cubrir = (detalles['consumo_kwh'].to_numpy(dtype=float)
+                  - detalles['produccion_kwh'].to_numpy(dtype=float)
+                  - detalles['cantidad_kwh'].to_numpy(dtype=float))
+    compra = np.where(descarga, np.maximum(sin_cubrir, 0) * detalles['precio_kwh'].to_numpy(dtype=float), 0.0)
+    return float(detalles['beneficio_hora'].sum() - compra.sum())
+
+
+def brecha_optimalidad(beneficio_estrategia: float, beneficio_optimo: float) -> float:
+    """
+    Calcula la brecha de optimalidad de una estrategia en %.
+
+    Es la fracción del margen alcanzable por el óptimo que la estrategia
+    deja sin capturar, medida respecto a |beneficio_optimo|. Para comparar
+    un calendario del simulador, su beneficio debe medirse con
+    beneficio_deficit_cubierto.
+    """
+    if beneficio_optimo == 0:
+        return 0.0
+    return (beneficio_optimo - beneficio_estrategia) / abs(beneficio_optimo) * 100
@@ -1,16 +1,337 @@
 import numpy as np
 import pandas as pd
 import pickle
+from bisect import bisect_left
+from datetime import datetime
 from pathlib import Path
 
+from model_store import cargar_artefacto, guardar_artefacto, hash_config
+
+# Estado discretizado: (bloque horario, nivel de carga, tramo de precio, excedente)
+DIMENSIONES_ESTADO = (4, 3, 3, 2)
+N_ESTADOS = int(np.prod(DIMENSIONES_ESTADO))
+
+# Bordes por defecto de cada dimensión (la carga, en fracción de la capacidad)
+BORDES_ESTADO = {
+    'hora': (6, 12, 18),
+    'carga': (0.2, 0.8),
+    'precio': (0.08, 0.15),
+    'energia': (0.0,)
+}
+# True: el valor sube de tramo al alcanzar el borde; False: al superarlo
+CERRADOS_ESTADO = {
+    'hora': (True, True, True),
+    'carga': (True, False),
+    'precio': (True, False),
+    'energia': (False,)
+}
+
+# Por encima de este número de estados la Q-table usa almacenamiento disperso
+LIMITE_ESTADOS_DENSOS = 500_000
+
+
+def codificar_estado(estado):
+    """
+    Convierte una tupla (hora_b, carga_b, precio_b, energia_b) en su índice entero.
+    """
+    hora_b, carga_b, precio_b, energia_b = estado
+    return ((hora_b * 3 + carga_b) * 3 + precio_b) * 2 + energia_b
+
+
+def decodificar_estado(indice):
+    """
+    Inversa de codificar_estado: índice entero -> tupla de componentes.
+    """
+    return tuple(int(v) for v in np.unravel_index(indice, DIMENSIONES_ESTADO))
+
+
+class Discretizador:
+    """
+    Bordes de los tramos de cada dimensión del estado (hora, carga, precio, energía).
+    
+    Con k bordes una dimensión tiene k + 1 tramos. Un valor pasa al tramo
+    siguiente al alcanzar un borde cerrado (valor >= borde) o al superar uno
+    abierto (valor > borde). Los bordes de carga son fracciones de la
+    capacidad de la batería. Sin argumentos reproduce la discretización
+    original de 72 estados.
+    """
+    DIMENSIONES = ('hora', 'carga', 'precio', 'energia')
+    
+    def __init__(self, bordes=None, cerrados=None):
+        """
+        Args:
+            bordes: Dict dimensión -> bordes crecientes (las que falten usan BORDES_ESTADO)
+            cerrados: Dict dimensión -> bool por borde. Por defecto, cerrados
+                para los bordes indicados y CERRADOS_ESTADO para el resto
+        """
+        bordes = bordes or {}
+        cerrados = cerrados or {}
+        self.bordes = {}
+        self.cerrados = {}
+        for dim in self.DIMENSIONES:
+            b = tuple(float(v) for v in bordes.get(dim, BORDES_ESTADO[dim]))
+            if dim in cerrados:
+                c = tuple(bool(v) for v in cerrados[dim])
+            else:
+                c = (True,) * len(b) if dim in bordes else CERRADOS_ESTADO[dim]
+            if len(c) != len(b):
+                raise ValueError(f"'{dim}': {len(b)} bordes y {len(c)} indicadores de cierre.")
+            if any(b2 <= b1 for b1, b2 in zip(b, b[1:])):
+                raise ValueError(f"Los bordes de '{dim}' deben ser estrictamente crecientes.")
+            self.bordes[dim] = b
+            self.cerrados[dim] = c
+        
+        self.dimensiones = tuple(len(self.bordes[dim]) + 1 for dim in self.DIMENSIONES)
+        self.n_estados = int(np.prod(self.dimensiones))
+        # Peso de cada componente en el índice (orden C, como np.ravel_multi_index)
+        n_hora, n_carga, n_precio, n_energia = self.dimensiones
+        self.zancadas = (n_carga * n_precio * n_energia, n_precio * n_energia, n_energia, 1)
+        
+        # Umbrales estrictos: tramo = número de umbrales menores que el valor.
+        # Un borde cerrado b equivale al umbral estricto inmediatamente anterior a b.
+        self._umbrales = {dim: np.array(self._estrictos(self.bordes[dim], self.cerrados[dim]))
+                          for dim in ('hora', 'precio', 'energia')}
+        # Copias en listas y atributos sueltos para el camino escalar (bisect)
+        self._lista_hora, self._lista_precio, self._lista_energia = (
+            self._umbrales[dim].tolist() for dim in ('hora', 'precio', 'energia'))
+        self._zancada_hora, self._zancada_carga, self._zancada_precio, _ = self.zancadas
+        # Las horas enteras del día se resuelven con una consulta al dict
+        self._indice_hora = {h: bisect_left(self._lista_hora, h) * self._zancada_hora for h in range(24)}
+        self._capacidad_cache = None
+        self._umbrales_carga = None
+    
+    @staticmethod
+    def _estrictos(bordes, cerrados):
+        return [float(np.nextafter(b, -np.inf)) if c else b for b, c in zip(bordes, cerrados)]
+    
+    @classmethod
+    def desde_precios(cls, precios, n_tramos=3, bordes=None, cerrados=None):
+        """
+        Discretizador con los tramos de precio en los cuantiles del histórico.
+        
+        Args:
+            precios: Precios del histórico (p. ej. la columna precio_kwh de precios_luz)
+            n_tramos: Número de tramos de precio (aproximadamente equipoblados)
+            bordes, cerrados: Resto de dimensiones, como en el constructor
+        """
+        precios = np.asarray(precios, dtype=float)
+        precios = precios[~np.isnan(precios)]
+        if len(precios) == 0:
+            raise ValueError("No hay precios para calcular los cuantiles.")
+        cortes = np.unique(np.quantile(precios, np.arange(1, n_tramos) / n_tramos))
+        bordes = {**(bordes or {}), 'precio': cortes.tolist()}
+        cerrados = {k: v for k, v in (cerrados or {}).items() if k != 'precio'}
+        return cls(bordes, cerrados)
+    
+    @classmethod
+    def desde_config(cls, config):
+        """Reconstruye un discretizador a partir de a_config()."""
+        return cls(config['bordes'], config['cerrados'])
+    
+    def a_config(self):
+        return {'bordes': {dim: list(b) for dim, b in self.bordes.items()},
+                'cerrados': {dim: list(c) for dim, c in self.cerrados.items()}}
+    
+    def umbrales_carga(self, capacidad):
+        """
+        Umbrales estrictos de carga en kWh para una capacidad, en una lista
+        ordenada: nivel = bisect_left(umbrales, carga).
+        """
+        if capacidad != self._capacidad_cache:
+            self._umbrales_carga = self._estrictos([capacidad * f for f in self.bordes['carga']],
+                                                   self.cerrados['carga'])
+            self._capacidad_cache = capacidad
+        return self._umbrales_carga
+    
+    def tramos(self, dimension, valores):
+        """Tramo de un array de valores de 'hora', 'precio' o 'energia'."""
+        return np.searchsorted(self._umbrales[dimension], np.asarray(valores, dtype=float), side='left')
+    
+    def niveles_carga(self, cargas, capacidades):
+        """Nivel de carga elemento a elemento; capacidades puede ser escalar o array."""
+        niveles = np.zeros(np.shape(cargas), dtype=np.intp)
+        for fraccion, cerrado in zip(self.bordes['carga'], self.cerrados['carga']):
+            umbral = capacidades * fraccion
+            niveles += (cargas >= umbral) if cerrado else (cargas > umbral)
+        return niveles
+    
+    def codificar(self, hora, carga, precio, energia, capacidad):
+        """Índice entero del estado para valores escalares."""
+        umbrales_carga = (self._umbrales_carga if capacidad == self._capacidad_cache
+                          else self.umbrales_carga(capacidad))
+        indice_hora = self._indice_hora.get(hora)
+        if indice_hora is None:
+            indice_hora = bisect_left(self._lista_hora, hora) * self._zancada_hora
+        return (indice_hora
+                + bisect_left(umbrales_carga, carga) * self._zancada_carga
+                + bisect_left(self._lista_precio, precio) * self._zancada_precio
+                + bisect_left(self._lista_energia, energia))
+    
+    def codificar_sin_carga(self, horas, precios, energias):
+        """Índices de estado con nivel de carga 0 para arrays de la misma forma."""
+        z_hora, _, z_precio, _ = self.zancadas
+        return (self.tramos('hora', horas) * z_hora + self.tramos('precio', precios) * z_precio
+                + self.tramos('energia', energias)).astype(np.intp)
+
+
+class TablaDispersa:
+    """
+    Tabla (estados, acciones) que solo reserva filas para los estados vistos.
+    
+    Los identificadores de estado se mantienen ordenados y se localizan con
+    np.searchsorted, así que las lecturas y escrituras por lotes no recorren
+    Python. Los estados no vistos se leen como ceros. Admite la indexación
+    que usa AgenteRL: tabla[estado], tabla[estados] y tabla[estados, acciones].
+    """
+    def __init__(self, n_estados, n_acciones, dtype=float):
+        self.shape = (n_estados, n_acciones)
+        self.dtype = np.dtype(dtype)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.valores = np.zeros((0, n_acciones), dtype=self.dtype)
+    
+    @classmethod
+    def desde_arrays(cls, n_estados, ids, valores):
+        tabla = cls(n_estados, valores.shape[1], valores.dtype)
+        tabla.ids = np.array(ids, dtype=np.int64)
+        tabla.valores = np.array(valores)
+        return tabla
+    
+    def __len__(self):
+        return self.shape[0]
+    
+    def _localizar(self, estados):
+        """Posición de cada estado en self.ids y máscara de los presentes."""
+        pos = np.searchsorted(self.ids, estados)
+        presentes = pos < len(self.ids)
+        presentes[presentes] = self.ids[pos[presentes]] == estados[presentes]
+        return pos, presentes
+    
+    def _reservar(self, estados):
+        """Añade filas a cero para los estados que aún no tienen."""
+        _, presentes = self._localizar(estados)
+        if not presentes.all():
+            nuevos = np.unique(estados[~presentes])
+            pos = np.searchsorted(self.ids, nuevos)
+            self.ids = np.insert(self.ids, pos, nuevos)
+            self.valores = np.insert(self.valores, pos, 0, axis=0)
+    
+    @staticmethod
+    def _clave(clave):
+        if isinstance(clave, tuple):
+            estados, acciones = clave
+            return np.atleast_1d(np.asarray(estados, dtype=np.int64)), np.asarray(acciones), np.ndim(estados) == 0
+        return np.atleast_1d(np.asarray(clave, dtype=np.int64)), None, np.ndim(clave) == 0
+    
+    def __getitem__(self, clave):
+        estados, acciones, escalar = self._clave(clave)
+        pos, presentes = self._localizar(estados)
+        filas = np.zeros((len(estados), self.shape[1]), dtype=self.dtype)
+        filas[presentes] = self.valores[pos[presentes]]
+        resultado = filas if acciones is None else filas[np.arange(len(estados)), acciones]
+        return resultado[0] if escalar else resultado
+    
+    def __setitem__(self, clave, valor):
+        estados, acciones, _ = self._clave(clave)
+        self._reservar(estados)
+        pos = np.searchsorted(self.ids, estados)
+        if acciones is None:
+            self.valores[pos] = valor
+        else:
+            self.valores[pos, acciones] = valor
+    
+    def argmax_filas(self):
+        """Acción greedy de cada estado (0 para los no vistos), como np.argmax(axis=1)."""
+        politica = np.zeros(self.shape[0], dtype=np.int8)
+        politica[self.ids] = np.argmax(self.valores, axis=1)
+        return politica
+    
+    def sum(self):
+        """Suma de todos los valores (mismo nombre que en ndarray)."""
+        return self.valores.sum()
+    
+    def filas_no_nulas(self):
+        """Número de estados con algún valor distinto de cero."""
+        return int((self.valores != 0).any(axis=1).sum())
+
+
+class BufferExperiencia:
+    """
+    Buffer circular de transiciones (estado, acción, recompensa, siguiente estado).
+    
+    Los arrays se reservan una sola vez; al llenarse, cada inserción
+    sobrescribe la transición más antigua.
+    """
+    def __init__(self, capacidad=50_000, tipo_estado=np.int16):
+        self.capacidad = int(capacidad)
+        self.estados = np.zeros(self.capacidad, dtype=tipo_estado)
+        self.acciones = np.zeros(self.capacidad, dtype=np.int8)
+        self.recompensas = np.zeros(self.capacidad, dtype=np.float64)
+        self.siguientes = np.zeros(self.capacidad, dtype=tipo_estado)
+        self.posicion = 0
+        self.tamano = 0
+    
+    def __len__(self):
+        return self.tamano
+    
+    def agregar(self, estado, accion, recompensa, siguiente_estado):
+        """
+        Inserta una transición en O(1).
+        """
+        i = self.posicion
+        self.estados[i] = estado
+        self.acciones[i] = accion
+        self.recompensas[i] = recompensa
+        self.siguientes[i] = siguiente_estado
+        self.posicion = (i + 1) % self.capacidad
+        self.tamano = min(self.tamano + 1, self.capacidad)
+    
+    def muestrear(self, n, rng=None):
+        """
+        Extrae n transiciones uniformes (con reemplazo) como arrays.
+        
+        Returns:
+            tuple: (estados, acciones, recompensas, siguientes_estados)
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        indices = rng.integers(0, self.tamano, n)
+        return (self.estados[indices], self.acciones[indices],
+                self.recompensas[indices], self.siguientes[indices])
+    
+    def guardar(self, ruta):
+        """
+        Guarda las transiciones ocupadas y la posición de escritura en un .npz.
+        """
+        np.savez(ruta, estados=self.estados[:self.tamano], acciones=self.acciones[:self.tamano],
+                 recompensas=self.recompensas[:self.tamano], siguientes=self.siguientes[:self.tamano],
+                 posicion=self.posicion, capacidad=self.capacidad)
+    
+    def cargar(self, ruta):
+        """
+        Restaura un buffer guardado con guardar(). Si la capacidad actual es
+        menor, conserva las transiciones más recientes.
+        """
+        with np.load(ruta) as datos:
+            tamano = len(datos['estados'])
+            posicion = int(datos['posicion'])
+            # Orden cronológico: desde la más antigua hasta la última escrita
+            orden = np.roll(np.arange(tamano), -posicion) if tamano == int(datos['capacidad']) else np.arange(tamano)
+            orden = orden[-self.capacidad:]
+            self.tamano = len(orden)
+            self.posicion = self.tamano % self.capacidad
+            for nombre in ('estados', 'acciones', 'recompensas', 'siguientes'):
+                getattr(self, nombre)[:self.tamano] = datos[nombre][orden]
+
+
 class AgenteRL:
     """
     Agente de Reinforcement Learning (Q-Learning) para la optimización 
     de la gestión de baterías solares.
     """
-    def __init__(self, capacidad_bateria=10.0, file_path="models/q_learning_agent.pkl"):
+    def __init__(self, capacidad_bateria=10.0, file_path="models/q_learning_agent",
+                 capacidad_replay=50_000, discretizador=None):
         self.capacidad_bateria = capacidad_bateria
-        self.file_path = Path(file_path)
+        # Directorio del artefacto; un .pkl antiguo solo se lee como migración
+        self.file_path = Path(file_path).with_suffix('')
         
         # Hyperparameters
         self.alpha = 0.1      # Learning rate
@@ -19,75 +340,722 @@ class AgenteRL:
         
         self.acciones = ['cargar', 'descargar', 'vender', 'comprar', 'mantener']
         
-        # Q-Table
-        self.q_table = {}
+        # Experience replay: cada `frecuencia_replay` pasos se repasa un minibatch (0 lo desactiva)
+        self.tamano_minibatch = 32
+        self.frecuencia_replay = 4
+        self._pasos = 0
+        self._rng = np.random.default_rng()
+        
+        self._configurar_estados(discretizador or Discretizador(), capacidad_replay)
+    
+    def _configurar_estados(self, discretizador, capacidad_replay):
+        """
+        Fija la discretización y crea la Q-table, las visitas y el buffer.
+        
+        La Q-table es densa (una fila por estado codificado) mientras el
+        espacio de estados no supere LIMITE_ESTADOS_DENSOS; por encima se usa
+        una TablaDispersa que solo guarda los estados visitados.
+        """
+        self.discretizador = discretizador
+        n_estados = discretizador.n_estados
+        if n_estados <= LIMITE_ESTADOS_DENSOS:
+            self.q_table = np.zeros((n_estados, len(self.acciones)))
+            # Actualizaciones aplicadas a cada (estado, acción), para fusionar tablas
+            self.visitas = np.zeros((n_estados, len(self.acciones)), dtype=np.int64)
+        else:
+            self.q_table = TablaDispersa(n_estados, len(self.acciones))
+            self.visitas = TablaDispersa(n_estados, len(self.acciones), dtype=np.int64)
+        tipo_estado = np.int16 if n_estados <= np.iinfo(np.int16).max else np.int32
+        self.replay = BufferExperiencia(capacidad_replay, tipo_estado)
+    
+    @property
+    def tabla_densa(self):
+        return isinstance(self.q_table, np.ndarray)
+    
+    @property
+    def q_tensor(self):
+        """Vista de la Q-table densa con forma (horas, cargas, precios, energías, acciones)."""
+        return self.q_table.reshape(self.discretizador.dimensiones + (len(self.acciones),))
         
     def _get_estado(self, hora, carga_actual, precio_actual, energia_disponible):
         """
-        Discretiza las variables continuas en estados.
+        Discretiza las variables continuas en el índice entero del estado.
         """
-        # Hora: 4 bloques del día
-        hora_b = hora // 6 
+        return self.discretizador.codificar(hora, carga_actual, precio_actual,
+                                            energia_disponible, self.capacidad_bateria)
+    
+    def estados_batch(self, horas, cargas, precios, energias, capacidades=None):
+        """
+        Versión vectorizada de _get_estado para arrays de la misma longitud.
         
-        # Carga: 0 (vacía), 1 (media), 2 (llena)
-        if carga_actual < self.capacidad_bateria * 0.2:
-            carga_b = 0
-        elif carga_actual > self.capacidad_bateria * 0.8:
-            carga_b = 2
-        else:
-            carga_b = 1
-            
-        # Precio: 0 (barato), 1 (normal), 2 (caro)
-        if precio_actual < 0.08:
-            precio_b = 0
-        elif precio_actual > 0.15:
-            precio_b = 2
-        else:
-            precio_b = 1
-            
-        # Energía sol: 0 (déficit), 1 (exceso)
-        energia_b = 1 if energia_disponible > 0 else 0
-            
-        return (hora_b, carga_b, precio_b, energia_b)
+        `capacidades` permite discretizar la carga de baterías de distinto
+        tamaño (por defecto, la capacidad del agente).
+        """
+        return self.estados_sin_carga(horas, precios, energias) + self.indices_carga(cargas, capacidades)
+    
+    def estados_sin_carga(self, horas, precios, energias):
+        """
+        Parte del índice de estado que no depende de la carga (nivel de carga 0).
+        """
+        return self.discretizador.codificar_sin_carga(horas, precios, energias)
+    
+    def indices_carga(self, cargas, capacidades=None):
+        """
+        Contribución del nivel de carga al índice de estado.
+        """
+        cap = self.capacidad_bateria if capacidades is None else np.asarray(capacidades)
+        return self.discretizador.niveles_carga(np.asarray(cargas), cap) * self.discretizador.zancadas[1]
+    
+    def limites_carga(self):
+        """
+        Umbrales de carga en kWh: nivel = bisect_left(umbrales, carga).
+        """
+        return self.discretizador.umbrales_carga(self.capacidad_bateria)
+    
+    def compilar_politica(self):
+        """
+        Política greedy precompilada: la acción de cada estado codificado.
+        """
+        if not self.tabla_densa:
+            return self.q_table.argmax_filas()
+        return np.argmax(self.q_table, axis=1).astype(np.int8)
+    
+    def politica_por_nivel(self, horas, precios, energias):
+        """
+        Acción greedy de cada hora para cada nivel de carga, forma (n, niveles).
+        
+        Discretiza las horas de una vez; solo falta elegir la columna según
+        la carga de cada hora.
+        """
+        zancada = self.discretizador.zancadas[1]
+        fijos = self.estados_sin_carga(horas, precios, energias)
+        niveles = np.arange(self.discretizador.dimensiones[1])
+        return self.compilar_politica()[fijos[:, None] + zancada * niveles]
         
     def elegir_accion(self, estado, is_training=True):
         """
         Elige una acción usando política epsilon-greedy
         """
-        if estado not in self.q_table:
-            self.q_table[estado] = np.zeros(len(self.acciones))
-            
         if is_training and np.random.uniform(0, 1) < self.epsilon:
             # Exploración
             return np.random.choice(len(self.acciones))
         else:
             # Explotación
             return np.argmax(self.q_table[estado])
+    
+    def valores_q(self, estados):
+        """
+        Devuelve las filas Q de un array de estados, forma (n, acciones).
+        """
+        return self.q_table[np.asarray(estados, dtype=np.intp)]
+    
+    def elegir_acciones(self, estados, is_training=True, rng=None):
+        """
+        Política epsilon-greedy para un array de estados a la vez.
+        """
+        acciones = np.argmax(self.valores_q(estados), axis=1)
+        if is_training:
+            rng = rng if rng is not None else np.random.default_rng()
+            explorar = rng.random(len(acciones)) < self.epsilon
+            acciones[explorar] = rng.integers(0, len(self.acciones), explorar.sum())
+        return acciones
             
     def aprender(self, estado, accion_idx, recompensa, siguiente_estado):
         """
         Actualiza el valor en la tabla Q usando la ecuación de Bellman
         """
-        if estado not in self.q_table:
-            self.q_table[estado] = np.zeros(len(self.acciones))
-        if siguiente_estado not in self.q_table:
-            self.q_table[siguiente_estado] = np.zeros(len(self.acciones))
-            
-        antiguo_valor = self.q_table[estado][accion_idx]
+        antiguo_valor = self.q_table[estado, accion_idx]
         siguiente_max = np.max(self.q_table[siguiente_estado])
         
         # Q-Learning update rule
         nuevo_valor = (1 - self.alpha) * antiguo_valor + self.alpha * (recompensa + self.gamma * siguiente_max)
-        self.q_table[estado][accion_idx] = nuevo_valor
+        self.q_table[estado, accion_idx] = nuevo_valor
+        self.visitas[estado, accion_idx] += 1
+    
+    def aprender_batch(self, estados, acciones, recompensas, siguientes_estados):
+        """
+        Actualización de Bellman para un lote de transiciones.
+        
+        Todas las transiciones usan la Q-table previa al lote; las que
+        coinciden en (estado, acción) promedian sus objetivos, de modo que
+        cada celda avanza como mucho un paso alpha por lote.
+        """
+        estados = np.asarray(estados, dtype=np.intp)
+        acciones = np.asarray(acciones, dtype=np.intp)
+        objetivo = np.asarray(recompensas) + self.gamma * self.q_table[np.asarray(siguientes_estados, dtype=np.intp)].max(axis=1)
+        n_acciones = len(self.acciones)
+        celdas = estados * n_acciones + acciones
+        if self.tabla_densa and self.q_table.size <= 16 * len(celdas):
+            # Tabla pequeña frente al lote: bincount sobre todas las celdas
+            suma = np.bincount(celdas, objetivo - self.q_table[estados, acciones], minlength=self.q_table.size)
+            visitas = np.bincount(celdas, minlength=self.q_table.size)
+            self.q_table += (self.alpha * suma / np.maximum(visitas, 1)).reshape(self.q_table.shape)
+            self.visitas += visitas.reshape(self.visitas.shape)
+        else:
+            # Mismo promedio, pero solo sobre las celdas del lote: coste independiente del tamaño de la tabla
+            unicas, inversa, visitas = np.unique(celdas, return_inverse=True, return_counts=True)
+            suma = np.bincount(inversa, objetivo - self.q_table[estados, acciones])
+            est, acc = np.divmod(unicas, n_acciones)
+            self.q_table[est, acc] = self.q_table[est, acc] + self.alpha * suma / visitas
+            self.visitas[est, acc] = self.visitas[est, acc] + visitas
+    
+    def experimentar(self, estado, accion_idx, recompensa, siguiente_estado):
+        """
+        Aprende una transición online, la guarda en el buffer de replay y,
+        cada `frecuencia_replay` pasos, repasa un minibatch del buffer.
+        """
+        self.aprender(estado, accion_idx, recompensa, siguiente_estado)
+        self.replay.agregar(estado, accion_idx, recompensa, siguiente_estado)
+        self._pasos += 1
+        if self.frecuencia_replay and self._pasos % self.frecuencia_replay == 0:
+            self.repasar()
+    
+    def repasar(self):
+        """
+        Aplica una actualización de Bellman por lotes a un minibatch del buffer.
+        """
+        if len(self.replay) >= self.tamano_minibatch:
+            self.aprender_batch(*self.replay.muestrear(self.tamano_minibatch, self._rng))
+    
+    @property
+    def ruta_replay(self):
+        """Fichero del buffer de replay, junto a la Q-table."""
+        return self.file_path.with_suffix('.replay.npz')
+    
+    def estados_visitados(self):
+        if self.tabla_densa:
+            return int((self.visitas.sum(axis=1) > 0).sum())
+        return self.visitas.filas_no_nulas()
+    
+    def _migrar_tabla(self, tabla):
+        """
+        Convierte una Q-table antigua (dict tupla -> array) en la tabla densa.
+        """
+        densa = np.zeros((N_ESTADOS, len(self.acciones)))
+        for estado, valores in tabla.items():
+            densa[codificar_estado(estado)] = valores
+        return densa
         
+    def _config(self):
+        return {
+            'capacidad_bateria': self.capacidad_bateria,
+            'alpha': self.alpha,
+            'gamma': self.gamma,
+            'epsilon': self.epsilon,
+            'acciones': self.acciones,
+            'dimensiones_estado': list(self.discretizador.dimensiones),
+            'discretizador': self.discretizador.a_config()
+        }
+    
     def guardar_modelo(self):
-        self.file_path.parent.mkdir(exist_ok=True)
-        with open(self.file_path, 'wb') as f:
-            pickle.dump(self.q_table, f)
+        """
+        Guarda la Q-table y las visitas como artefacto versionado (ver model_store).
+        
+        Una tabla dispersa se guarda como identificadores de estado + filas.
+        """
+        config = self._config()
+        if self.tabla_densa:
+            arrays = {'q_table': self.q_table, 'visitas': self.visitas}
+        else:
+            arrays = {'q_estados': self.q_table.ids, 'q_valores': self.q_table.valores,
+                      'visitas_estados': self.visitas.ids, 'visitas_valores': self.visitas.valores}
+        guardar_artefacto(self.file_path, 'agente_rl',
+                          {**arrays, 'politica': self.compilar_politica()}, {
+                              'fecha_entrenamiento': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                              'metricas': {'actualizaciones': int(self.visitas.sum()),
+                                           'estados_visitados': self.estados_visitados()},
+                              'tabla': 'densa' if self.tabla_densa else 'dispersa',
+                              'config': config,
+                              'hash_config': hash_config(config)
+                          })
+        self.replay.guardar(self.ruta_replay)
             
     def cargar_modelo(self):
-        if self.file_path.exists():
-            with open(self.file_path, 'rb') as f:
-                self.q_table = pickle.load(f)
-            return True
-        return False
+        ruta_pickle = self.file_path.with_suffix('.pkl')
+        if self.file_path.is_dir():
+            arrays, manifiesto = cargar_artefacto(self.file_path, 'agente_rl')
+            config = manifiesto.get('config', {})
+            # Artefactos anteriores a los bordes configurables usan la discretización por defecto
+            discretizador = (Discretizador.desde_config(config['discretizador'])
+                             if 'discretizador' in config else Discretizador())
+            self._configurar_estados(discretizador, self.replay.capacidad)
+            if 'q_table' in arrays:
+                self.q_table = np.array(arrays['q_table'], dtype=float)
+                self.visitas = np.array(arrays['visitas'], dtype=np.int64)
+            else:
+                n = discretizador.n_estados
+                self.q_table = TablaDispersa.desde_arrays(n, arrays['q_estados'], arrays['q_valores'])
+                self.visitas = TablaDispersa.desde_arrays(n, arrays['visitas_estados'], arrays['visitas_valores'])
+        elif ruta_pickle.exists():
+            with open(ruta_pickle, 'rb') as f:
+                tabla = pickle.load(f)
+            # Formato anterior: dict de tuplas de estado
+            self._configurar_estados(Discretizador(), self.replay.capacidad)
+            self.q_table = self._migrar_tabla(tabla) if isinstance(tabla, dict) else np.asarray(tabla, dtype=float)
+        else:
+            return False
+        if self.ruta_replay.exists():
+            self.replay.cargar(self.ruta_replay)
+        return True
+
+
+def traducir_acciones(acciones, energia, carga, capacidad, precio, eficiencia_carga=0.95,
+                      eficiencia_descarga=0.95, precio_venta_factor=0.8):
+    """
+    Versión vectorizada de SimuladorBateria._tomar_decision_rl + _ejecutar_accion.
+    
+    Traduce acciones del agente a la decisión que se registra, la cantidad
+    de energía, el importe y la carga resultante, elemento a elemento.
+    
+    Returns:
+        tuple: (decisión registrada, cantidad, recompensa, nueva carga)
+    """
+    excedente = energia > 0
+    deficit = energia < 0
+    mantener = acciones == 4
+    
+    cantidad_carga = np.minimum(energia, capacidad - carga) * eficiencia_carga
+    cargar = (acciones == 0) & excedente
+    carga_valida = cargar & (cantidad_carga > 0.1)
+    
+    # Descarga insuficiente: se registra como compra de esa misma cantidad
+    cantidad_descarga = np.minimum(-energia, carga) * eficiencia_descarga
+    descargar = (acciones == 1) & deficit
+    descarga_valida = descargar & (cantidad_descarga > 0.1)
+    descarga_fallida = descargar & ~descarga_valida
+    
+    # 'mantener' se fuerza a vender el excedente o comprar el déficit
+    vender = ((acciones == 2) | mantener) & excedente
+    comprar = ((acciones == 3) | mantener) & deficit
+    
+    # Las máscaras son excluyentes: cada elemento toma exactamente un término
+    cantidad = cantidad_carga * cargar + cantidad_descarga * descargar + energia * vender - energia * comprar
+    recompensa = (cantidad * (precio * precio_venta_factor) * vender
+                  - cantidad * precio * (comprar | descarga_fallida)
+                  + cantidad * precio * descarga_valida)
+    
+    nueva_carga = np.where(carga_valida, np.minimum(carga + cantidad_carga, capacidad), carga)
+    nueva_carga = np.where(descarga_valida, np.maximum(carga - cantidad_descarga / eficiencia_descarga, 0),
+                           nueva_carga)
+    
+    registrada = np.array(acciones, copy=True)
+    registrada[cargar & ~carga_valida] = 4
+    registrada[descarga_fallida | (mantener & deficit)] = 3
+    registrada[mantener & excedente] = 2
+    return registrada, cantidad, recompensa, nueva_carga
+
+
+class EntornoVectorizado:
+    """
+    N episodios independientes de la simulación RL avanzando a la vez.
+    
+    Reproduce la traducción de acciones de SimuladorBateria._tomar_decision_rl
+    y la recompensa de _ejecutar_accion, pero con una fila por episodio:
+    cada episodio puede tener su propia ventana de fechas, capacidad y carga
+    inicial.
+    """
+    def __init__(self, produccion, precios, horas, consumo, capacidades, cargas_iniciales,
+                 eficiencia_carga=0.95, eficiencia_descarga=0.95, precio_venta_factor=0.8):
+        """
+        Args:
+            produccion, precios, horas, consumo: Matrices (episodios, horas)
+            capacidades: Capacidad de cada episodio en kWh
+            cargas_iniciales: Carga inicial de cada episodio en kWh
+        """
+        # Filas por hora (horas, episodios) para recorrer el tiempo con vistas contiguas
+        self.energia = np.ascontiguousarray((np.asarray(produccion, dtype=float)
+                                             - np.asarray(consumo, dtype=float)).T)
+        self.precios = np.ascontiguousarray(np.asarray(precios, dtype=float).T)
+        self.horas = np.ascontiguousarray(np.asarray(horas, dtype=np.intp).T)
+        self.capacidades = np.asarray(capacidades, dtype=float)
+        self.cargas_iniciales = np.minimum(np.asarray(cargas_iniciales, dtype=float), self.capacidades)
+        self.eficiencia_carga = eficiencia_carga
+        self.eficiencia_descarga = eficiencia_descarga
+        self.precio_venta_factor = precio_venta_factor
+        
+    
+    def paso(self, acciones, carga, t):
+        """
+        Aplica un array de acciones en la hora t.
+        
+        Returns:
+            tuple: (acción registrada, recompensa, nueva carga) por episodio
+        """
+        registrada, _, recompensa, nueva_carga = traducir_acciones(
+            acciones, self.energia[t], carga, self.capacidades, self.precios[t],
+            self.eficiencia_carga, self.eficiencia_descarga, self.precio_venta_factor
+        )
+        return registrada, recompensa, nueva_carga
+    
+    def ejecutar(self, agente, entrenar=True, rng=None):
+        """
+        Recorre todos los episodios con la política epsilon-greedy del agente.
+        
+        Si entrenar es True, cada hora aplica una actualización de Bellman
+        por lotes sobre la Q-table compartida.
+        
+        Returns:
+            np.ndarray: Recompensa total de cada episodio
+        """
+        estados_fijos = agente.estados_sin_carga(self.horas, self.precios, self.energia)
+        # Igual que el simulador: precio y balance actuales como aproximación del siguiente estado
+        siguientes_fijos = agente.estados_sin_carga((self.horas + 1) % 24, self.precios, self.energia)
+        
+        carga = self.cargas_iniciales.copy()
+        indice_carga = agente.indices_carga(carga, self.capacidades)
+        total = np.zeros(len(carga))
+        for t in range(self.energia.shape[0]):
+            estados = estados_fijos[t] + indice_carga
+            acciones = agente.elegir_acciones(estados, is_training=entrenar, rng=rng)
+            registrada, recompensa, carga = self.paso(acciones, carga, t)
+            indice_carga = agente.indices_carga(carga, self.capacidades)
+            if entrenar:
+                agente.aprender_batch(estados, registrada, recompensa, siguientes_fijos[t] + indice_carga)
+            total += recompensa
+        return total
+
+
+def _series_entrenamiento(df_produccion, df_precios, consumo_base=2.0, perfil_consumo=None):
+    """
+    Une las series y devuelve los arrays que consume EntornoVectorizado.
+    """
+    from logic import alinear_consumo, combinar_series
+    
+    df = combinar_series(df_produccion, df_precios)
+    fechas = df['fecha_hora'].to_numpy()
+    return {
+        'fecha_hora': fechas,
+        'hora': pd.DatetimeIndex(fechas).hour.to_numpy(),
+        'produccion_kwh': df['produccion_kwh'].to_numpy(dtype=float),
+        'precio_kwh': df['precio_kwh'].to_numpy(dtype=float),
+        'consumo_kwh': alinear_consumo(fechas, consumo_base, perfil_consumo)
+    }
+
+
+def _entrenar_epocas(agente, series, tramos, epocas, n_entornos, horas_episodio, capacidades,
+                     fracciones_carga, rng, eficiencia_carga=0.95, eficiencia_descarga=0.95,
+                     precio_venta_factor=0.8, progreso=None):
+    """
+    Bucle de épocas de entrenar_vectorizado sobre los tramos [inicio, fin) dados.
+    
+    Cada episodio elige un tramo (proporcional a su longitud) y una ventana
+    de horas_episodio horas dentro de él. Si se indica, progreso(epoca, epocas)
+    se llama al terminar cada época.
+    
+    Returns:
+        np.ndarray: (epocas, 3) con la recompensa media, mínima y máxima
+    """
+    tramos = np.asarray(tramos, dtype=np.int64).reshape(-1, 2)
+    horas_episodio = int(min(horas_episodio, (tramos[:, 1] - tramos[:, 0]).max()))
+    tramos = tramos[tramos[:, 1] - tramos[:, 0] >= horas_episodio]
+    huecos = tramos[:, 1] - tramos[:, 0] - horas_episodio + 1
+    probabilidades = huecos / huecos.sum()
+    capacidades = np.atleast_1d(np.asarray(
+        agente.capacidad_bateria if capacidades is None else capacidades, dtype=float))
+    
+    curva = np.empty((epocas, 3))
+    desplazamiento = np.arange(horas_episodio)
+    for epoca in range(epocas):
+        tramo = rng.choice(len(tramos), n_entornos, p=probabilidades)
+        inicios = tramos[tramo, 0] + (rng.random(n_entornos) * huecos[tramo]).astype(np.int64)
+        filas = inicios[:, None] + desplazamiento
+        cap = rng.choice(capacidades, n_entornos)
+        fraccion = (rng.random(n_entornos) if fracciones_carga is None
+                    else rng.choice(np.asarray(fracciones_carga, dtype=float), n_entornos))
+        entorno = EntornoVectorizado(
+            series['produccion_kwh'][filas], series['precio_kwh'][filas], series['hora'][filas],
+            series['consumo_kwh'][filas], cap, cap * fraccion,
+            eficiencia_carga, eficiencia_descarga, precio_venta_factor
+        )
+        recompensas = entorno.ejecutar(agente, entrenar=True, rng=rng)
+        curva[epoca] = recompensas.mean(), recompensas.min(), recompensas.max()
+        if progreso is not None:
+            progreso(epoca + 1, epocas)
+    return curva
+
+
+def entrenar_vectorizado(agente, df_produccion, df_precios, epocas=100, n_entornos=256,
+                         horas_episodio=24, capacidades=None, fracciones_carga=None,
+                         consumo_base=2.0, perfil_consumo=None, eficiencia_carga=0.95,
+                         eficiencia_descarga=0.95, precio_venta_factor=0.8, semilla=None,
+                         guardar=True, progreso=None):
+    """
+    Entrena el agente con n_entornos episodios en paralelo por época.
+    
+    Cada época toma ventanas de horas_episodio horas con inicio aleatorio,
+    una capacidad de `capacidades` y una carga inicial como fracción de
+    `fracciones_carga` (uniforme entre 0 y 1 si no se indica).
+    
+    Con más de ~100 épocas el beneficio de la política greedy deja de mejorar
+    (ver benchmarks/bench_entrenamiento_rl.py). progreso(epoca, epocas), si se
+    indica, se llama al terminar cada época.
+    
+    Returns:
+        pd.DataFrame: Curva de aprendizaje (epoca, recompensa_media,
+            recompensa_min, recompensa_max)
+    """
+    series = _series_entrenamiento(df_produccion, df_precios, consumo_base, perfil_consumo)
+    curva = _entrenar_epocas(
+        agente, series, [(0, len(series['hora']))], epocas, n_entornos, horas_episodio,
+        capacidades, fracciones_carga, np.random.default_rng(semilla),
+        eficiencia_carga, eficiencia_descarga, precio_venta_factor, progreso
+    )
+    
+    if guardar:
+        agente.guardar_modelo()
+    
+    return pd.DataFrame({
+        'epoca': np.arange(1, epocas + 1),
+        'recompensa_media': curva[:, 0],
+        'recompensa_min': curva[:, 1],
+        'recompensa_max': curva[:, 2]
+    })
+
+
+def fusionar_tablas(q_tablas, visitas, q_base):
+    """
+    Promedia Q-tables ponderando cada celda por sus visitas.
+    
+    Las celdas que ninguna tabla ha visitado conservan el valor de q_base.
+    
+    Args:
+        q_tablas: Array (tablas, estados, acciones)
+        visitas: Array (tablas, estados, acciones) de actualizaciones por celda
+        q_base: Q-table de partida (estados, acciones)
+    
+    Returns:
+        np.ndarray: Q-table fusionada
+    """
+    total = visitas.sum(axis=0)
+    ponderada = (q_tablas * visitas).sum(axis=0)
+    return np.where(total > 0, ponderada / np.maximum(total, 1), q_base)
+
+
+def _entrenar_tarea(tarea):
+    """
+    Ronda de un worker: parte de la Q-table global compartida, entrena sobre
+    sus meses y deja su tabla y sus visitas en su hueco de memoria compartida.
+    """
+    from logic import _SERIES_COMPARTIDAS
+    
+    trabajador, tramos, config, semilla = tarea
+    series = {nombre: arr for nombre, (_, arr) in _SERIES_COMPARTIDAS.items()}
+    
+    agente = AgenteRL(capacidad_bateria=config['capacidad_bateria'],
+                      discretizador=Discretizador.desde_config(config['discretizador']))
+    agente.q_table = series['q_global'].copy()
+    curva = _entrenar_epocas(
+        agente, series, tramos, config['epocas'], config['n_entornos'], config['horas_episodio'],
+        config['capacidades'], config['fracciones_carga'], np.random.default_rng(semilla),
+        config['eficiencia_carga'], config['eficiencia_descarga'], config['precio_venta_factor']
+    )
+    series['q_trabajadores'][trabajador] = agente.q_table
+    series['visitas_trabajadores'][trabajador] = agente.visitas
+    return trabajador, curva[:, 0].mean()
+
+
+def entrenar_paralelo(agente, df_produccion, df_precios, rondas=10, epocas_por_ronda=50,
+                      n_entornos=256, horas_episodio=24, capacidades=None, fracciones_carga=None,
+                      consumo_base=2.0, perfil_consumo=None, eficiencia_carga=0.95,
+                      eficiencia_descarga=0.95, precio_venta_factor=0.8, max_workers=None,
+                      semilla=None, guardar=True):
+    """
+    Entrena el agente en un pool de procesos con fusión periódica de Q-tables.
+    
+    Los meses del histórico se reparten entre los workers sin solaparse.
+    En cada ronda, cada worker parte de la Q-table global, ejecuta
+    epocas_por_ronda épocas vectorizadas sobre sus meses y escribe su tabla
+    y sus visitas en memoria compartida; el proceso principal las fusiona
+    ponderando por visitas (ver fusionar_tablas). Las series y las tablas
+    viajan por memoria compartida: a los workers solo se envían índices.
+    
+    Returns:
+        pd.DataFrame: Una fila por ronda (ronda, recompensa_media,
+            estados_visitados)
+    """
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    from logic import _inicializar_worker, _publicar_series
+    
+    series = _series_entrenamiento(df_produccion, df_precios, consumo_base, perfil_consumo)
+    fechas = series.pop('fecha_hora')
+    n = len(fechas)
+    
+    # Tramos mensuales repartidos por turnos: cada worker ve meses disjuntos
+    meses = pd.DatetimeIndex(fechas).to_period('M')
+    cortes = np.flatnonzero(meses[1:] != meses[:-1]) + 1
+    limites = np.concatenate([[0], cortes, [n]])
+    tramos = np.column_stack([limites[:-1], limites[1:]])
+    n_trabajadores = max(1, min(max_workers or os.cpu_count() or 1, len(tramos)))
+    reparto = [tramos[i::n_trabajadores].tolist() for i in range(n_trabajadores)]
+    
+    if not agente.tabla_densa:
+        raise ValueError("entrenar_paralelo requiere una Q-table densa (espacio de estados <= LIMITE_ESTADOS_DENSOS).")
+    forma = agente.q_table.shape
+    bloques, descriptores = _publicar_series({
+        **series,
+        'q_global': agente.q_table,
+        'q_trabajadores': np.zeros((n_trabajadores,) + forma),
+        'visitas_trabajadores': np.zeros((n_trabajadores,) + forma, dtype=np.int64)
+    })
+    vistas = {nombre: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+              for shm, (nombre, (_, shape, dtype)) in zip(bloques, descriptores.items())}
+    
+    config = {
+        'capacidad_bateria': agente.capacidad_bateria,
+        'discretizador': agente.discretizador.a_config(),
+        'epocas': epocas_por_ronda,
+        'n_entornos': n_entornos,
+        'horas_episodio': horas_episodio,
+        'capacidades': capacidades,
+        'fracciones_carga': fracciones_carga,
+        'eficiencia_carga': eficiencia_carga,
+        'eficiencia_descarga': eficiencia_descarga,
+        'precio_venta_factor': precio_venta_factor
+    }
+    semillas = np.random.SeedSequence(semilla).spawn(rondas * n_trabajadores)
+    
+    curva = []
+    try:
+        with ProcessPoolExecutor(max_workers=n_trabajadores,
+                                 initializer=_inicializar_worker,
+                                 initargs=(descriptores,)) as executor:
+            for ronda in range(rondas):
+                tareas = [(w, reparto[w], config, semillas[ronda * n_trabajadores + w])
+                          for w in range(n_trabajadores)]
+                recompensas = dict(executor.map(_entrenar_tarea, tareas))
+                
+                vistas['q_global'][:] = fusionar_tablas(vistas['q_trabajadores'],
+                                                        vistas['visitas_trabajadores'], vistas['q_global'])
+                agente.visitas += vistas['visitas_trabajadores'].sum(axis=0)
+                curva.append((ronda + 1, np.mean(list(recompensas.values())), agente.estados_visitados()))
+        agente.q_table = vistas['q_global'].copy()
+    finally:
+        del vistas
+        for shm in bloques:
+            shm.close()
+            shm.unlink()
+    
+    if guardar:
+        agente.guardar_modelo()
+    
+    return pd.DataFrame(curva, columns=['ronda', 'recompensa_media', 'estados_visitados'])
+
+
+def construir_mdp(agente, series, capacidades=None, muestras_carga=8, eficiencia_carga=0.95,
+                  eficiencia_descarga=0.95, precio_venta_factor=0.8):
+    """
+    Modelo empírico del MDP discretizado a partir de las series históricas.
+    
+    Para cada par de horas consecutivas del histórico, cada capacidad y
+    muestras_carga cargas repartidas dentro de cada nivel de carga, aplica
+    las cinco acciones con la física de traducir_acciones y anota la
+    recompensa y el estado de la hora siguiente (con su hora, precio y
+    balance reales). Los conteos se convierten en probabilidades de
+    transición por (estado, acción).
+    
+    Returns:
+        dict: 'recompensa' y 'visitas' por celda (estados * acciones), y las
+            transiciones dispersas 'origen' (celda), 'destino' (estado) y
+            'probabilidad'
+    """
+    disc = agente.discretizador
+    n_acciones = len(agente.acciones)
+    n_celdas = disc.n_estados * n_acciones
+    
+    # Solo pares de horas realmente consecutivas
+    t = np.flatnonzero(np.diff(series['fecha_hora']) == np.timedelta64(1, 'h'))
+    energia = series['produccion_kwh'] - series['consumo_kwh']
+    
+    # Cargas de muestra: puntos medios de muestras_carga subtramos de cada nivel
+    bordes = np.clip(np.concatenate([[0.0], disc.bordes['carga'], [1.0]]), 0.0, 1.0)
+    paso = (np.arange(muestras_carga) + 0.5) / muestras_carga
+    fracciones = np.concatenate([bajo + (alto - bajo) * paso
+                                 for bajo, alto in zip(bordes[:-1], bordes[1:]) if alto > bajo])
+    capacidades = np.atleast_1d(np.asarray(
+        agente.capacidad_bateria if capacidades is None else capacidades, dtype=float))
+    
+    # Una fila por (capacidad, fracción, hora)
+    cap = np.repeat(capacidades, len(fracciones) * len(t))
+    carga = cap * np.tile(np.repeat(fracciones, len(t)), len(capacidades))
+    filas = np.tile(t, len(capacidades) * len(fracciones))
+    siguientes = filas + 1
+    estados = agente.estados_batch(series['hora'][filas], carga, series['precio_kwh'][filas],
+                                   energia[filas], cap)
+    
+    suma = np.zeros(n_celdas)
+    claves = []
+    for accion in range(n_acciones):
+        _, _, recompensa, nueva_carga = traducir_acciones(
+            np.full(len(filas), accion), energia[filas], carga, cap, series['precio_kwh'][filas],
+            eficiencia_carga, eficiencia_descarga, precio_venta_factor
+        )
+        destino = agente.estados_batch(series['hora'][siguientes], nueva_carga,
+                                       series['precio_kwh'][siguientes], energia[siguientes], cap)
+        celdas = estados * n_acciones + accion
+        suma += np.bincount(celdas, recompensa, minlength=n_celdas)
+        claves.append(celdas.astype(np.int64) * disc.n_estados + destino)
+    
+    claves, conteos = np.unique(np.concatenate(claves), return_counts=True)
+    origen, destino = np.divmod(claves, disc.n_estados)
+    visitas = np.bincount(origen, conteos, minlength=n_celdas).astype(np.int64)
+    return {
+        'recompensa': suma / np.maximum(visitas, 1),
+        'visitas': visitas,
+        'origen': origen,
+        'destino': destino,
+        'probabilidad': conteos / visitas[origen]
+    }
+
+
+def iteracion_valor(agente, df_produccion, df_precios, capacidades=None, muestras_carga=8,
+                    consumo_base=2.0, perfil_consumo=None, tolerancia=1e-6, max_iteraciones=2000,
+                    eficiencia_carga=0.95, eficiencia_descarga=0.95, precio_venta_factor=0.8,
+                    guardar=True):
+    """
+    Resuelve el MDP discretizado por iteración de valor en lugar de muestrearlo.
+    
+    Construye el modelo de recompensas y transiciones con construir_mdp y
+    aplica Q(s, a) = R(s, a) + gamma * sum P(s'|s, a) max Q(s', .) sobre
+    todas las celdas a la vez hasta que el mayor cambio baja de tolerancia.
+    El resultado sustituye la Q-table del agente (mismo formato que el
+    entrenamiento epsilon-greedy); las visitas son las muestras del modelo.
+    
+    Returns:
+        pd.DataFrame: Convergencia (iteracion, delta_max)
+    """
+    series = _series_entrenamiento(df_produccion, df_precios, consumo_base, perfil_consumo)
+    modelo = construir_mdp(agente, series, capacidades, muestras_carga, eficiencia_carga,
+                           eficiencia_descarga, precio_venta_factor)
+    
+    n_estados = agente.discretizador.n_estados
+    n_acciones = len(agente.acciones)
+    recompensa = modelo['recompensa']
+    origen, destino, probabilidad = modelo['origen'], modelo['destino'], modelo['probabilidad']
+    
+    q = np.zeros(n_estados * n_acciones)
+    curva = []
+    for iteracion in range(1, max_iteraciones + 1):
+        valor = q.reshape(n_estados, n_acciones).max(axis=1)
+        nueva = recompensa + agente.gamma * np.bincount(origen, probabilidad * valor[destino],
+                                                        minlength=len(q))
+        delta = float(np.abs(nueva - q).max())
+        q = nueva
+        curva.append((iteracion, delta))
+        if delta < tolerancia:
+            break
+    
+    q = q.reshape(n_estados, n_acciones)
+    visitas = modelo['visitas'].reshape(n_estados, n_acciones)
+    if agente.tabla_densa:
+        agente.q_table = q
+        agente.visitas = visitas
+    else:
+        vistos = np.flatnonzero(visitas.sum(axis=1) > 0)
+        agente.q_table = TablaDispersa.desde_arrays(n_estados, vistos, q[vistos])
+        agente.visitas = TablaDispersa.desde_arrays(n_estados, vistos, visitas[vistos])
+    
+    if guardar:
+        agente.guardar_modelo()
+    
+    return pd.DataFrame(curva, columns=['iteracion', 'delta_max'])